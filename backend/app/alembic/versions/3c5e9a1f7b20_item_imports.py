@@ -0,0 +1,37 @@
+"""Item imports
+
+Revision ID: 3c5e9a1f7b20
+Revises: 8f2b1c7d4e6a
+Create Date: 2026-10-17 11:04:52.731904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "3c5e9a1f7b20"
+down_revision = "8f2b1c7d4e6a"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "itemimport",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("owner_id", sa.Integer(), nullable=False),
+        sa.Column("format", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), server_default="pending", nullable=False),
+        sa.Column("rows_read", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("rows_failed", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("rows_imported", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("errors", sa.JSON(), server_default="[]", nullable=False),
+        sa.Column("detail", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(["owner_id"], ["user.id"],),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade():
+    op.drop_table("itemimport")
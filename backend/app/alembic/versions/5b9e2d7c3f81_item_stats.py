@@ -0,0 +1,93 @@
+"""Item stats
+
+Revision ID: 5b9e2d7c3f81
+Revises: a7d3e5f18c42
+Create Date: 2026-10-17 16:02:41.538207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5b9e2d7c3f81"
+down_revision = "a7d3e5f18c42"
+branch_labels = None
+depends_on = None
+
+# Items added and removed per owner by the statement, from its transition tables
+ADDED = "SELECT owner_id, count(*) AS n FROM new_rows GROUP BY owner_id"
+REMOVED = "SELECT owner_id, -count(*) AS n FROM old_rows GROUP BY owner_id"
+
+# Applies the deltas in owner order, so concurrent statements lock rows in the
+# same order and cannot deadlock. Every owner whose items the statement touched
+# gets their list version bumped, updates included
+APPLY = """
+            INSERT INTO itemstats AS s (owner_id, item_count, list_version)
+            SELECT owner_id, sum(n), 1 FROM ({}) AS delta
+            WHERE owner_id IS NOT NULL
+            GROUP BY owner_id
+            ORDER BY owner_id
+            ON CONFLICT (owner_id)
+            DO UPDATE SET item_count = s.item_count + excluded.item_count,
+                list_version = s.list_version + 1;
+"""
+
+
+def upgrade():
+    op.create_table(
+        "itemstats",
+        sa.Column("owner_id", sa.Integer(), nullable=False),
+        sa.Column("item_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column(
+            "list_version", sa.BigInteger(), server_default="0", nullable=False
+        ),
+        sa.ForeignKeyConstraint(["owner_id"], ["user.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("owner_id"),
+    )
+    op.execute(
+        f"""
+        CREATE FUNCTION item_stats() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                {APPLY.format(ADDED)}
+            ELSIF TG_OP = 'DELETE' THEN
+                {APPLY.format(REMOVED)}
+            ELSE
+                {APPLY.format(ADDED + " UNION ALL " + REMOVED)}
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    # Statement level, a bulk write updates each owner's row once
+    op.execute(
+        "CREATE TRIGGER item_stats_insert AFTER INSERT ON item "
+        "REFERENCING NEW TABLE AS new_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION item_stats()"
+    )
+    op.execute(
+        "CREATE TRIGGER item_stats_delete AFTER DELETE ON item "
+        "REFERENCING OLD TABLE AS old_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION item_stats()"
+    )
+    op.execute(
+        "CREATE TRIGGER item_stats_update AFTER UPDATE ON item "
+        "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION item_stats()"
+    )
+    # The triggers hold a lock on item until commit, no write is missed
+    op.execute(
+        "INSERT INTO itemstats (owner_id, item_count) "
+        "SELECT owner_id, count(*) FROM item "
+        "WHERE owner_id IS NOT NULL GROUP BY owner_id"
+    )
+
+
+def downgrade():
+    op.execute("DROP TRIGGER item_stats_update ON item")
+    op.execute("DROP TRIGGER item_stats_delete ON item")
+    op.execute("DROP TRIGGER item_stats_insert ON item")
+    op.execute("DROP FUNCTION item_stats()")
+    op.drop_table("itemstats")
@@ -0,0 +1,32 @@
+"""Row versions
+
+Revision ID: 8f2b1c7d4e6a
+Revises: d4867f3a4c0a
+Create Date: 2026-10-17 09:12:40.518236
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "8f2b1c7d4e6a"
+down_revision = "d4867f3a4c0a"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "user",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+    )
+    op.add_column(
+        "item",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_column("item", "version")
+    op.drop_column("user", "version")
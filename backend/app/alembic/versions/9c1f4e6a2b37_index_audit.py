@@ -0,0 +1,49 @@
+"""Index audit
+
+Revision ID: 9c1f4e6a2b37
+Revises: e2c4a8b6d195
+Create Date: 2026-10-17 18:04:52.270331
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "9c1f4e6a2b37"
+down_revision = "e2c4a8b6d195"
+branch_labels = None
+depends_on = None
+
+# Copies of the primary keys, and columns no query filters or orders by
+UNUSED_INDEXES = [
+    ("ix_user_id", "user", ["id"]),
+    ("ix_user_full_name", "user", ["full_name"]),
+    ("ix_item_id", "item", ["id"]),
+    ("ix_item_title", "item", ["title"]),
+    ("ix_item_description", "item", ["description"]),
+]
+
+
+def upgrade():
+    # CONCURRENTLY keeps writes going, it cannot run in a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_item_owner_id_id",
+            "item",
+            ["owner_id", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        for name, table, _ in UNUSED_INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in UNUSED_INDEXES:
+            op.create_index(
+                name, table, columns, unique=False, postgresql_concurrently=True
+            )
+        op.drop_index(
+            "ix_item_owner_id_id", table_name="item", postgresql_concurrently=True
+        )
@@ -0,0 +1,91 @@
+"""Item change tracking
+
+Revision ID: a7d3e5f18c42
+Revises: 3c5e9a1f7b20
+Create Date: 2026-10-17 13:26:08.114375
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "a7d3e5f18c42"
+down_revision = "3c5e9a1f7b20"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "item",
+        sa.Column(
+            "change_txid",
+            sa.BigInteger(),
+            server_default=sa.text("txid_current()"),
+            nullable=False,
+        ),
+    )
+    # Change pages run in transaction order with the id as tie breaker, the
+    # indexes end in the id so a page is read straight off them
+    op.create_index(
+        "ix_item_change_txid_id", "item", ["change_txid", "id"], unique=False
+    )
+    op.create_index(
+        "ix_item_owner_id_change_txid_id",
+        "item",
+        ["owner_id", "change_txid", "id"],
+        unique=False,
+    )
+    op.create_table(
+        "itemtombstone",
+        sa.Column("item_id", sa.Integer(), nullable=False),
+        sa.Column("owner_id", sa.Integer(), nullable=True),
+        sa.Column(
+            "change_txid",
+            sa.BigInteger(),
+            server_default=sa.text("txid_current()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("item_id"),
+    )
+    op.create_index(
+        "ix_itemtombstone_change_txid_item_id",
+        "itemtombstone",
+        ["change_txid", "item_id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_itemtombstone_owner_id_change_txid_item_id",
+        "itemtombstone",
+        ["owner_id", "change_txid", "item_id"],
+        unique=False,
+    )
+    op.execute(
+        """
+        CREATE FUNCTION item_tombstone() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO itemtombstone (item_id, owner_id)
+            VALUES (OLD.id, OLD.owner_id);
+            RETURN OLD;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        "CREATE TRIGGER item_tombstone AFTER DELETE ON item "
+        "FOR EACH ROW EXECUTE FUNCTION item_tombstone()"
+    )
+
+
+def downgrade():
+    op.execute("DROP TRIGGER item_tombstone ON item")
+    op.execute("DROP FUNCTION item_tombstone()")
+    op.drop_index(
+        "ix_itemtombstone_owner_id_change_txid_item_id", table_name="itemtombstone"
+    )
+    op.drop_index("ix_itemtombstone_change_txid_item_id", table_name="itemtombstone")
+    op.drop_table("itemtombstone")
+    op.drop_index("ix_item_owner_id_change_txid_id", table_name="item")
+    op.drop_index("ix_item_change_txid_id", table_name="item")
+    op.drop_column("item", "change_txid")
@@ -0,0 +1,46 @@
+"""Item search
+
+Revision ID: e2c4a8b6d195
+Revises: 5b9e2d7c3f81
+Create Date: 2026-10-17 17:21:09.604718
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "e2c4a8b6d195"
+down_revision = "5b9e2d7c3f81"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Rewrites the table to compute the vector of every row
+    op.add_column(
+        "item",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed(
+                "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+                "setweight(to_tsvector('english', coalesce(description, '')), 'B')",
+                persisted=True,
+            ),
+            nullable=False,
+        ),
+    )
+    op.create_index(
+        "ix_item_search_vector",
+        "item",
+        ["search_vector"],
+        unique=False,
+        postgresql_using="gin",
+    )
+
+
+def downgrade():
+    op.drop_index("ix_item_search_vector", table_name="item")
+    op.drop_column("item", "search_vector")
@@ -0,0 +1,45 @@
+from typing import Any, List
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import schemas
+from app.api import deps
+from app.api.batch import run_batch
+from app.core.config import settings
+from app.core.security import Principal
+from app.db.routing import LSN_COOKIE
+from app.db.session import replica_router
+
+router = APIRouter()
+
+
+@router.post("/batch", response_model=List[schemas.BatchResponse])
+async def batch(
+    request: Request,
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    batch_in: schemas.BatchIn,
+    current_user: Principal = Depends(deps.get_current_active_principal),
+) -> Any:
+    """
+    Run many API requests in one round trip, their responses in the same order.
+
+    Paths are relative to the API root. Consecutive GETs run concurrently,
+    other requests one after another, each after all requests before it. A
+    request failing rolls back what it did, the requests after it still run.
+    """
+    if len(batch_in.requests) > settings.BATCH_MAX_REQUESTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BATCH_MAX_REQUESTS} requests per batch",
+        )
+    return await run_batch(
+        request.app,
+        request.scope,
+        batch_in.requests,
+        principal=current_user,
+        db=db,
+        router=replica_router,
+        read_after=request.cookies.get(LSN_COOKIE),
+    )
@@ -1,99 +1,638 @@
-from typing import Any, List
+import os
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, Union
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    File,
+    Header,
+    HTTPException,
+    Query,
+    Response,
+    UploadFile,
+)
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
-from app import crud, models, schemas
+from app import crud, schemas
 from app.api import deps
+from app.api.etag import etag_versions, make_etag, not_modified
+from app.api.events import item_events, render_events
+from app.api.fields import parse_fields, sparse_schema
+from app.api.responses import (
+    EXPORT_MEDIA_TYPES,
+    ExportFormat,
+    render_csv,
+    render_models,
+    render_ndjson,
+    render_rows,
+)
+from app.core.cache import TTLCache
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.core.security import Principal
+from app.crud.base import VersionConflict
+from app.crud.pagination import InvalidCursor
+from app.item_imports import spool_path, spool_upload
 
 router = APIRouter()
 
+# Pages of `read_items` by (owner, list version, skip, cursor, limit, fields).
+# The version lives in the database, a write in any process changes the key.
+page_cache: TTLCache[Tuple[Union[bytes, List[Any]], Optional[str]]] = TTLCache(
+    maxsize=settings.LIST_CACHE_MAX_SIZE, ttl=settings.LIST_CACHE_TTL_SECONDS
+)
 
-@router.get("/", response_model=List[schemas.Item])
-def read_items(
-    db: Session = Depends(deps.get_db),
+
+def check_bulk_size(rows: Sequence[Any]) -> None:
+    if len(rows) > settings.BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BULK_MAX_ITEMS} items per request",
+        )
+
+
+async def missing_item_errors(
+    db: AsyncSession, *, ids_by_index: Dict[int, int], found: Sequence[Any]
+) -> List[schemas.BulkError]:
+    """
+    Explain why requested items are not part of a bulk result.
+    """
+    found_ids = {item.id for item in found}
+    missing = {i: id for i, id in ids_by_index.items() if id not in found_ids}
+    if not missing:
+        return []
+    existing_ids = await crud.async_item.get_existing_ids(
+        db, ids=list(missing.values())
+    )
+    return [
+        schemas.BulkError(
+            index=i,
+            id=id,
+            detail="Not enough permissions" if id in existing_ids else "Item not found",
+        )
+        for i, id in missing.items()
+    ]
+
+
+@router.get("/", response_model=List[schemas.Item], response_class=ORJSONResponse)
+async def read_items(
+    response: Response,
+    db: AsyncSession = Depends(deps.get_async_read_db),
     skip: int = 0,
     limit: int = 100,
-    current_user: models.User = Depends(deps.get_current_active_user),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: Principal = Depends(deps.get_current_active_principal),
+) -> Any:
+    """
+    Retrieve items, ordered by id.
+
+    The `X-Next-Cursor` response header holds the `cursor` of the next page.
+    `skip` is still accepted but gets slower the deeper the page.
+
+    `fields` restricts the items to a comma-separated list of their fields,
+    e.g. `id,title`, only those columns are read.
+    """
+    sparse_fields = parse_fields(fields, crud.async_item.read_fields(schemas.Item))
+    superuser = crud.async_user.is_superuser(current_user)
+    key: Optional[Tuple[Any, ...]] = None
+    # A lagging replica could serve a page older than the version read, and
+    # listings of all items have no version, a single row every write bumps
+    if not superuser and not db.info.get("replica"):
+        # Read the version first, a write during the query makes the page stale
+        version = await crud.async_item.get_list_version(db, owner_id=current_user.id)
+        fields_key = tuple(sparse_fields or ())
+        key = (current_user.id, version, skip, cursor, limit, fields_key)
+    page = page_cache.get(key) if key is not None else None
+    if page is None:
+        page = await read_items_page(
+            db,
+            current_user,
+            superuser=superuser,
+            skip=skip,
+            cursor=cursor,
+            limit=limit,
+            sparse_fields=sparse_fields,
+        )
+        if key is not None:
+            page_cache.set(key, page)
+    content, next_cursor = page
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    if isinstance(content, bytes):
+        # Already encoded, the response model is not applied to a `Response`
+        return Response(content, media_type="application/json", headers=headers)
+    response.headers.update(headers)
+    return content
+
+
+async def read_items_page(
+    db: AsyncSession,
+    current_user: Principal,
+    *,
+    superuser: bool,
+    skip: int,
+    cursor: Optional[str],
+    limit: int,
+    sparse_fields: Optional[List[str]] = None,
+) -> Tuple[Union[bytes, List[Any]], Optional[str]]:
+    # Rows of the schema's columns, or the requested ones, no ORM instances
+    fields = sparse_fields or crud.async_item.read_fields(schemas.Item)
+    next_cursor = None
+    try:
+        if skip and cursor is None and superuser:
+            items = await crud.async_item.get_multi(
+                db, skip=skip, limit=limit, fields=fields
+            )
+        elif skip and cursor is None:
+            items = await crud.async_item.get_multi_by_owner(
+                db=db, owner_id=current_user.id, skip=skip, limit=limit, fields=fields
+            )
+        elif superuser:
+            items, next_cursor = await crud.async_item.get_page(
+                db, cursor=cursor, limit=limit, fields=fields
+            )
+        else:
+            items, next_cursor = await crud.async_item.get_page_by_owner(
+                db=db,
+                owner_id=current_user.id,
+                cursor=cursor,
+                limit=limit,
+                fields=fields,
+            )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if settings.TRUSTED_LIST_RESPONSES:
+        return render_rows(items, sparse_fields), next_cursor
+    if sparse_fields:
+        schema = sparse_schema(schemas.Item, tuple(sparse_fields))
+        return render_models(items, schema), next_cursor
+    return items, next_cursor
+
+
+@router.get(
+    "/with-owners",
+    response_model=List[schemas.ItemWithOwner],
+    response_class=ORJSONResponse,
+)
+async def read_items_with_owners(
+    response: Response,
+    db: AsyncSession = Depends(deps.get_async_read_db),
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    current_user: Principal = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Retrieve all items with the email of their owner, ordered by id.
+
+    The `X-Next-Cursor` response header holds the `cursor` of the next page.
+    """
+    fields = crud.async_item.read_fields(schemas.ItemWithOwner)
+    try:
+        items, next_cursor = await crud.async_item.get_page_with_owner(
+            db, cursor=cursor, limit=limit, fields=fields
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_items(
+    db: AsyncSession = Depends(deps.get_async_read_db),
+    format: ExportFormat = ExportFormat.ndjson,
+    current_user: Principal = Depends(deps.get_current_active_principal),
 ) -> Any:
     """
-    Retrieve items.
+    Export all items as newline-delimited JSON or CSV, ordered by id.
+
+    Rows are streamed from a server-side cursor as they are read, gzip encoded
+    when the client accepts it.
     """
-    if crud.user.is_superuser(current_user):
-        items = crud.item.get_multi(db, skip=skip, limit=limit)
+    fields = crud.async_item.read_fields(schemas.Item)
+    chunk_size = settings.EXPORT_CHUNK_SIZE
+    if crud.async_user.is_superuser(current_user):
+        chunks = crud.async_item.stream(db, fields=fields, chunk_size=chunk_size)
+    else:
+        chunks = crud.async_item.stream_by_owner(
+            db, owner_id=current_user.id, fields=fields, chunk_size=chunk_size
+        )
+    if format == ExportFormat.csv:
+        content = render_csv(chunks, fields)
     else:
-        items = crud.item.get_multi_by_owner(
-            db=db, owner_id=current_user.id, skip=skip, limit=limit
+        content = render_ndjson(chunks)
+    return StreamingResponse(
+        content,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="items.{format.value}"'},
+    )
+
+
+@router.get("/changes", response_model=schemas.ItemChanges)
+async def read_item_changes(
+    db: AsyncSession = Depends(deps.get_async_read_db),
+    since: int = 0,
+    cursor: Optional[str] = None,
+    limit: int = Query(1000, gt=0, le=settings.CHANGES_MAX_ITEMS),
+    current_user: Principal = Depends(deps.get_current_active_principal),
+) -> Any:
+    """
+    Items created, updated or deleted since the `since` watermark, in the order
+    they changed.
+
+    Pass the returned `watermark` as `since` next time, starting with 0 for all
+    items. While `cursor` is returned, more changes follow: pass it along with
+    the same `since` for the next page. An item may be returned again by the
+    next call, never skipped.
+    """
+    owner_id = None
+    if not crud.async_user.is_superuser(current_user):
+        owner_id = current_user.id
+    try:
+        items, deleted, watermark, next_cursor = await crud.async_item.get_changes(
+            db,
+            since=since,
+            owner_id=owner_id,
+            cursor=cursor,
+            limit=limit,
+            fields=crud.async_item.read_fields(schemas.Item),
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {
+        "items": items,
+        "deleted": deleted,
+        "watermark": watermark,
+        "cursor": next_cursor,
+    }
+
+
+@router.get(
+    "/search",
+    response_model=List[schemas.ItemSearchResult],
+    response_class=ORJSONResponse,
+)
+async def search_items(
+    response: Response,
+    db: AsyncSession = Depends(deps.get_async_read_db),
+    q: str = Query(..., min_length=1, max_length=256),
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    current_user: Principal = Depends(deps.get_current_active_principal),
+) -> Any:
+    """
+    Search the title and description of items, best matches first.
+
+    `q` takes words, `"quoted phrases"`, `or` and `-excluded` words. The
+    `X-Next-Cursor` response header holds the `cursor` of the next page.
+    """
+    owner_id = None
+    if not crud.async_user.is_superuser(current_user):
+        owner_id = current_user.id
+    try:
+        items, next_cursor = await crud.async_item.search(
+            db,
+            query=q,
+            owner_id=owner_id,
+            cursor=cursor,
+            limit=limit,
+            fields=crud.async_item.read_fields(schemas.ItemSearchResult),
         )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return items
 
 
+@router.get("/batch", response_model=schemas.ItemBulkResult)
+async def read_items_batch(
+    db: AsyncSession = Depends(deps.get_async_read_db),
+    ids: str = Query(..., regex=r"^\d+(,\d+)*$"),
+    current_user: Principal = Depends(deps.get_current_active_principal),
+) -> Any:
+    """
+    Retrieve the items with the comma-separated `ids` in one query, in the
+    order requested. Ids that are missing or belong to someone else are left
+    out and reported in `errors`, by their position in `ids`.
+    """
+    requested = [int(id) for id in ids.split(",")]
+    check_bulk_size(requested)
+    owner_id = None
+    if not crud.async_user.is_superuser(current_user):
+        owner_id = current_user.id
+    found = await crud.async_item.get_many_for_owner(
+        db,
+        ids=requested,
+        owner_id=owner_id,
+        fields=crud.async_item.read_fields(schemas.Item),
+    )
+    errors = await missing_item_errors(
+        db, ids_by_index=dict(enumerate(requested)), found=found
+    )
+    by_id = {item.id: item for item in found}
+    items = [by_id[id] for id in requested if id in by_id]
+    return {"items": items, "errors": errors}
+
+
+@router.get("/stats", response_model=schemas.ItemStats)
+async def read_item_stats(
+    db: AsyncSession = Depends(deps.get_async_read_db),
+    current_user: Principal = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Number of owners with items and of items in total.
+    """
+    owners, items = await crud.async_item.get_stats(db)
+    return {"owners": owners, "items": items}
+
+
+@router.get("/events", response_class=StreamingResponse)
+async def read_item_events(
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: Principal = Depends(deps.get_current_active_principal),
+) -> Any:
+    """
+    Stream changes to items as server-sent events, of the caller's items or all
+    items for a superuser.
+
+    Each event is a JSON object with the `op`, one of insert, update, delete or
+    import, and the item's `id`, `owner_id` and `version`. A bulk write has the
+    `owner_id`, the `count` of items and their `min_id` and `max_id` instead,
+    an import the `owner_id` and `count`. `resync` means events were lost.
+    Catch up through `/items/changes` after imports and resyncs.
+    """
+    # Only needed to authenticate, don't hold a connection while streaming
+    await db.close()
+    owner_id = None
+    if not crud.async_user.is_superuser(current_user):
+        owner_id = current_user.id
+    return StreamingResponse(
+        render_events(item_events, owner_id),
+        media_type="text/event-stream",
+        # Identity keeps GZipMiddleware from buffering the events
+        headers={"Cache-Control": "no-cache", "Content-Encoding": "identity"},
+    )
+
+
 @router.post("/", response_model=schemas.Item)
-def create_item(
+async def create_item(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     item_in: schemas.ItemCreate,
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: Principal = Depends(deps.get_current_active_principal),
 ) -> Any:
     """
     Create new item.
     """
-    item = crud.item.create_with_owner(db=db, obj_in=item_in, owner_id=current_user.id)
+    item = await crud.async_item.create_with_owner(
+        db=db, obj_in=item_in, owner_id=current_user.id
+    )
     return item
 
 
+@router.post("/bulk", response_model=schemas.ItemBulkResult)
+async def create_items_bulk(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    items_in: List[Dict[str, Any]] = Body(...),
+    current_user: Principal = Depends(deps.get_current_active_principal),
+) -> Any:
+    """
+    Create many items in one transaction.
+
+    Rows that fail validation are reported in `errors`, the others are created.
+    """
+    check_bulk_size(items_in)
+    objs_in = []
+    errors = []
+    for i, row in enumerate(items_in):
+        try:
+            objs_in.append(schemas.ItemCreate.parse_obj(row))
+        except ValidationError as e:
+            errors.append(schemas.BulkError(index=i, detail=e.errors()))
+    items = await crud.async_item.create_multi_with_owner(
+        db, objs_in=objs_in, owner_id=current_user.id
+    )
+    return {"items": items, "errors": errors}
+
+
+@router.patch("/bulk", response_model=schemas.ItemBulkResult)
+async def update_items_bulk(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    items_in: List[Dict[str, Any]] = Body(...),
+    current_user: Principal = Depends(deps.get_current_active_principal),
+) -> Any:
+    """
+    Update many items in one transaction, each row holding the item `id`.
+
+    Rows that are invalid or name an item that can't be updated are reported in
+    `errors`, the others are applied.
+    """
+    check_bulk_size(items_in)
+    objs_in = []
+    errors = []
+    ids_by_index: Dict[int, int] = {}
+    seen_ids: Set[int] = set()
+    for i, row in enumerate(items_in):
+        try:
+            item_in = schemas.ItemBulkUpdate.parse_obj(row)
+        except ValidationError as e:
+            errors.append(schemas.BulkError(index=i, detail=e.errors()))
+            continue
+        update_data = item_in.dict(exclude_unset=True)
+        if item_in.id in seen_ids:
+            errors.append(
+                schemas.BulkError(index=i, id=item_in.id, detail="Duplicate id")
+            )
+        elif len(update_data) == 1:
+            errors.append(
+                schemas.BulkError(index=i, id=item_in.id, detail="Nothing to update")
+            )
+        else:
+            ids_by_index[i] = item_in.id
+            seen_ids.add(item_in.id)
+            objs_in.append(update_data)
+    if crud.async_user.is_superuser(current_user):
+        items = await crud.async_item.update_multi(db, objs_in=objs_in)
+    else:
+        items = await crud.async_item.update_multi_by_owner(
+            db, objs_in=objs_in, owner_id=current_user.id
+        )
+    errors += await missing_item_errors(db, ids_by_index=ids_by_index, found=items)
+    errors.sort(key=lambda error: error.index)
+    return {"items": items, "errors": errors}
+
+
+@router.delete("/bulk", response_model=schemas.ItemBulkResult)
+async def delete_items_bulk(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    ids: List[int] = Body(...),
+    current_user: Principal = Depends(deps.get_current_active_principal),
+) -> Any:
+    """
+    Delete many items in one transaction.
+
+    Ids of items that can't be deleted are reported in `errors`.
+    """
+    check_bulk_size(ids)
+    errors = []
+    ids_by_index: Dict[int, int] = {}
+    seen_ids: Set[int] = set()
+    for i, id in enumerate(ids):
+        if id in seen_ids:
+            errors.append(schemas.BulkError(index=i, id=id, detail="Duplicate id"))
+        else:
+            ids_by_index[i] = id
+            seen_ids.add(id)
+    if crud.async_user.is_superuser(current_user):
+        items = await crud.async_item.remove_multi(db, ids=list(seen_ids))
+    else:
+        items = await crud.async_item.remove_multi_by_owner(
+            db, ids=list(seen_ids), owner_id=current_user.id
+        )
+    errors += await missing_item_errors(db, ids_by_index=ids_by_index, found=items)
+    errors.sort(key=lambda error: error.index)
+    return {"items": items, "errors": errors}
+
+
+@router.post("/import", response_model=schemas.ItemImport, status_code=202)
+async def import_items(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    file: UploadFile = File(...),
+    format: ExportFormat = ExportFormat.ndjson,
+    current_user: Principal = Depends(deps.get_current_active_principal),
+) -> Any:
+    """
+    Import items from an NDJSON or CSV file, e.g. one made by `/items/export`.
+
+    The file is loaded in the background, poll `/items/import/{id}` for the
+    progress. Rows that fail validation are counted and skipped.
+    """
+    path = await run_in_threadpool(spool_upload, file.file)
+    job_in = schemas.ItemImportCreate(format=format.value)
+    job = await crud.async_item_import.create_with_owner(
+        db, obj_in=job_in, owner_id=current_user.id
+    )
+    os.replace(path, spool_path(job.id))
+    celery_app.send_task("app.worker.import_items", args=[job.id])
+    return job
+
+
+@router.get("/import/{id}", response_model=schemas.ItemImport)
+async def read_item_import(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    id: int,
+    current_user: Principal = Depends(deps.get_current_active_principal),
+) -> Any:
+    """
+    Get the progress of an item import.
+    """
+    job = await crud.async_item_import.get(db, id=id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import not found")
+    if job.owner_id != current_user.id and not crud.async_user.is_superuser(
+        current_user
+    ):
+        raise HTTPException(status_code=400, detail="Not enough permissions")
+    return job
+
+
 @router.put("/{id}", response_model=schemas.Item)
-def update_item(
+async def update_item(
     *,
-    db: Session = Depends(deps.get_db),
+    response: Response,
+    db: AsyncSession = Depends(deps.get_async_db),
     id: int,
     item_in: schemas.ItemUpdate,
-    current_user: models.User = Depends(deps.get_current_active_user),
+    if_match: Optional[str] = Header(None),
+    current_user: Principal = Depends(deps.get_current_active_principal),
 ) -> Any:
     """
-    Update an item.
+    Update an item, only if it still matches the `If-Match` ETag when given.
     """
-    item = crud.item.get(db=db, id=id)
-    if not item:
+    try:
+        found, item = await crud.async_item.update_for_owner(
+            db=db,
+            id=id,
+            obj_in=item_in,
+            owner_id=current_user.id,
+            superuser=crud.async_user.is_superuser(current_user),
+            versions=etag_versions(if_match, id) if if_match else None,
+        )
+    except VersionConflict as e:
+        raise HTTPException(
+            status_code=412,
+            detail="Item was modified",
+            headers={"ETag": make_etag(id, e.version)},
+        )
+    if not found:
         raise HTTPException(status_code=404, detail="Item not found")
-    if not crud.user.is_superuser(current_user) and (item.owner_id != current_user.id):
+    if not item:
         raise HTTPException(status_code=400, detail="Not enough permissions")
-    item = crud.item.update(db=db, db_obj=item, obj_in=item_in)
+    response.headers["ETag"] = make_etag(item.id, item.version)
     return item
 
 
 @router.get("/{id}", response_model=schemas.Item)
-def read_item(
+async def read_item(
     *,
-    db: Session = Depends(deps.get_db),
+    response: Response,
+    db: AsyncSession = Depends(deps.get_async_read_db),
     id: int,
-    current_user: models.User = Depends(deps.get_current_active_user),
+    if_none_match: Optional[str] = Header(None),
+    current_user: Principal = Depends(deps.get_current_active_principal),
 ) -> Any:
     """
-    Get item by ID.
+    Get item by ID, or 304 when it still matches the `If-None-Match` ETag.
     """
-    item = crud.item.get(db=db, id=id)
-    if not item:
+    superuser = crud.async_user.is_superuser(current_user)
+    if if_none_match:
+        found, version = await crud.async_item.get_version_for_owner(
+            db=db, id=id, owner_id=current_user.id, superuser=superuser
+        )
+        if found and version is not None:
+            unchanged = not_modified(if_none_match, make_etag(id, version))
+            if unchanged:
+                return unchanged
+    found, item = await crud.async_item.get_for_owner(
+        db=db, id=id, owner_id=current_user.id, superuser=superuser
+    )
+    if not found:
         raise HTTPException(status_code=404, detail="Item not found")
-    if not crud.user.is_superuser(current_user) and (item.owner_id != current_user.id):
+    if not item:
         raise HTTPException(status_code=400, detail="Not enough permissions")
+    response.headers["ETag"] = make_etag(item.id, item.version)
     return item
 
 
 @router.delete("/{id}", response_model=schemas.Item)
-def delete_item(
+async def delete_item(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     id: int,
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: Principal = Depends(deps.get_current_active_principal),
 ) -> Any:
     """
     Delete an item.
     """
-    item = crud.item.get(db=db, id=id)
-    if not item:
+    found, item = await crud.async_item.delete_for_owner(
+        db=db,
+        id=id,
+        owner_id=current_user.id,
+        superuser=crud.async_user.is_superuser(current_user),
+    )
+    if not found:
         raise HTTPException(status_code=404, detail="Item not found")
-    if not crud.user.is_superuser(current_user) and (item.owner_id != current_user.id):
+    if not item:
         raise HTTPException(status_code=400, detail="Not enough permissions")
-    item = crud.item.remove(db=db, id=id)
     return item
@@ -1,60 +1,134 @@
-from typing import Any, List
+from typing import Any, List, Optional
 
-from fastapi import APIRouter, Body, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Response
 from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
 from pydantic.networks import EmailStr
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
 from app import crud, models, schemas
 from app.api import deps
+from app.api.etag import make_etag, not_modified
+from app.api.fields import parse_fields, sparse_schema
+from app.api.responses import render_models, render_rows
 from app.core.config import settings
+from app.core.security import Principal
+from app.crud.pagination import InvalidCursor
 from app.utils import send_new_account_email
 
 router = APIRouter()
 
 
-@router.get("/", response_model=List[schemas.User])
-def read_users(
-    db: Session = Depends(deps.get_db),
+@router.get("/", response_model=List[schemas.User], response_class=ORJSONResponse)
+async def read_users(
+    response: Response,
+    db: AsyncSession = Depends(deps.get_async_read_db),
     skip: int = 0,
     limit: int = 100,
-    current_user: models.User = Depends(deps.get_current_active_superuser),
+    cursor: Optional[str] = None,
+    order_by: str = Query("id", regex="^(id|email)$"),
+    fields: Optional[str] = None,
+    current_user: Principal = Depends(deps.get_current_active_superuser),
 ) -> Any:
     """
-    Retrieve users.
+    Retrieve users, ordered by id or email.
+
+    The `X-Next-Cursor` response header holds the `cursor` of the next page.
+    `skip` is still accepted but gets slower the deeper the page.
+
+    `fields` restricts the users to a comma-separated list of their fields,
+    e.g. `id,email`, only those columns are read.
     """
-    users = crud.user.get_multi(db, skip=skip, limit=limit)
+    # Rows of the schema's columns, or the requested ones, no ORM instances
+    available = crud.async_user.read_fields(schemas.User)
+    sparse_fields = parse_fields(fields, available)
+    selected = sparse_fields or available
+    next_cursor = None
+    try:
+        if skip and cursor is None:
+            users = await crud.async_user.get_multi(
+                db, skip=skip, limit=limit, fields=selected
+            )
+        else:
+            users, next_cursor = await crud.async_user.get_page(
+                db, cursor=cursor, limit=limit, order_by=order_by, fields=selected
+            )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    if settings.TRUSTED_LIST_RESPONSES:
+        content = render_rows(users, sparse_fields)
+        return Response(content, media_type="application/json", headers=headers)
+    if sparse_fields:
+        schema = sparse_schema(schemas.User, tuple(sparse_fields))
+        content = render_models(users, schema)
+        return Response(content, media_type="application/json", headers=headers)
+    response.headers.update(headers)
+    return users
+
+
+@router.get(
+    "/with-item-counts",
+    response_model=List[schemas.UserWithItemCount],
+    response_class=ORJSONResponse,
+)
+async def read_users_with_item_counts(
+    response: Response,
+    db: AsyncSession = Depends(deps.get_async_read_db),
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    order_by: str = Query("id", regex="^(id|email)$"),
+    current_user: Principal = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Retrieve users with the number of items each owns, ordered by id or email.
+
+    The `X-Next-Cursor` response header holds the `cursor` of the next page.
+    """
+    fields = crud.async_user.read_fields(schemas.UserWithItemCount)
+    try:
+        users, next_cursor = await crud.async_user.get_page_with_item_counts(
+            db, cursor=cursor, limit=limit, order_by=order_by, fields=fields
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return users
 
 
 @router.post("/", response_model=schemas.User)
-def create_user(
+async def create_user(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     user_in: schemas.UserCreate,
-    current_user: models.User = Depends(deps.get_current_active_superuser),
+    current_user: Principal = Depends(deps.get_current_active_superuser),
 ) -> Any:
     """
     Create new user.
     """
-    user = crud.user.get_by_email(db, email=user_in.email)
+    user = await crud.async_user.get_by_email(db, email=user_in.email)
     if user:
         raise HTTPException(
             status_code=400,
             detail="The user with this username already exists in the system.",
         )
-    user = crud.user.create(db, obj_in=user_in)
+    user = await crud.async_user.create(db, obj_in=user_in)
     if settings.EMAILS_ENABLED and user_in.email:
-        send_new_account_email(
-            email_to=user_in.email, username=user_in.email, password=user_in.password
+        await run_in_threadpool(
+            send_new_account_email,
+            email_to=user_in.email,
+            username=user_in.email,
+            password=user_in.password,
         )
     return user
 
 
 @router.put("/me", response_model=schemas.User)
-def update_user_me(
+async def update_user_me(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     password: str = Body(None),
     full_name: str = Body(None),
     email: EmailStr = Body(None),
@@ -71,25 +145,37 @@ def update_user_me(
         user_in.full_name = full_name
     if email is not None:
         user_in.email = email
-    user = crud.user.update(db, db_obj=current_user, obj_in=user_in)
+    user = await crud.async_user.update(db, db_obj=current_user, obj_in=user_in)
     return user
 
 
 @router.get("/me", response_model=schemas.User)
-def read_user_me(
-    db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_active_user),
+async def read_user_me(
+    response: Response,
+    db: AsyncSession = Depends(deps.get_async_read_db),
+    if_none_match: Optional[str] = Header(None),
+    current_user: Principal = Depends(deps.get_current_active_principal),
 ) -> Any:
     """
-    Get current user.
+    Get current user, or 304 when it still matches the `If-None-Match` ETag.
     """
-    return current_user
+    if if_none_match:
+        version = await crud.async_user.get_version(db, id=current_user.id)
+        if version is not None:
+            unchanged = not_modified(if_none_match, make_etag(current_user.id, version))
+            if unchanged:
+                return unchanged
+    user = await crud.async_user.get(db, id=current_user.id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    response.headers["ETag"] = make_etag(user.id, user.version)
+    return user
 
 
 @router.post("/open", response_model=schemas.User)
-def create_user_open(
+async def create_user_open(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     password: str = Body(...),
     email: EmailStr = Body(...),
     full_name: str = Body(None),
@@ -102,52 +188,78 @@ def create_user_open(
             status_code=403,
             detail="Open user registration is forbidden on this server",
         )
-    user = crud.user.get_by_email(db, email=email)
+    user = await crud.async_user.get_by_email(db, email=email)
     if user:
         raise HTTPException(
             status_code=400,
             detail="The user with this username already exists in the system",
         )
     user_in = schemas.UserCreate(password=password, email=email, full_name=full_name)
-    user = crud.user.create(db, obj_in=user_in)
+    user = await crud.async_user.create(db, obj_in=user_in)
     return user
 
 
 @router.get("/{user_id}", response_model=schemas.User)
-def read_user_by_id(
+async def read_user_by_id(
     user_id: int,
-    current_user: models.User = Depends(deps.get_current_active_user),
-    db: Session = Depends(deps.get_db),
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user: Principal = Depends(deps.get_current_active_principal),
+    db: AsyncSession = Depends(deps.get_async_read_db),
 ) -> Any:
     """
-    Get a specific user by id.
+    Get a specific user by id, or 304 when it still matches the `If-None-Match`
+    ETag.
     """
-    user = crud.user.get(db, id=user_id)
-    if user == current_user:
-        return user
-    if not crud.user.is_superuser(current_user):
+    if user_id != current_user.id and not crud.async_user.is_superuser(current_user):
         raise HTTPException(
             status_code=400, detail="The user doesn't have enough privileges"
         )
+    if if_none_match:
+        version = await crud.async_user.get_version(db, id=user_id)
+        if version is not None:
+            unchanged = not_modified(if_none_match, make_etag(user_id, version))
+            if unchanged:
+                return unchanged
+    user = await crud.async_user.get(db, id=user_id)
+    if user:
+        response.headers["ETag"] = make_etag(user.id, user.version)
     return user
 
 
+@router.get("/{user_id}/stats", response_model=schemas.OwnerItemStats)
+async def read_user_stats(
+    user_id: int,
+    current_user: Principal = Depends(deps.get_current_active_principal),
+    db: AsyncSession = Depends(deps.get_async_read_db),
+) -> Any:
+    """
+    Number of items a specific user owns.
+    """
+    if user_id != current_user.id and not crud.async_user.is_superuser(current_user):
+        raise HTTPException(
+            status_code=400, detail="The user doesn't have enough privileges"
+        )
+    item_count = await crud.async_item.get_stats_for_owner(db, owner_id=user_id)
+    return {"owner_id": user_id, "item_count": item_count}
+
+
 @router.put("/{user_id}", response_model=schemas.User)
-def update_user(
+async def update_user(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     user_id: int,
     user_in: schemas.UserUpdate,
-    current_user: models.User = Depends(deps.get_current_active_superuser),
+    current_user: Principal = Depends(deps.get_current_active_superuser),
 ) -> Any:
     """
     Update a user.
     """
-    user = crud.user.get(db, id=user_id)
+    user = await crud.async_user.get(db, id=user_id)
     if not user:
         raise HTTPException(
             status_code=404,
             detail="The user with this username does not exist in the system",
         )
-    user = crud.user.update(db, db_obj=user, obj_in=user_in)
+    user = await crud.async_user.update(db, db_obj=user, obj_in=user_in)
     return user
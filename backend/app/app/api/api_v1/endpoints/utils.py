@@ -1,11 +1,15 @@
-from typing import Any
+from typing import Any, Dict
 
 from fastapi import APIRouter, Depends
 from pydantic.networks import EmailStr
 
-from app import models, schemas
+from app import schemas
 from app.api import deps
 from app.core.celery_app import celery_app
+from app.core.hashing import password_hasher
+from app.core.security import Principal
+from app.crud.cache import entity_cache
+from app.db.session import pool_monitors
 from app.utils import send_test_email
 
 router = APIRouter()
@@ -14,7 +18,7 @@ router = APIRouter()
 @router.post("/test-celery/", response_model=schemas.Msg, status_code=201)
 def test_celery(
     msg: schemas.Msg,
-    current_user: models.User = Depends(deps.get_current_active_superuser),
+    current_user: Principal = Depends(deps.get_current_active_superuser),
 ) -> Any:
     """
     Test Celery worker.
@@ -26,10 +30,42 @@ def test_celery(
 @router.post("/test-email/", response_model=schemas.Msg, status_code=201)
 def test_email(
     email_to: EmailStr,
-    current_user: models.User = Depends(deps.get_current_active_superuser),
+    current_user: Principal = Depends(deps.get_current_active_superuser),
 ) -> Any:
     """
     Test emails.
     """
     send_test_email(email_to=email_to)
     return {"msg": "Test email sent"}
+
+
+@router.get("/metrics/password-hasher", response_model=schemas.PasswordHasherMetrics)
+def read_password_hasher_metrics(
+    current_user: Principal = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Password hashing pool saturation.
+    """
+    return password_hasher.metrics()
+
+
+@router.get("/metrics/db-pool", response_model=Dict[str, schemas.PoolMetrics])
+def read_db_pool_metrics(
+    current_user: Principal = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Connection pool usage of each database engine.
+    """
+    return {name: monitor.metrics() for name, monitor in pool_monitors.items()}
+
+
+@router.get(
+    "/metrics/entity-cache", response_model=Dict[str, schemas.EntityCacheMetrics]
+)
+def read_entity_cache_metrics(
+    current_user: Principal = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Hits and misses of the entity cache, per table.
+    """
+    return entity_cache.metrics()
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+import orjson
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.types import ASGIApp, Message, Scope
+
+from app.core.config import settings
+from app.core.security import Principal
+from app.db.routing import ReplicaRouter
+from app.schemas.batch import BatchRequest, BatchResponse
+
+logger = logging.getLogger(__name__)
+
+# Sub-requests that do not write, consecutive ones run concurrently
+CONCURRENT_METHODS = {"GET"}
+# Headers of the batch request every sub-request carries
+FORWARDED_HEADERS = ("authorization", "host")
+
+
+def _error(status: int, detail: str) -> BatchResponse:
+    return BatchResponse(
+        status=status,
+        headers={"content-type": "application/json"},
+        body={"detail": detail},
+    )
+
+
+async def dispatch(
+    app: ASGIApp, scope: Scope, request: BatchRequest, state: Dict[str, Any]
+) -> BatchResponse:
+    """
+    Run a sub-request through `app` in-process, as if it came in next to the
+    batch request of `scope`, and collect its response.
+
+    `state` becomes the sub-request's `request.state`, which the dependencies
+    read the principal and session the batch shares from.
+    """
+    path, _, query = request.path.partition("?")
+    if path.rstrip("/") == "/batch":
+        return _error(400, "Batches cannot be nested")
+    path = f"{settings.API_V1_STR}{path}"
+    headers = {name.lower(): value for name, value in request.headers.items()}
+    # Encoding is left to the batch response
+    headers.pop("accept-encoding", None)
+    for name, value in scope["headers"]:
+        if name.decode("latin-1") in FORWARDED_HEADERS:
+            headers[name.decode("latin-1")] = value.decode("latin-1")
+    body = b"" if request.body is None else orjson.dumps(request.body)
+    if body:
+        headers["content-type"] = "application/json"
+    headers["content-length"] = str(len(body))
+    sub_scope = {
+        "type": "http",
+        "asgi": scope.get("asgi", {"version": "3.0"}),
+        "http_version": scope.get("http_version", "1.1"),
+        "method": request.method,
+        "scheme": scope["scheme"],
+        "server": scope.get("server"),
+        "client": scope.get("client"),
+        "root_path": scope.get("root_path", ""),
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": [
+            (name.encode("latin-1"), value.encode("latin-1"))
+            for name, value in headers.items()
+        ],
+        "state": dict(state),
+    }
+    received = False
+
+    async def receive() -> Message:
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # The client stays connected until the sub-request is done
+        await asyncio.Future()
+        raise AssertionError
+
+    start: Optional[Message] = None
+    chunks: List[bytes] = []
+    streaming = asyncio.Event()
+
+    async def send(message: Message) -> None:
+        nonlocal start
+        if message["type"] == "http.response.start":
+            start = message
+            content_type = dict(message["headers"]).get(b"content-type", b"")
+            if content_type.startswith(b"text/event-stream"):
+                streaming.set()
+        elif message["type"] == "http.response.body" and not streaming.is_set():
+            chunks.append(message.get("body", b""))
+
+    call = asyncio.ensure_future(app(sub_scope, receive, send))
+    stream_started = asyncio.ensure_future(streaming.wait())
+    await asyncio.wait({call, stream_started}, return_when=asyncio.FIRST_COMPLETED)
+    stream_started.cancel()
+    if not call.done():
+        # An event stream never ends
+        call.cancel()
+        return _error(400, "Event streams cannot be batched")
+    error = call.exception()
+    if error is not None:
+        logger.error("Batched %s %s failed", request.method, path, exc_info=error)
+    if start is None:
+        return _error(500, "Internal Server Error")
+    response_headers = {
+        name.decode("latin-1"): value.decode("latin-1")
+        for name, value in start["headers"]
+    }
+    content = b"".join(chunks)
+    decoded: Any = None
+    if response_headers.get("content-type", "").startswith("application/json"):
+        decoded = orjson.loads(content) if content else None
+    elif content:
+        decoded = content.decode("utf-8", "replace")
+    return BatchResponse(status=start["status"], headers=response_headers, body=decoded)
+
+
+async def run_batch(
+    app: ASGIApp,
+    scope: Scope,
+    requests: List[BatchRequest],
+    *,
+    principal: Principal,
+    db: AsyncSession,
+    router: ReplicaRouter,
+    read_after: Optional[str] = None,
+) -> List[BatchResponse]:
+    """
+    Run `requests` in order, each seeing the effects of the writes before it.
+    Consecutive reads run concurrently, at most `BATCH_READ_CONCURRENCY` at a
+    time, each on a session of its own as one session runs a single query at a
+    time.
+    Writes run one by one on `db`. All share the `principal` authenticated once
+    for the batch.
+
+    Reads skip the replicas of `router` lagging behind `read_after`, the WAL
+    position of the client's last write, or behind the batch's own writes once
+    there are some.
+    """
+    responses: List[BatchResponse] = []
+    reads: List[BatchRequest] = []
+    wrote = False
+    slots = asyncio.Semaphore(settings.BATCH_READ_CONCURRENCY)
+
+    async def read(request: BatchRequest, state: Dict[str, Any]) -> BatchResponse:
+        async with slots:
+            return await dispatch(app, scope, request, state)
+
+    async def run_reads() -> None:
+        nonlocal read_after, wrote
+        if not reads:
+            return
+        if wrote and router.replicas:
+            read_after = await router.primary_lsn()
+            wrote = False
+        state = {"batch_principal": principal, "batch_read_after": read_after}
+        responses.extend(await asyncio.gather(*[read(r, state) for r in reads]))
+        reads.clear()
+
+    for request in requests:
+        if request.method in CONCURRENT_METHODS:
+            reads.append(request)
+            continue
+        await run_reads()
+        state = {"batch_principal": principal, "batch_db": db}
+        responses.append(await dispatch(app, scope, request, state))
+        wrote = True
+        if db.in_transaction():
+            # Writes commit what they do, work left uncommitted is that of a
+            # failed one and would fail the writes after it
+            await db.rollback()
+    await run_reads()
+    return responses
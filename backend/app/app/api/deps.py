@@ -1,15 +1,16 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 from pydantic import ValidationError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import crud, models, schemas
 from app.core import security
 from app.core.config import settings
-from app.db.session import SessionLocal
+from app.db.routing import LSN_COOKIE
+from app.db.session import AsyncSessionLocal, SessionLocal, replica_router
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
@@ -24,9 +25,32 @@ def get_db() -> Generator:
         db.close()
 
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)
-) -> models.User:
+async def get_async_db(request: Request) -> AsyncGenerator:
+    batch_db = getattr(request.state, "batch_db", None)
+    if batch_db is not None:
+        # A sub-request of a batch, the batch closes the session it shares
+        yield batch_db
+        return
+    db = AsyncSessionLocal()
+    # Commits mark the request as writing, see `keep_writer_on_primary`
+    db.info["request_state"] = request.state
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+async def get_current_principal(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    token: str = Depends(reusable_oauth2),
+) -> security.Principal:
+    # Sub-requests of a batch share the principal it authenticated
+    principal = getattr(request.state, "batch_principal", None)
+    if principal is None:
+        principal = security.get_cached_principal(token)
+    if principal is not None:
+        return principal
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
@@ -37,25 +61,66 @@ def get_current_user(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = crud.user.get(db, id=token_data.sub)
+    user = await crud.async_user.get(db, id=token_data.sub)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    principal = security.Principal(
+        id=user.id, is_active=user.is_active, is_superuser=user.is_superuser
+    )
+    security.cache_principal(token, payload, principal)
+    return principal
+
+
+async def get_async_read_db(
+    request: Request,
+    principal: security.Principal = Depends(get_current_principal),
+) -> AsyncGenerator:
+    """
+    Session on a read replica, for endpoints that do not write. Falls back to
+    the primary, and skips replicas lagging behind the client's last write.
+    """
+    # Reads of a batch follow its writes, see `run_batch`
+    read_after = getattr(request.state, "batch_read_after", None)
+    if read_after is None:
+        read_after = request.cookies.get(LSN_COOKIE)
+    db = await replica_router.session(read_after)
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+async def get_current_user(
+    db: AsyncSession = Depends(get_async_db),
+    principal: security.Principal = Depends(get_current_principal),
+) -> models.User:
+    user = await crud.async_user.get(db, id=principal.id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 
+def get_current_active_principal(
+    principal: security.Principal = Depends(get_current_principal),
+) -> security.Principal:
+    if not crud.async_user.is_active(principal):
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return principal
+
+
 def get_current_active_user(
     current_user: models.User = Depends(get_current_user),
 ) -> models.User:
-    if not crud.user.is_active(current_user):
+    if not crud.async_user.is_active(current_user):
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
 
 def get_current_active_superuser(
-    current_user: models.User = Depends(get_current_user),
-) -> models.User:
-    if not crud.user.is_superuser(current_user):
+    principal: security.Principal = Depends(get_current_principal),
+) -> security.Principal:
+    if not crud.async_user.is_superuser(principal):
         raise HTTPException(
             status_code=400, detail="The user doesn't have enough privileges"
         )
-    return current_user
+    return principal
@@ -0,0 +1,37 @@
+from typing import Any, List, Optional
+
+from fastapi import Response
+
+
+def make_etag(id: Any, version: int) -> str:
+    return f'"{id}-{version}"'
+
+
+def etag_versions(if_match: str, id: Any) -> Optional[List[int]]:
+    """
+    Versions of row `id` an `If-Match` header accepts, None for `*`.
+    """
+    versions = []
+    for tag in if_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return None
+        row_id, _, version = tag.strip('"').rpartition("-")
+        if row_id == str(id) and version.isdigit():
+            versions.append(int(version))
+    return versions
+
+
+def not_modified(if_none_match: Optional[str], etag: str) -> Optional[Response]:
+    """
+    A 304 response when `If-None-Match` lists `etag`, compared weakly.
+    """
+    if not if_none_match:
+        return None
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag in ("*", etag):
+            return Response(status_code=304, headers={"ETag": etag})
+    return None
@@ -0,0 +1,37 @@
+import asyncio
+from typing import AsyncIterator, Optional
+
+import orjson
+from sqlalchemy.engine import make_url
+
+from app.core.config import settings
+from app.crud.crud_item import ITEM_CHANGES_CHANNEL
+from app.db.listener import ChangeListener
+
+item_events = ChangeListener(
+    make_url(str(settings.SQLALCHEMY_ASYNC_DATABASE_URI))
+    .set(drivername="postgresql")
+    .render_as_string(hide_password=False),
+    ITEM_CHANGES_CHANNEL,
+    queue_size=settings.EVENTS_QUEUE_SIZE,
+)
+
+
+async def render_events(
+    listener: ChangeListener, owner_id: Optional[int]
+) -> AsyncIterator[bytes]:
+    """
+    Server-sent events of `listener`, a comment line when idle keeps proxies
+    from closing the stream. Ends when the client disconnects.
+    """
+    async with listener.subscribe(owner_id) as queue:
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    queue.get(), settings.EVENTS_KEEPALIVE_SECONDS
+                )
+            except asyncio.TimeoutError:
+                await listener.listen()
+                yield b": keepalive\n\n"
+                continue
+            yield b"data: " + orjson.dumps(event) + b"\n\n"
@@ -0,0 +1,41 @@
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple, Type
+
+from fastapi import HTTPException
+from pydantic import BaseModel, create_model
+
+
+def parse_fields(
+    fields: Optional[str], available: Sequence[str]
+) -> Optional[List[str]]:
+    """
+    Names listed by a comma-separated `fields` query parameter, each once and
+    in the order given, None when there is no parameter. Raises a 400 error for
+    names not in `available`.
+    """
+    if fields is None:
+        return None
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",")))
+    names = [name for name in names if name]
+    if not names:
+        raise HTTPException(status_code=400, detail="No fields requested")
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown fields: {', '.join(unknown)}"
+        )
+    return names
+
+
+@lru_cache(maxsize=256)
+def sparse_schema(schema: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """
+    `schema` restricted to `fields`, which keep their type and default.
+    """
+    definitions = {}
+    for name in fields:
+        field = schema.__fields__[name]
+        definitions[name] = (field.outer_type_, field.field_info)
+    return create_model(  # type: ignore
+        f"{schema.__name__}Fields", __config__=schema.__config__, **definitions
+    )
@@ -0,0 +1,64 @@
+import csv
+import io
+from enum import Enum
+from typing import Any, AsyncIterator, Optional, Sequence, Type
+
+import orjson
+from pydantic import BaseModel
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
+
+def render_rows(rows: Sequence[Any], fields: Optional[Sequence[str]] = None) -> bytes:
+    """
+    Trusted output: encode column tuples, e.g. `select(...)` rows limited to the
+    response schema's fields, as a JSON list of objects without validating them
+    against the schema first. With `fields`, objects hold only those columns.
+    """
+    if fields is None:
+        return orjson.dumps([row._asdict() for row in rows])
+    return orjson.dumps([{name: getattr(row, name) for name in fields} for row in rows])
+
+
+def render_models(rows: Sequence[Any], schema: Type[BaseModel]) -> bytes:
+    """
+    Validate rows against `schema`, e.g. one from `sparse_schema`, and encode
+    them as a JSON list of objects.
+    """
+    return orjson.dumps([schema.from_orm(row).dict() for row in rows])
+
+
+async def render_ndjson(chunks: AsyncIterator[Sequence[Any]]) -> AsyncIterator[bytes]:
+    """
+    Encode chunks of column tuples as newline-delimited JSON, one body part per
+    chunk.
+    """
+    async for rows in chunks:
+        yield b"".join(orjson.dumps(row._asdict()) + b"\n" for row in rows)
+
+
+async def render_csv(
+    chunks: AsyncIterator[Sequence[Any]], fields: Sequence[str]
+) -> AsyncIterator[bytes]:
+    """
+    Encode chunks of column tuples as CSV rows after a header of `fields`, one
+    body part per chunk. `None` becomes an empty value.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    yield buffer.getvalue().encode()
+    async for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
@@ -0,0 +1,101 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.core.security import get_password_hash, verify_password
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+def default_workers() -> int:
+    """
+    An even share of the CPUs for each server process. Every process runs a
+    pool of its own, `WEB_CONCURRENCY` processes, one per CPU in the gunicorn
+    image when unset, would otherwise start as many hashing processes each.
+    """
+    cpus = os.cpu_count() or 1
+    concurrency = settings.WEB_CONCURRENCY or cpus
+    return max(cpus // concurrency, 1)
+
+
+class PasswordHasher:
+    def __init__(self, *, max_workers: Optional[int] = None, max_pending: int = 0):
+        """
+        Runs bcrypt hashing and verification in a dedicated process pool, so it
+        neither holds the GIL nor ties up the request threadpool.
+
+        At most `max_workers` jobs run at a time and at most `max_pending` more
+        wait in the queue; anything beyond that raises `PasswordHasherBusy`.
+
+        **Parameters**
+
+        * `max_workers`: Number of hashing processes, defaults to
+            `default_workers()`
+        * `max_pending`: Number of jobs allowed to wait for a free process
+        """
+        self.max_workers = max_workers or default_workers()
+        self.max_pending = max_pending
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def queued(self) -> int:
+        return max(self.in_flight - self.max_workers, 0)
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self.in_flight >= self.max_workers + self.max_pending:
+            self.rejected += 1
+            raise PasswordHasherBusy()
+        if self._executor is None:
+            # Spawn rather than fork, the server process already runs threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        loop = asyncio.get_event_loop()
+        self.in_flight += 1
+        try:
+            result = await loop.run_in_executor(self._executor, fn, *args)
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        self.completed += 1
+        return result
+
+
+password_hasher = PasswordHasher(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
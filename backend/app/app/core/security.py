@@ -1,9 +1,12 @@
+import hashlib
+import time
 from datetime import datetime, timedelta
-from typing import Any, Union
+from typing import Any, Dict, NamedTuple, Optional, Tuple, Union
 
 from jose import jwt
 from passlib.context import CryptContext
 
+from app.core.cache import TTLCache
 from app.core.config import settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -12,8 +15,25 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 ALGORITHM = "HS256"
 
 
+class Principal(NamedTuple):
+    """
+    The authenticated user, as far as authorization checks are concerned.
+    """
+
+    id: int
+    is_active: bool
+    is_superuser: bool
+
+
+# token digest -> (decoded payload, principal), tagged with the user id
+principal_cache: TTLCache[Tuple[Dict[str, Any], Principal]] = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+
 def create_access_token(
-    subject: Union[str, Any], expires_delta: timedelta = None
+    subject: Union[str, Any], expires_delta: Optional[timedelta] = None
 ) -> str:
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -32,3 +52,32 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def get_cached_principal(token: str) -> Optional[Principal]:
+    entry = principal_cache.get(token_digest(token))
+    if entry is None:
+        return None
+    return entry[1]
+
+
+def cache_principal(token: str, payload: Dict[str, Any], principal: Principal) -> None:
+    ttl = settings.PRINCIPAL_CACHE_TTL_SECONDS
+    if "exp" in payload:
+        # Never keep a token around longer than it is valid
+        ttl = min(ttl, payload["exp"] - time.time())
+    principal_cache.set(
+        token_digest(token), (payload, principal), ttl=ttl, tags=[principal.id]
+    )
+
+
+def invalidate_principal(user_id: int) -> None:
+    """
+    Drop the cached principals of `user_id` in this process. Other processes
+    keep theirs until they expire, see `PRINCIPAL_CACHE_TTL_SECONDS`.
+    """
+    principal_cache.invalidate_tag(user_id)
@@ -1,5 +1,6 @@
-from .crud_item import item
-from .crud_user import user
+from .crud_item import async_item, item
+from .crud_item_import import async_item_import, item_import
+from .crud_user import async_user, user
 
 # For a new basic set of CRUD operations you could just do
 
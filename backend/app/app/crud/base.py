@@ -1,9 +1,45 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from functools import partial
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
+from sqlalchemy import Column, any_, delete, insert, inspect, literal, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from sqlalchemy.sql import ClauseElement, ColumnElement, Select
+from sqlalchemy.sql.base import ExecutableOption
 
+from app.crud.bulk import (
+    delete_statements,
+    insert_statements,
+    returning,
+    update_statements,
+)
+from app.crud.cache import entity_cache, from_row, to_row
+from app.crud.events import (
+    BulkNotification,
+    Notification,
+    bulk_change_notification,
+    change_notification,
+    operation,
+)
+from app.crud.pagination import key_columns, keyset_page, keyset_select
 from app.db.base_class import Base
 
 ModelType = TypeVar("ModelType", bound=Base)
@@ -11,7 +47,34 @@ CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
 
-class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+class VersionConflict(Exception):
+    """
+    The row exists but its version is not the one the caller expected.
+    """
+
+    def __init__(self, version: int):
+        super().__init__(version)
+        self.version = version
+
+
+class CRUDStatements(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    """
+    Statements of the CRUD operations, run by `CRUDBase` on a `Session` and by
+    `AsyncCRUDBase` on an `AsyncSession`, which only execute them.
+    """
+
+    # Columns `get_page` may order by, each should be backed by an index
+    keyset_columns: Tuple[str, ...] = ("id",)
+    # Rows per statement in the *_multi methods, keeps under the bind parameter limit
+    bulk_chunk_size = 1000
+    # Seconds rows fetched by `get` stay in `entity_cache`, 0 disables caching
+    cache_ttl: float = 0
+    # Column partitioning the rows, e.g. the owner, sent along with the changes
+    list_scope: Optional[str] = None
+    # Channel the writes announce their rows on with NOTIFY, each row of a
+    # single-row write, all rows of a bulk statement at once
+    notify_channel: Optional[str] = None
+
     def __init__(self, model: Type[ModelType]):
         """
         CRUD object with default methods to Create, Read, Update, Delete (CRUD).
@@ -22,45 +85,547 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         * `schema`: A Pydantic model (schema) class
         """
         self.model = model
+        self.column_names = frozenset(a.key for a in inspect(model).column_attrs)
+
+    @staticmethod
+    def _rows(result: Any, fields: Optional[Sequence[str]]) -> List[Any]:
+        # Instances of the model without `fields`, plain rows with them
+        return result.scalars().all() if fields is None else result.all()
+
+    def _cache_key(self, id: Any) -> Tuple[str, Any]:
+        return self.model.__tablename__, id
+
+    def _cached_row(self, id: Any) -> Optional[Dict[str, Any]]:
+        if not self.cache_ttl:
+            return None
+        return entity_cache.lookup(self._cache_key(id), ttl=self.cache_ttl)
+
+    def _invalidate(self, db_objs: Sequence[ModelType]) -> None:
+        for db_obj in db_objs:
+            entity_cache.invalidate(self._cache_key(db_obj.id))
+
+    def _notification(self, op: str) -> Optional[Notification]:
+        """
+        Announcement of each row written by `op` on `notify_channel`, holding
+        its id, `list_scope` column and version.
+        """
+        if self.notify_channel is None:
+            return None
+        names = ["id"]
+        if self.list_scope is not None:
+            names.append(self.list_scope)
+        if "version" in self.column_names:
+            names.append("version")
+        return partial(
+            change_notification,
+            channel=self.notify_channel,
+            table=self.model.__tablename__,
+            op=op,
+            names=names,
+        )
+
+    def _bulk_notification(self, op: str) -> Optional[BulkNotification]:
+        """
+        Announcement of all rows written by a bulk `op` statement on
+        `notify_channel`, one per `list_scope` value with the count and id
+        range of its rows.
+        """
+        if self.notify_channel is None:
+            return None
+        return partial(
+            bulk_change_notification,
+            channel=self.notify_channel,
+            table=self.model.__tablename__,
+            op=op,
+            scope=self.list_scope,
+        )
+
+    def read_fields(self, schema: Type[BaseModel]) -> List[str]:
+        """
+        Fields of `schema` that are columns, for the `fields` of the read model.
+        """
+        return [name for name in schema.__fields__ if name in self.column_names]
+
+    def _read_select(
+        self,
+        fields: Optional[Sequence[str]],
+        required: Sequence[str] = (),
+        extra_columns: Sequence[ColumnElement] = (),
+    ) -> Select:
+        """
+        Read model: a Core `select()` of only the `fields` columns, plus the
+        `required` ones, yielding plain rows rather than identity-mapped
+        instances. Rows offer the same attribute access, so `orm_mode` schemas
+        validate them as they are. Selects whole instances without `fields`.
+
+        `extra_columns` are labeled expressions appended to the `fields`, e.g.
+        correlated subqueries reading related rows in the same statement.
+        """
+        if fields is None:
+            return select(self.model)
+        names = list(fields) + [name for name in required if name not in fields]
+        table = self.model.__table__
+        return select(*[table.c[name] for name in names], *extra_columns)
+
+    def _get_stmt(self, id: Any, options: Sequence[ExecutableOption] = ()) -> Select:
+        return select(self.model).options(*options).where(self.model.id == id)
+
+    def _multi_stmt(
+        self,
+        *criteria: ClauseElement,
+        skip: int,
+        limit: int,
+        fields: Optional[Sequence[str]],
+        options: Sequence[ExecutableOption] = (),
+    ) -> Select:
+        stmt = self._read_select(fields).where(*criteria).offset(skip).limit(limit)
+        # Loader options only apply to instances, not to the `fields` rows
+        return stmt.options(*options) if fields is None else stmt
+
+    def _id_in(self, ids: Sequence[Any]) -> ClauseElement:
+        """
+        `id = ANY(:ids)`, a single array parameter, so the statement is the same
+        however many ids there are.
+        """
+        id = self.model.__table__.c.id
+        return id == any_(literal(list(ids), ARRAY(id.type)))
+
+    def _many_stmt(
+        self,
+        ids: Sequence[Any],
+        *criteria: ClauseElement,
+        fields: Optional[Sequence[str]],
+    ) -> Select:
+        return self._read_select(fields).where(self._id_in(ids), *criteria)
+
+    def _page_stmt(
+        self,
+        *criteria: ClauseElement,
+        cursor: Optional[str],
+        limit: int,
+        order_by: str,
+        fields: Optional[Sequence[str]],
+        extra_columns: Sequence[ColumnElement] = (),
+    ) -> Tuple[Select, List[Column]]:
+        """
+        Keyset page of the rows matching `criteria` following `cursor`, and the
+        key columns `keyset_page` builds the next cursor from.
+        """
+        if order_by not in self.keyset_columns:
+            raise ValueError(f"Cannot paginate {self.model.__name__} by {order_by}")
+        columns = key_columns(self.model, order_by)
+        # The page's last row must hold the key columns to build the cursor
+        stmt = self._read_select(fields, [c.key for c in columns], extra_columns)
+        stmt = stmt.where(*criteria)
+        stmt = keyset_select(
+            stmt, columns, order_by=order_by, cursor=cursor, limit=limit
+        )
+        return stmt, columns
 
-    def get(self, db: Session, id: Any) -> Optional[ModelType]:
-        return db.query(self.model).filter(self.model.id == id).first()
+    def _existing_ids_stmt(self, ids: Sequence[Any]) -> Select:
+        return select(self.model.id).where(self.model.id.in_(ids))
+
+    def _update_values(
+        self, obj_in: Union[UpdateSchemaType, Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        if isinstance(obj_in, dict):
+            update_data = obj_in
+        else:
+            update_data = obj_in.dict(exclude_unset=True)
+        return {k: v for k, v in update_data.items() if k in self.column_names}
+
+    def _create_stmt(self, obj_in: CreateSchemaType) -> Any:
+        return insert(self.model.__table__).values(jsonable_encoder(obj_in))
+
+    def _update_stmt(self, id: Any, values: Dict[str, Any]) -> Any:
+        table = self.model.__table__
+        return update(table).where(table.c.id == id).values(values)
+
+    def _remove_stmt(self, id: Any) -> Any:
+        table = self.model.__table__
+        return delete(table).where(table.c.id == id)
+
+    def _returning_stmt(self, stmt: Any) -> Select:
+        """
+        A single-row INSERT, UPDATE or DELETE loading the row from its RETURNING
+        clause, so the write costs one statement and one commit.
+        """
+        notification = self._notification(operation(stmt))
+        return returning(self.model, stmt, notification=notification)
+
+    def _insert_statements(self, rows: Sequence[Dict[str, Any]]) -> Iterator[Select]:
+        return insert_statements(
+            self.model,
+            rows,
+            chunk_size=self.bulk_chunk_size,
+            notification=self._bulk_notification("insert"),
+        )
+
+    def _update_statements(
+        self, rows: Sequence[Dict[str, Any]], *criteria: ClauseElement
+    ) -> Iterator[Select]:
+        return update_statements(
+            self.model,
+            rows,
+            *criteria,
+            chunk_size=self.bulk_chunk_size,
+            notification=self._bulk_notification("update"),
+        )
+
+    def _delete_statements(
+        self, ids: Sequence[Any], *criteria: ClauseElement
+    ) -> Iterator[Select]:
+        return delete_statements(
+            self.model,
+            ids,
+            *criteria,
+            chunk_size=self.bulk_chunk_size,
+            notification=self._bulk_notification("delete"),
+        )
+
+
+class CRUDBase(CRUDStatements[ModelType, CreateSchemaType, UpdateSchemaType]):
+    def get(
+        self, db: Session, id: Any, *, options: Sequence[ExecutableOption] = ()
+    ) -> Optional[ModelType]:
+        """
+        Row `id`, from the entity cache when enabled. Loader `options`, e.g.
+        `selectinload(Model.relation)`, skip the cache as it holds columns only.
+        """
+        if options or not self.cache_ttl:
+            return db.execute(self._get_stmt(id, options)).scalars().first()
+        row = entity_cache.get_or_load(
+            self._cache_key(id), lambda: self._load_row(db, id), ttl=self.cache_ttl
+        )
+        if row is None:
+            return None
+        return db.merge(from_row(self.model, row), load=False)
+
+    def _load_row(self, db: Session, id: Any) -> Optional[Dict[str, Any]]:
+        db_obj = db.execute(self._get_stmt(id)).scalars().first()
+        if db_obj is None:
+            return None
+        return to_row(db_obj, self.column_names)
 
     def get_multi(
-        self, db: Session, *, skip: int = 0, limit: int = 100
-    ) -> List[ModelType]:
-        return db.query(self.model).offset(skip).limit(limit).all()
+        self,
+        db: Session,
+        *,
+        skip: int = 0,
+        limit: int = 100,
+        fields: Optional[Sequence[str]] = None,
+        options: Sequence[ExecutableOption] = (),
+    ) -> List[Any]:
+        """
+        Relationships are never loaded lazily, pass loader `options` for those
+        needed. They only apply to instances, not to the `fields` rows.
+        """
+        stmt = self._multi_stmt(skip=skip, limit=limit, fields=fields, options=options)
+        return self._rows(db.execute(stmt), fields)
+
+    def get_many(
+        self, db: Session, *, ids: Sequence[Any], fields: Optional[Sequence[str]] = None
+    ) -> List[Any]:
+        """
+        Rows whose id is one of `ids`, in no particular order, in one query.
+        """
+        return self._get_many(db, ids, fields=fields)
+
+    def _get_many(
+        self,
+        db: Session,
+        ids: Sequence[Any],
+        *criteria: ClauseElement,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Any]:
+        stmt = self._many_stmt(ids, *criteria, fields=fields)
+        return self._rows(db.execute(stmt), fields)
+
+    def get_page(
+        self,
+        db: Session,
+        *,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        order_by: str = "id",
+        fields: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[Any], Optional[str]]:
+        """
+        Keyset pagination: return up to `limit` rows following `cursor` and the
+        cursor of the next page, if there is one.
+
+        With `fields` the rows are tuples of those columns, plus the ones the
+        cursor needs, rather than model instances.
+        """
+        return self._get_page(
+            db, cursor=cursor, limit=limit, order_by=order_by, fields=fields
+        )
+
+    def _get_page(
+        self,
+        db: Session,
+        *criteria: ClauseElement,
+        cursor: Optional[str],
+        limit: int,
+        order_by: str,
+        fields: Optional[Sequence[str]] = None,
+        extra_columns: Sequence[ColumnElement] = (),
+    ) -> Tuple[List[Any], Optional[str]]:
+        stmt, columns = self._page_stmt(
+            *criteria,
+            cursor=cursor,
+            limit=limit,
+            order_by=order_by,
+            fields=fields,
+            extra_columns=extra_columns,
+        )
+        rows = self._rows(db.execute(stmt), fields)
+        return keyset_page(rows, columns, order_by=order_by, limit=limit)
 
     def create(self, db: Session, *, obj_in: CreateSchemaType) -> ModelType:
-        obj_in_data = jsonable_encoder(obj_in)
-        db_obj = self.model(**obj_in_data)  # type: ignore
-        db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
-        return db_obj
+        return self._returning(db, self._create_stmt(obj_in))
 
     def update(
         self,
         db: Session,
         *,
         db_obj: ModelType,
-        obj_in: Union[UpdateSchemaType, Dict[str, Any]]
+        obj_in: Union[UpdateSchemaType, Dict[str, Any]],
     ) -> ModelType:
-        obj_data = jsonable_encoder(db_obj)
-        if isinstance(obj_in, dict):
-            update_data = obj_in
-        else:
-            update_data = obj_in.dict(exclude_unset=True)
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
-        db.add(db_obj)
+        values = self._update_values(obj_in)
+        if not values:
+            return db_obj
+        return self._returning(db, self._update_stmt(db_obj.id, values))
+
+    def remove(self, db: Session, *, id: int) -> ModelType:
+        db_obj = self._returning(db, self._remove_stmt(id))
+        self._detach(db, [db_obj])
+        return db_obj
+
+    def _returning(self, db: Session, stmt: Any) -> ModelType:
+        db_obj = db.execute(self._returning_stmt(stmt)).scalars().one()
         db.commit()
-        db.refresh(db_obj)
+        self._invalidate([db_obj])
         return db_obj
 
-    def remove(self, db: Session, *, id: int) -> ModelType:
-        obj = db.query(self.model).get(id)
-        db.delete(obj)
+    def get_existing_ids(self, db: Session, *, ids: Sequence[Any]) -> Set[Any]:
+        return set(db.execute(self._existing_ids_stmt(ids)).scalars().all())
+
+    def create_multi(
+        self, db: Session, *, objs_in: Sequence[CreateSchemaType]
+    ) -> List[ModelType]:
+        rows = [jsonable_encoder(obj_in) for obj_in in objs_in]
+        return self._write_all(db, self._insert_statements(rows))
+
+    def update_multi(
+        self, db: Session, *, objs_in: Sequence[Dict[str, Any]]
+    ) -> List[ModelType]:
+        """
+        Each of `objs_in` holds the `id` of the row to update and its new values.
+        Rows that do not exist are left out of the result.
+        """
+        return self._write_all(db, self._update_statements(objs_in))
+
+    def remove_multi(self, db: Session, *, ids: Sequence[Any]) -> List[ModelType]:
+        return self._write_all(db, self._delete_statements(ids))
+
+    def _write_all(self, db: Session, stmts: Iterable[Select]) -> List[ModelType]:
+        """
+        Run the bulk `stmts` in one transaction, the rows they return loaded
+        from their RETURNING clauses.
+        """
+        db_objs: List[ModelType] = []
+        for stmt in stmts:
+            db_objs.extend(db.execute(stmt).scalars().all())
         db.commit()
-        return obj
+        self._invalidate(db_objs)
+        return db_objs
+
+    def _detach(self, db: Session, db_objs: List[ModelType]) -> None:
+        # Deleted rows stay in the identity map until the session is closed
+        for db_obj in db_objs:
+            db.expunge(db_obj)
+
+
+class AsyncCRUDBase(CRUDStatements[ModelType, CreateSchemaType, UpdateSchemaType]):
+    """
+    Asyncio counterpart of `CRUDBase`, working on an `AsyncSession`.
+    """
+
+    async def get(
+        self, db: AsyncSession, id: Any, *, options: Sequence[ExecutableOption] = ()
+    ) -> Optional[ModelType]:
+        if options or not self.cache_ttl:
+            result = await db.execute(self._get_stmt(id, options))
+            return result.scalars().first()
+        if db.info.get("replica"):
+            # A lagging replica may still return the row as it was before the
+            # write that evicted it, keep that out of the cache
+            row = self._cached_row(id) or await self._load_row(db, id)
+        else:
+            row = await entity_cache.aget_or_load(
+                self._cache_key(id),
+                lambda: self._load_row(db, id),
+                ttl=self.cache_ttl,
+            )
+        if row is None:
+            return None
+        return await db.merge(from_row(self.model, row), load=False)
+
+    async def _load_row(self, db: AsyncSession, id: Any) -> Optional[Dict[str, Any]]:
+        result = await db.execute(self._get_stmt(id))
+        db_obj = result.scalars().first()
+        if db_obj is None:
+            return None
+        return to_row(db_obj, self.column_names)
+
+    async def get_multi(
+        self,
+        db: AsyncSession,
+        *,
+        skip: int = 0,
+        limit: int = 100,
+        fields: Optional[Sequence[str]] = None,
+        options: Sequence[ExecutableOption] = (),
+    ) -> List[Any]:
+        stmt = self._multi_stmt(skip=skip, limit=limit, fields=fields, options=options)
+        return self._rows(await db.execute(stmt), fields)
+
+    async def get_many(
+        self,
+        db: AsyncSession,
+        *,
+        ids: Sequence[Any],
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Any]:
+        return await self._get_many(db, ids, fields=fields)
+
+    async def _get_many(
+        self,
+        db: AsyncSession,
+        ids: Sequence[Any],
+        *criteria: ClauseElement,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Any]:
+        stmt = self._many_stmt(ids, *criteria, fields=fields)
+        return self._rows(await db.execute(stmt), fields)
+
+    async def get_page(
+        self,
+        db: AsyncSession,
+        *,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        order_by: str = "id",
+        fields: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[Any], Optional[str]]:
+        return await self._get_page(
+            db, cursor=cursor, limit=limit, order_by=order_by, fields=fields
+        )
+
+    async def _get_page(
+        self,
+        db: AsyncSession,
+        *criteria: ClauseElement,
+        cursor: Optional[str],
+        limit: int,
+        order_by: str,
+        fields: Optional[Sequence[str]] = None,
+        extra_columns: Sequence[ColumnElement] = (),
+    ) -> Tuple[List[Any], Optional[str]]:
+        stmt, columns = self._page_stmt(
+            *criteria,
+            cursor=cursor,
+            limit=limit,
+            order_by=order_by,
+            fields=fields,
+            extra_columns=extra_columns,
+        )
+        rows = self._rows(await db.execute(stmt), fields)
+        return keyset_page(rows, columns, order_by=order_by, limit=limit)
+
+    async def stream(
+        self,
+        db: AsyncSession,
+        *criteria: ClauseElement,
+        fields: Sequence[str],
+        chunk_size: int,
+    ) -> AsyncIterator[List[Any]]:
+        """
+        Rows of the `fields` columns matching `criteria`, in id order and
+        `chunk_size` at a time from a server-side cursor, so memory stays flat
+        however many rows match.
+        """
+        stmt = (
+            self._read_select(fields)
+            .where(*criteria)
+            .order_by(self.model.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        result = await db.stream(stmt)
+        async for rows in result.partitions():
+            yield rows
+
+    async def create(self, db: AsyncSession, *, obj_in: CreateSchemaType) -> ModelType:
+        return await self._returning(db, self._create_stmt(obj_in))
+
+    async def update(
+        self,
+        db: AsyncSession,
+        *,
+        db_obj: ModelType,
+        obj_in: Union[UpdateSchemaType, Dict[str, Any]],
+    ) -> ModelType:
+        values = self._update_values(obj_in)
+        if not values:
+            return db_obj
+        return await self._returning(db, self._update_stmt(db_obj.id, values))
+
+    async def remove(self, db: AsyncSession, *, id: int) -> ModelType:
+        db_obj = await self._returning(db, self._remove_stmt(id))
+        self._detach(db, [db_obj])
+        return db_obj
+
+    async def _returning(self, db: AsyncSession, stmt: Any) -> ModelType:
+        result = await db.execute(self._returning_stmt(stmt))
+        db_obj = result.scalars().one()
+        await db.commit()
+        self._invalidate([db_obj])
+        return db_obj
+
+    async def get_existing_ids(
+        self, db: AsyncSession, *, ids: Sequence[Any]
+    ) -> Set[Any]:
+        result = await db.execute(self._existing_ids_stmt(ids))
+        return set(result.scalars().all())
+
+    async def create_multi(
+        self, db: AsyncSession, *, objs_in: Sequence[CreateSchemaType]
+    ) -> List[ModelType]:
+        rows = [jsonable_encoder(obj_in) for obj_in in objs_in]
+        return await self._write_all(db, self._insert_statements(rows))
+
+    async def update_multi(
+        self, db: AsyncSession, *, objs_in: Sequence[Dict[str, Any]]
+    ) -> List[ModelType]:
+        return await self._write_all(db, self._update_statements(objs_in))
+
+    async def remove_multi(
+        self, db: AsyncSession, *, ids: Sequence[Any]
+    ) -> List[ModelType]:
+        return await self._write_all(db, self._delete_statements(ids))
+
+    async def _write_all(
+        self, db: AsyncSession, stmts: Iterable[Select]
+    ) -> List[ModelType]:
+        db_objs: List[ModelType] = []
+        for stmt in stmts:
+            result = await db.execute(stmt)
+            db_objs.extend(result.scalars().all())
+        await db.commit()
+        self._invalidate(db_objs)
+        return db_objs
+
+    def _detach(self, db: AsyncSession, db_objs: List[ModelType]) -> None:
+        for db_obj in db_objs:
+            db.expunge(db_obj)
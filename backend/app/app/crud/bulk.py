@@ -0,0 +1,139 @@
+import io
+from itertools import groupby
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Type
+
+from sqlalchemy import column, delete, func, insert, select, update, values
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql import ClauseElement, Select
+
+from app.crud.events import BulkNotification, Notification
+from app.db.base_class import Base
+
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _chunks(rows: Sequence[Any], size: int) -> Iterator[Sequence[Any]]:
+    for start in range(0, len(rows), size):
+        end = start + size
+        yield rows[start:end]
+
+
+def returning(
+    model: Type[Base], stmt: Any, *, notification: Optional[Notification] = None
+) -> Select:
+    """
+    Load the rows a DML statement writes from its RETURNING clause. With a
+    `notification`, the statement also announces each row with `NOTIFY`,
+    delivered once the transaction commits.
+    """
+    table = model.__table__  # type: ignore
+    if notification is None:
+        query = select(model).from_statement(stmt.returning(*table.c))
+    else:
+        written = aliased(model, stmt.returning(*table.c).cte("written"))
+        query = select(written, notification(written))
+    return query.execution_options(populate_existing=True)
+
+
+def returning_all(
+    model: Type[Base], stmt: Any, *, notification: Optional[BulkNotification] = None
+) -> Select:
+    """
+    Like `returning`, for a statement writing many rows: the `notification`
+    announces them together, once per statement rather than once per row.
+    """
+    table = model.__table__  # type: ignore
+    if notification is None:
+        query = select(model).from_statement(stmt.returning(*table.c))
+    else:
+        written = stmt.returning(*table.c).cte("written")
+        announced = notification(written).cte("announced")
+        # Selected so the announcement runs, evaluated once for all rows
+        query = select(
+            aliased(model, written),
+            select(func.count()).select_from(announced).scalar_subquery(),
+        )
+    return query.execution_options(populate_existing=True)
+
+
+def insert_statements(
+    model: Type[Base],
+    rows: Sequence[Dict[str, Any]],
+    *,
+    chunk_size: int,
+    notification: Optional[BulkNotification] = None
+) -> Iterator[Select]:
+    """
+    Multi-row `INSERT ... VALUES (...), (...) RETURNING *`, `chunk_size` rows at a
+    time. All rows must have the same keys.
+    """
+    table = model.__table__  # type: ignore
+    for chunk in _chunks(rows, chunk_size):
+        stmt = insert(table).values(list(chunk))
+        yield returning_all(model, stmt, notification=notification)
+
+
+def update_statements(
+    model: Type[Base],
+    rows: Sequence[Dict[str, Any]],
+    *criteria: ClauseElement,
+    chunk_size: int,
+    notification: Optional[BulkNotification] = None
+) -> Iterator[Select]:
+    """
+    `UPDATE ... FROM (VALUES ...) WHERE id = v.id RETURNING *`, one statement per
+    set of updated columns and `chunk_size` rows. Each row holds the `id` to update
+    and the new values; rows without values are skipped.
+    """
+    table = model.__table__  # type: ignore
+
+    def fields(row: Dict[str, Any]) -> List[str]:
+        return sorted(key for key in row if key != "id")
+
+    for names, group in groupby(sorted(rows, key=fields), key=fields):
+        if not names:
+            continue
+        keys = ["id"] + names
+        group_rows = list(group)
+        for chunk in _chunks(group_rows, chunk_size):
+            data = values(
+                *[column(key, table.c[key].type) for key in keys], name="data"
+            ).data([tuple(row[key] for key in keys) for row in chunk])
+            stmt = (
+                update(table)
+                .where(table.c.id == data.c.id, *criteria)
+                .values({name: data.c[name] for name in names})
+            )
+            yield returning_all(model, stmt, notification=notification)
+
+
+def delete_statements(
+    model: Type[Base],
+    ids: Sequence[Any],
+    *criteria: ClauseElement,
+    chunk_size: int,
+    notification: Optional[BulkNotification] = None
+) -> Iterator[Select]:
+    """
+    `DELETE ... WHERE id IN (...) RETURNING *`, `chunk_size` ids at a time.
+    """
+    table = model.__table__  # type: ignore
+    for chunk in _chunks(ids, chunk_size):
+        stmt = delete(table).where(table.c.id.in_(chunk), *criteria)
+        yield returning_all(model, stmt, notification=notification)
+
+
+def copy_text(rows: Iterable[Sequence[Optional[str]]]) -> io.StringIO:
+    """
+    Rows of strings in the text format of `COPY ... FROM STDIN`, `None` as NULL.
+    """
+    buffer = io.StringIO()
+    buffer.writelines(
+        "\t".join(
+            "\\N" if value is None else value.translate(_COPY_ESCAPES) for value in row
+        )
+        + "\n"
+        for row in rows
+    )
+    buffer.seek(0)
+    return buffer
@@ -0,0 +1,180 @@
+import asyncio
+import threading
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    FrozenSet,
+    Hashable,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
+
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.base_class import Base
+
+# (table name, primary key)
+EntityKey = Tuple[str, Any]
+Row = Dict[str, Any]
+
+
+class EntityCache:
+    def __init__(
+        self,
+        *,
+        maxsize: int,
+        local_ttl: Optional[float] = None,
+        shared: Optional[Any] = None
+    ):
+        """
+        Read-through cache of rows fetched by primary key, as column dicts.
+
+        Rows live in an in-process LRU and, when given, in a `shared` backend
+        that all processes see, e.g. a Redis adapter. The shared backend needs
+        `get(key)`, `set(key, value, *, ttl)` and `delete(key)`, a `TTLCache`
+        is the local stand-in. Writes invalidate both, but other processes keep
+        their local copy, so local copies live at most `local_ttl` seconds,
+        bounding how long other processes serve a row after a write.
+
+        Concurrent misses on a key run a single load, the other callers wait
+        for it and read its result from the cache.
+
+        **Parameters**
+
+        * `maxsize`: Maximum number of rows kept in process
+        * `local_ttl`: Upper bound on the TTL of rows kept in process
+        * `shared`: Optional cache shared between processes
+        """
+        self.local: TTLCache[Row] = TTLCache(maxsize=maxsize, ttl=0)
+        self.local_ttl = local_ttl
+        self.shared = shared
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._loading: Dict[Hashable, Union[threading.Event, asyncio.Event]] = {}
+        # Keys invalidated while loading, the loaded row may predate the write
+        self._stale: Set[Hashable] = set()
+
+    def metrics(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {name: dict(counters) for name, counters in self.stats.items()}
+
+    def lookup(self, key: EntityKey, *, ttl: float) -> Optional[Row]:
+        row = self.local.get(key)
+        if row is None and self.shared is not None:
+            row = self.shared.get(key)
+            if row is not None:
+                self.local.set(key, row, ttl=self._local_ttl(ttl))
+        self._count(key, "hits" if row is not None else "misses")
+        return row
+
+    def store(self, key: EntityKey, row: Row, *, ttl: float) -> None:
+        with self._lock:
+            if key in self._stale:
+                return
+        self.local.set(key, row, ttl=self._local_ttl(ttl))
+        if self.shared is not None:
+            self.shared.set(key, row, ttl=ttl)
+
+    def _local_ttl(self, ttl: float) -> float:
+        return ttl if self.local_ttl is None else min(ttl, self.local_ttl)
+
+    def invalidate(self, key: EntityKey) -> None:
+        with self._lock:
+            if key in self._loading:
+                self._stale.add(key)
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+    def get_or_load(
+        self, key: EntityKey, load: Callable[[], Optional[Row]], *, ttl: float
+    ) -> Optional[Row]:
+        row = self.lookup(key, ttl=ttl)
+        if row is not None:
+            return row
+        with self._lock:
+            loading = self._loading.get(key)
+            if loading is None:
+                self._loading[key] = done = threading.Event()
+        if loading is not None:
+            # An asyncio load cannot be waited for from a thread
+            if isinstance(loading, threading.Event):
+                self._count(key, "coalesced")
+                loading.wait()
+            return self.local.get(key) or load()
+        try:
+            row = load()
+            if row is not None:
+                self.store(key, row, ttl=ttl)
+            return row
+        finally:
+            self._done(key)
+            done.set()
+
+    async def aget_or_load(
+        self,
+        key: EntityKey,
+        load: Callable[[], Awaitable[Optional[Row]]],
+        *,
+        ttl: float
+    ) -> Optional[Row]:
+        row = self.lookup(key, ttl=ttl)
+        if row is not None:
+            return row
+        with self._lock:
+            loading = self._loading.get(key)
+            if loading is None:
+                self._loading[key] = done = asyncio.Event()
+        if loading is not None:
+            # Waiting on a thread's load would block the event loop
+            if isinstance(loading, asyncio.Event):
+                self._count(key, "coalesced")
+                await loading.wait()
+            return self.local.get(key) or await load()
+        try:
+            row = await load()
+            if row is not None:
+                self.store(key, row, ttl=ttl)
+            return row
+        finally:
+            self._done(key)
+            done.set()
+
+    def _done(self, key: EntityKey) -> None:
+        with self._lock:
+            self._loading.pop(key, None)
+            self._stale.discard(key)
+
+    def _count(self, key: EntityKey, counter: str) -> None:
+        with self._lock:
+            counters = self.stats.setdefault(
+                key[0], {"hits": 0, "misses": 0, "coalesced": 0}
+            )
+            counters[counter] += 1
+
+
+def to_row(db_obj: Base, column_names: FrozenSet[str]) -> Row:
+    return {name: getattr(db_obj, name) for name in column_names}
+
+
+def from_row(model: Type[Base], row: Row) -> Base:
+    """
+    Rebuild a cached row as a detached object, to be `merge(..., load=False)`d
+    into a session without a query.
+    """
+    db_obj = model(**row)  # type: ignore
+    make_transient_to_detached(db_obj)
+    return db_obj
+
+
+entity_cache = EntityCache(
+    maxsize=settings.ENTITY_CACHE_MAX_SIZE,
+    local_ttl=settings.ENTITY_CACHE_LOCAL_TTL_SECONDS,
+)
@@ -1,34 +1,675 @@
-from typing import List
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy.orm import Session
+from sqlalchemy import (
+    case,
+    cast,
+    delete,
+    false,
+    func,
+    insert,
+    literal,
+    literal_column,
+    select,
+    true,
+    tuple_,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION, REGCLASS
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.sql import Select
 
-from app.crud.base import CRUDBase
-from app.models.item import Item
+from app.core.config import settings
+from app.crud.base import AsyncCRUDBase, CRUDBase, CRUDStatements, VersionConflict
+from app.crud.bulk import copy_text
+from app.crud.events import Notification, notify
+from app.crud.pagination import decode_key, encode_cursor, keyset_page, keyset_select
+from app.models.item import SEARCH_CONFIG, SEARCH_INDEX, Item
+from app.models.item_stats import ItemStats
+from app.models.item_tombstone import ItemTombstone
+from app.models.user import User
 from app.schemas.item import ItemCreate, ItemUpdate
 
+# NOTIFY channel of item writes, see `ChangeListener`
+ITEM_CHANGES_CHANNEL = "item_changes"
+# Pending list of the search index during imports, large enough to hold any
+SEARCH_PENDING_LIMIT = "2GB"
+# Cursors of change pages, see `get_changes`
+CHANGES_ORDER = "change_txid"
 
-class CRUDItem(CRUDBase[Item, ItemCreate, ItemUpdate]):
+
+def _for_owner(
+    stmt: Any,
+    *,
+    id: int,
+    owner_id: int,
+    superuser: bool,
+    versions: Optional[Sequence[int]],
+    notification: Optional[Notification] = None,
+) -> Select:
+    """
+    Restrict `stmt`, a select or a DML statement returning every item column, to
+    item `id` of `owner_id`, or of anyone for a superuser, and to `versions` when
+    given. The same statement reads the item's owner and version, so the result
+    tells a missing item from one owned by someone else, or changed since, in a
+    single round trip.
+
+    Rows are `(owner id, version, item)`, the item being None when filtered out,
+    followed by the `notification` of the item when given.
+    """
+    table = Item.__table__  # type: ignore
+    criteria = [table.c.id == id]
+    if not superuser:
+        criteria.append(table.c.owner_id == owner_id)
+    if versions is not None:
+        criteria.append(table.c.version.in_(versions))
+    target = (
+        select(table.c.owner_id, table.c.version).where(table.c.id == id).cte("target")
+    )
+    scoped = aliased(Item, stmt.where(*criteria).cte("scoped"))
+    columns = [target.c.owner_id, target.c.version, scoped]
+    if notification is not None:
+        columns.append(case((scoped.id.isnot(None), notification(scoped))))
+    stmt = select(*columns).select_from(target).outerjoin(scoped, true())
+    return stmt.execution_options(populate_existing=True)
+
+
+def _found(
+    row: Any, *, owner_id: int, superuser: bool, versions: Optional[Sequence[int]]
+) -> Tuple[bool, Optional[Item]]:
+    if row is None:
+        return False, None
+    current_owner_id, current_version, db_obj = row[:3]
+    allowed = superuser or current_owner_id == owner_id
+    if db_obj is None and allowed and versions is not None:
+        raise VersionConflict(current_version)
+    return True, db_obj
+
+
+def _owned(
+    db_obj: Optional[Item], *, owner_id: int, superuser: bool
+) -> Tuple[bool, Optional[Item]]:
+    if db_obj is None:
+        return False, None
+    if not superuser and db_obj.owner_id != owner_id:
+        return True, None
+    return True, db_obj
+
+
+def _version(
+    row: Optional[Mapping[str, Any]], *, owner_id: int, superuser: bool
+) -> Tuple[bool, Optional[int]]:
+    if row is None:
+        return False, None
+    if not superuser and row["owner_id"] != owner_id:
+        return True, None
+    return True, row["version"]
+
+
+class ItemStatements(CRUDStatements[Item, ItemCreate, ItemUpdate]):
+    """
+    Statements of the item operations, run by `CRUDItem` and `AsyncCRUDItem`.
+    """
+
+    cache_ttl = settings.ITEM_CACHE_TTL_SECONDS
+    list_scope = "owner_id"
+    notify_channel = ITEM_CHANGES_CHANNEL
+
+    def _create_with_owner_stmt(self, obj_in: ItemCreate, owner_id: int) -> Any:
+        obj_in_data = jsonable_encoder(obj_in)
+        return insert(Item.__table__).values(**obj_in_data, owner_id=owner_id)
+
+    def _owner_rows(
+        self, objs_in: Sequence[ItemCreate], owner_id: int
+    ) -> List[Dict[str, Any]]:
+        return [dict(jsonable_encoder(obj_in), owner_id=owner_id) for obj_in in objs_in]
+
+    def _version_stmt(self, id: int) -> Select:
+        return select(Item.owner_id, Item.version).where(Item.id == id)
+
+    def _update_for_owner_stmt(
+        self,
+        id: int,
+        obj_in: Union[ItemUpdate, Dict[str, Any]],
+        *,
+        owner_id: int,
+        superuser: bool,
+        versions: Optional[Sequence[int]],
+    ) -> Tuple[Select, bool]:
+        """
+        The `_for_owner` statement updating item `id`, and whether it writes
+        anything: without values it only reads the item.
+        """
+        values = self._update_values(obj_in)
+        table = Item.__table__
+        stmt: Any = select(table)
+        notification = None
+        if values:
+            stmt = update(table).values(values).returning(*table.c)
+            notification = self._notification("update")
+        stmt = _for_owner(
+            stmt,
+            id=id,
+            owner_id=owner_id,
+            superuser=superuser,
+            versions=versions,
+            notification=notification,
+        )
+        return stmt, bool(values)
+
+    def _delete_for_owner_stmt(
+        self, id: int, *, owner_id: int, superuser: bool
+    ) -> Select:
+        table = Item.__table__
+        return _for_owner(
+            delete(table).returning(*table.c),
+            id=id,
+            owner_id=owner_id,
+            superuser=superuser,
+            versions=None,
+            notification=self._notification("delete"),
+        )
+
+
+class CRUDItem(ItemStatements, CRUDBase[Item, ItemCreate, ItemUpdate]):
     def create_with_owner(
         self, db: Session, *, obj_in: ItemCreate, owner_id: int
     ) -> Item:
-        obj_in_data = jsonable_encoder(obj_in)
-        db_obj = self.model(**obj_in_data, owner_id=owner_id)
-        db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
-        return db_obj
+        return self._returning(db, self._create_with_owner_stmt(obj_in, owner_id))
 
     def get_multi_by_owner(
-        self, db: Session, *, owner_id: int, skip: int = 0, limit: int = 100
+        self,
+        db: Session,
+        *,
+        owner_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Any]:
+        stmt = self._multi_stmt(
+            Item.owner_id == owner_id, skip=skip, limit=limit, fields=fields
+        )
+        return self._rows(db.execute(stmt), fields)
+
+    def get_page_by_owner(
+        self,
+        db: Session,
+        *,
+        owner_id: int,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[Any], Optional[str]]:
+        return self._get_page(
+            db,
+            Item.owner_id == owner_id,
+            cursor=cursor,
+            limit=limit,
+            order_by="id",
+            fields=fields,
+        )
+
+    def get_many_for_owner(
+        self,
+        db: Session,
+        *,
+        ids: Sequence[int],
+        owner_id: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Any]:
+        """
+        Items whose id is one of `ids`, restricted to `owner_id` when given.
+        """
+        criteria = [] if owner_id is None else [Item.owner_id == owner_id]
+        return self._get_many(db, ids, *criteria, fields=fields)
+
+    def get_for_owner(
+        self, db: Session, *, id: int, owner_id: int, superuser: bool = False
+    ) -> Tuple[bool, Optional[Item]]:
+        """
+        Get item `id` if it belongs to `owner_id`, or to anyone for a superuser.
+
+        Returns whether the item exists and the item, which is None when it
+        belongs to someone else. The item is read through the entity cache, its
+        owner checked on the cached row.
+        """
+        return _owned(self.get(db, id), owner_id=owner_id, superuser=superuser)
+
+    def get_version_for_owner(
+        self, db: Session, *, id: int, owner_id: int, superuser: bool = False
+    ) -> Tuple[bool, Optional[int]]:
+        """
+        Like `get_for_owner`, returning only the item's version.
+        """
+        row = self._cached_row(id)
+        if row is None:
+            row = db.execute(self._version_stmt(id)).mappings().first()
+        return _version(row, owner_id=owner_id, superuser=superuser)
+
+    def update_for_owner(
+        self,
+        db: Session,
+        *,
+        id: int,
+        obj_in: Union[ItemUpdate, Dict[str, Any]],
+        owner_id: int,
+        superuser: bool = False,
+        versions: Optional[Sequence[int]] = None,
+    ) -> Tuple[bool, Optional[Item]]:
+        """
+        Like `get_for_owner`, updating the item on the way. With `versions`
+        the item is only updated at one of those versions, `VersionConflict`
+        is raised otherwise.
+        """
+        stmt, writes = self._update_for_owner_stmt(
+            id, obj_in, owner_id=owner_id, superuser=superuser, versions=versions
+        )
+        found, db_obj = _found(
+            db.execute(stmt).first(),
+            owner_id=owner_id,
+            superuser=superuser,
+            versions=versions,
+        )
+        if not writes:
+            return found, db_obj
+        db.commit()
+        if db_obj is not None:
+            self._invalidate([db_obj])
+        return found, db_obj
+
+    def delete_for_owner(
+        self, db: Session, *, id: int, owner_id: int, superuser: bool = False
+    ) -> Tuple[bool, Optional[Item]]:
+        stmt = self._delete_for_owner_stmt(id, owner_id=owner_id, superuser=superuser)
+        found, db_obj = _found(
+            db.execute(stmt).first(),
+            owner_id=owner_id,
+            superuser=superuser,
+            versions=None,
+        )
+        db.commit()
+        if db_obj is not None:
+            self._invalidate([db_obj])
+            self._detach(db, [db_obj])
+        return found, db_obj
+
+    def create_multi_with_owner(
+        self, db: Session, *, objs_in: Sequence[ItemCreate], owner_id: int
+    ) -> List[Item]:
+        rows = self._owner_rows(objs_in, owner_id)
+        return self._write_all(db, self._insert_statements(rows))
+
+    def copy_multi_with_owner(
+        self, db: Session, *, chunks: Iterable[Sequence[Dict[str, Any]]], owner_id: int
+    ) -> int:
+        """
+        Create items from all `chunks` of rows validated against `ItemCreate`, in
+        the transaction of `db`, and return how many. Each chunk is loaded
+        straight into the item table with `COPY`. The caller commits, e.g. with
+        the status of the import the items come from.
+
+        New entries of the GIN index on `search_vector` pile up in its pending
+        list rather than being merged in as they come, call
+        `clean_search_index()` once the items are committed.
+
+        Items are not returned. The `item_stats` triggers bump the owner's list
+        version, so cached pages of every process go stale right away.
+        """
+        # Local to the transaction
+        pending_limit = func.set_config(
+            "gin_pending_list_limit", SEARCH_PENDING_LIMIT, True
+        )
+        db.execute(select(pending_limit))
+        owner = str(owner_id)
+        imported = 0
+        cursor = db.connection().connection.cursor()
+        try:
+            for chunk in chunks:
+                rows = ((row["title"], row.get("description"), owner) for row in chunk)
+                cursor.copy_expert(
+                    "COPY item (title, description, owner_id) FROM STDIN",
+                    copy_text(rows),
+                )
+                imported += len(chunk)
+        finally:
+            cursor.close()
+        if self.notify_channel is not None:
+            # One event for the lot, listeners catch up through the delta sync
+            event = {
+                "table": "item",
+                "op": "import",
+                "owner_id": owner_id,
+                "count": imported,
+            }
+            db.execute(notify(self.notify_channel, [event]))
+        return imported
+
+    def clean_search_index(self, db: Session) -> None:
+        """
+        Merge the pending list of the GIN index on `search_vector` into the
+        index, searches scan the pending list until then.
+        """
+        index = cast(literal(SEARCH_INDEX), REGCLASS)
+        db.execute(select(func.gin_clean_pending_list(index)))
+        db.commit()
+
+    def update_multi_by_owner(
+        self, db: Session, *, objs_in: Sequence[Dict[str, Any]], owner_id: int
     ) -> List[Item]:
-        return (
-            db.query(self.model)
-            .filter(Item.owner_id == owner_id)
-            .offset(skip)
-            .limit(limit)
-            .all()
+        stmts = self._update_statements(objs_in, Item.owner_id == owner_id)
+        return self._write_all(db, stmts)
+
+    def remove_multi_by_owner(
+        self, db: Session, *, ids: Sequence[int], owner_id: int
+    ) -> List[Item]:
+        stmts = self._delete_statements(ids, Item.owner_id == owner_id)
+        return self._write_all(db, stmts)
+
+
+class AsyncCRUDItem(ItemStatements, AsyncCRUDBase[Item, ItemCreate, ItemUpdate]):
+    async def create_with_owner(
+        self, db: AsyncSession, *, obj_in: ItemCreate, owner_id: int
+    ) -> Item:
+        return await self._returning(db, self._create_with_owner_stmt(obj_in, owner_id))
+
+    async def get_multi_by_owner(
+        self,
+        db: AsyncSession,
+        *,
+        owner_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Any]:
+        stmt = self._multi_stmt(
+            Item.owner_id == owner_id, skip=skip, limit=limit, fields=fields
         )
+        return self._rows(await db.execute(stmt), fields)
+
+    async def get_page_by_owner(
+        self,
+        db: AsyncSession,
+        *,
+        owner_id: int,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[Any], Optional[str]]:
+        return await self._get_page(
+            db,
+            Item.owner_id == owner_id,
+            cursor=cursor,
+            limit=limit,
+            order_by="id",
+            fields=fields,
+        )
+
+    async def get_page_with_owner(
+        self,
+        db: AsyncSession,
+        *,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        fields: Sequence[str],
+    ) -> Tuple[List[Any], Optional[str]]:
+        """
+        Page of all items, each row holding the `owner_email` of its owner read
+        by a correlated subquery, so the page costs a single statement.
+        """
+        owner_email = (
+            select(User.email)
+            .where(User.id == Item.owner_id)
+            .scalar_subquery()
+            .label("owner_email")
+        )
+        return await self._get_page(
+            db,
+            cursor=cursor,
+            limit=limit,
+            order_by="id",
+            fields=fields,
+            extra_columns=[owner_email],
+        )
+
+    async def get_changes(
+        self,
+        db: AsyncSession,
+        *,
+        since: int,
+        owner_id: Optional[int] = None,
+        cursor: Optional[str] = None,
+        limit: int = 1000,
+        fields: Sequence[str],
+    ) -> Tuple[List[Any], List[int], int, Optional[str]]:
+        """
+        Rows of the items that transactions from `since` on created or updated,
+        the ids of the items they deleted, the watermark to pass as `since`
+        next time, and the `cursor` of the next page when more than `limit`
+        changes follow. Restricted to `owner_id` when given.
+
+        Changes come in the order of the transactions that made them. The
+        watermark is the oldest transaction still running when the first page
+        was read, every older one is visible to the queries after it, or the
+        transaction of the last change of the page when that is older. Changes
+        of transactions in flight are returned again by the next call, none is
+        missed.
+        """
+        key_columns = [Item.change_txid, Item.id]
+        if cursor is None:
+            snapshot_xmin = await db.scalar(
+                select(func.txid_snapshot_xmin(func.txid_current_snapshot()))
+            )
+            position = None
+        else:
+            # The watermark of the first page, then the last change read
+            key = decode_key(CHANGES_ORDER, cursor, [Item.change_txid, *key_columns])
+            snapshot_xmin, position = key[0], key[1:]
+        criteria = [Item.change_txid >= since]
+        deleted_criteria = [ItemTombstone.change_txid >= since]
+        if owner_id is not None:
+            criteria.append(Item.owner_id == owner_id)
+            deleted_criteria.append(ItemTombstone.owner_id == owner_id)
+        if position is not None:
+            criteria.append(tuple_(*key_columns) > tuple_(*position))
+            deleted_criteria.append(
+                tuple_(ItemTombstone.change_txid, ItemTombstone.item_id)
+                > tuple_(*position)
+            )
+        changes: Any = select(Item.change_txid, Item.id, false().label("deleted"))
+        changes = changes.where(*criteria)
+        if since:
+            # A full sync has nothing to delete
+            changes = union_all(
+                changes,
+                select(ItemTombstone.change_txid, ItemTombstone.item_id, true()).where(
+                    *deleted_criteria
+                ),
+            )
+        changes = changes.subquery()
+        result = await db.execute(
+            select(changes)
+            .order_by(changes.c.change_txid, changes.c.id)
+            .limit(limit + 1)
+        )
+        page = result.all()
+        watermark, next_cursor = snapshot_xmin, None
+        if len(page) > limit:
+            page = page[:limit]
+            last = page[-1]
+            watermark = min(watermark, last.change_txid)
+            next_cursor = encode_cursor(
+                CHANGES_ORDER, [snapshot_xmin, last.change_txid, last.id]
+            )
+        updated = [change.id for change in page if not change.deleted]
+        result = await db.execute(self._read_select(fields).where(Item.id.in_(updated)))
+        # Items deleted since the page was read come with a later tombstone
+        rows = {row.id: row for row in result}
+        items = [rows[id] for id in updated if id in rows]
+        deleted = [change.id for change in page if change.deleted]
+        return items, deleted, watermark, next_cursor
+
+    async def search(
+        self,
+        db: AsyncSession,
+        *,
+        query: str,
+        owner_id: Optional[int] = None,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        fields: Sequence[str],
+    ) -> Tuple[List[Any], Optional[str]]:
+        """
+        Page of the items matching `query`, in web search syntax, restricted to
+        `owner_id` when given. Best matches come first, title words weighing
+        more than description ones, and rows hold the `fields` and the `rank`.
+
+        Matches are found through the GIN index on `search_vector`, only those
+        are ranked.
+        """
+        table = Item.__table__  # type: ignore
+        config = literal_column(f"'{SEARCH_CONFIG}'::regconfig")
+        tsquery = func.websearch_to_tsquery(config, query)
+        # Double precision, a real would not round trip through the cursor
+        rank = cast(func.ts_rank(table.c.search_vector, tsquery), DOUBLE_PRECISION)
+        columns = [rank.label("rank"), table.c.id]
+        criteria = [table.c.search_vector.bool_op("@@")(tsquery)]
+        if owner_id is not None:
+            criteria.append(table.c.owner_id == owner_id)
+        stmt = self._read_select(fields, ["id"], columns[:1]).where(*criteria)
+        stmt = keyset_select(
+            stmt, columns, order_by="rank", cursor=cursor, limit=limit, descending=True
+        )
+        rows = (await db.execute(stmt)).all()
+        return keyset_page(rows, columns, order_by="rank", limit=limit)
+
+    async def get_stats_for_owner(self, db: AsyncSession, *, owner_id: int) -> int:
+        """
+        Number of items of `owner_id`, read from `itemstats` by primary key.
+        """
+        stmt = select(ItemStats.item_count).where(ItemStats.owner_id == owner_id)
+        return await db.scalar(stmt) or 0
+
+    async def get_list_version(self, db: AsyncSession, *, owner_id: int) -> int:
+        """
+        Version of the items of `owner_id`, bumped by the `item_stats` triggers
+        on every write to them, whichever process runs it.
+        """
+        stmt = select(ItemStats.list_version).where(ItemStats.owner_id == owner_id)
+        return await db.scalar(stmt) or 0
+
+    async def get_stats(self, db: AsyncSession) -> Tuple[int, int]:
+        """
+        Number of owners with items and of items in total, summed over the one
+        `itemstats` row per owner rather than counted over the items.
+        """
+        stmt = select(
+            func.count(), func.coalesce(func.sum(ItemStats.item_count), 0)
+        ).where(ItemStats.item_count > 0)
+        owners, items = (await db.execute(stmt)).one()
+        return owners, items
+
+    def stream_by_owner(
+        self, db: AsyncSession, *, owner_id: int, fields: Sequence[str], chunk_size: int
+    ) -> AsyncIterator[List[Any]]:
+        return self.stream(
+            db, Item.owner_id == owner_id, fields=fields, chunk_size=chunk_size
+        )
+
+    async def get_many_for_owner(
+        self,
+        db: AsyncSession,
+        *,
+        ids: Sequence[int],
+        owner_id: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Any]:
+        criteria = [] if owner_id is None else [Item.owner_id == owner_id]
+        return await self._get_many(db, ids, *criteria, fields=fields)
+
+    async def get_for_owner(
+        self, db: AsyncSession, *, id: int, owner_id: int, superuser: bool = False
+    ) -> Tuple[bool, Optional[Item]]:
+        item = await self.get(db, id)
+        return _owned(item, owner_id=owner_id, superuser=superuser)
+
+    async def get_version_for_owner(
+        self, db: AsyncSession, *, id: int, owner_id: int, superuser: bool = False
+    ) -> Tuple[bool, Optional[int]]:
+        row = self._cached_row(id)
+        if row is None:
+            result = await db.execute(self._version_stmt(id))
+            row = result.mappings().first()
+        return _version(row, owner_id=owner_id, superuser=superuser)
+
+    async def update_for_owner(
+        self,
+        db: AsyncSession,
+        *,
+        id: int,
+        obj_in: Union[ItemUpdate, Dict[str, Any]],
+        owner_id: int,
+        superuser: bool = False,
+        versions: Optional[Sequence[int]] = None,
+    ) -> Tuple[bool, Optional[Item]]:
+        stmt, writes = self._update_for_owner_stmt(
+            id, obj_in, owner_id=owner_id, superuser=superuser, versions=versions
+        )
+        result = await db.execute(stmt)
+        found, db_obj = _found(
+            result.first(), owner_id=owner_id, superuser=superuser, versions=versions
+        )
+        if not writes:
+            return found, db_obj
+        await db.commit()
+        if db_obj is not None:
+            self._invalidate([db_obj])
+        return found, db_obj
+
+    async def delete_for_owner(
+        self, db: AsyncSession, *, id: int, owner_id: int, superuser: bool = False
+    ) -> Tuple[bool, Optional[Item]]:
+        stmt = self._delete_for_owner_stmt(id, owner_id=owner_id, superuser=superuser)
+        result = await db.execute(stmt)
+        found, db_obj = _found(
+            result.first(), owner_id=owner_id, superuser=superuser, versions=None
+        )
+        await db.commit()
+        if db_obj is not None:
+            self._invalidate([db_obj])
+            self._detach(db, [db_obj])
+        return found, db_obj
+
+    async def create_multi_with_owner(
+        self, db: AsyncSession, *, objs_in: Sequence[ItemCreate], owner_id: int
+    ) -> List[Item]:
+        rows = self._owner_rows(objs_in, owner_id)
+        return await self._write_all(db, self._insert_statements(rows))
+
+    async def update_multi_by_owner(
+        self, db: AsyncSession, *, objs_in: Sequence[Dict[str, Any]], owner_id: int
+    ) -> List[Item]:
+        stmts = self._update_statements(objs_in, Item.owner_id == owner_id)
+        return await self._write_all(db, stmts)
+
+    async def remove_multi_by_owner(
+        self, db: AsyncSession, *, ids: Sequence[int], owner_id: int
+    ) -> List[Item]:
+        stmts = self._delete_statements(ids, Item.owner_id == owner_id)
+        return await self._write_all(db, stmts)
 
 
 item = CRUDItem(Item)
+async_item = AsyncCRUDItem(Item)
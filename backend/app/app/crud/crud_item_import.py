@@ -0,0 +1,41 @@
+from typing import Optional
+
+from sqlalchemy import Integer, cast, func, insert, literal, select
+from sqlalchemy.dialects.postgresql import OID, REGCLASS
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.crud.base import AsyncCRUDBase, CRUDBase
+from app.models.item_import import ItemImport
+from app.schemas.item_import import ItemImportCreate, ItemImportUpdate
+
+
+class CRUDItemImport(CRUDBase[ItemImport, ItemImportCreate, ItemImportUpdate]):
+    def lock(self, db: Session, *, id: int) -> Optional[ItemImport]:
+        """
+        The import, read once no other transaction holds its lock, which the
+        transaction of `db` then holds until it ends. A redelivered task waits
+        for the run in flight and sees how it ended.
+
+        Advisory, the row itself stays free for progress updates.
+        """
+        table = cast(cast(cast(literal("itemimport"), REGCLASS), OID), Integer)
+        db.execute(select(func.pg_advisory_xact_lock(table, id)))
+        stmt = select(ItemImport).where(ItemImport.id == id)
+        return db.execute(stmt.execution_options(populate_existing=True)).scalar()
+
+
+class AsyncCRUDItemImport(
+    AsyncCRUDBase[ItemImport, ItemImportCreate, ItemImportUpdate]
+):
+    async def create_with_owner(
+        self, db: AsyncSession, *, obj_in: ItemImportCreate, owner_id: int
+    ) -> ItemImport:
+        stmt = insert(ItemImport.__table__).values(
+            format=obj_in.format, owner_id=owner_id
+        )
+        return await self._returning(db, stmt)
+
+
+item_import = CRUDItemImport(ItemImport)
+async_item_import = AsyncCRUDItemImport(ItemImport)
@@ -1,28 +1,69 @@
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
 
-from app.core.security import get_password_hash, verify_password
-from app.crud.base import CRUDBase
+from app.core.config import settings
+from app.core.hashing import password_hasher
+from app.core.security import (
+    Principal,
+    get_password_hash,
+    invalidate_principal,
+    verify_password,
+)
+from app.crud.base import AsyncCRUDBase, CRUDBase, CRUDStatements
+from app.models.item import Item
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
 
 
-class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
-    def get_by_email(self, db: Session, *, email: str) -> Optional[User]:
-        return db.query(User).filter(User.email == email).first()
+class UserStatements(CRUDStatements[User, UserCreate, UserUpdate]):
+    """
+    Statements of the user operations, run by `CRUDUser` and `AsyncCRUDUser`.
+    """
 
-    def create(self, db: Session, *, obj_in: UserCreate) -> User:
-        db_obj = User(
+    keyset_columns = ("id", "email")
+    cache_ttl = settings.USER_CACHE_TTL_SECONDS
+
+    def _by_email_stmt(self, email: str) -> Select:
+        return select(User).where(User.email == email)
+
+    def _version_stmt(self, id: Any) -> Select:
+        return select(User.version).where(User.id == id)
+
+    def _create_user_stmt(self, obj_in: UserCreate, hashed_password: str) -> Any:
+        return insert(User.__table__).values(
             email=obj_in.email,
-            hashed_password=get_password_hash(obj_in.password),
+            hashed_password=hashed_password,
             full_name=obj_in.full_name,
             is_superuser=obj_in.is_superuser,
         )
-        db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
-        return db_obj
+
+    def is_active(self, user: Union[User, Principal]) -> bool:
+        return user.is_active
+
+    def is_superuser(self, user: Union[User, Principal]) -> bool:
+        return user.is_superuser
+
+
+class CRUDUser(UserStatements, CRUDBase[User, UserCreate, UserUpdate]):
+    def get_by_email(self, db: Session, *, email: str) -> Optional[User]:
+        return db.execute(self._by_email_stmt(email)).scalars().first()
+
+    def get_version(self, db: Session, *, id: Any) -> Optional[int]:
+        """
+        Version of user `id`, from the entity cache when it holds the row.
+        """
+        row = self._cached_row(id)
+        if row is not None:
+            return row["version"]
+        return db.execute(self._version_stmt(id)).scalar()
+
+    def create(self, db: Session, *, obj_in: UserCreate) -> User:
+        hashed_password = get_password_hash(obj_in.password)
+        return self._returning(db, self._create_user_stmt(obj_in, hashed_password))
 
     def update(
         self, db: Session, *, db_obj: User, obj_in: Union[UserUpdate, Dict[str, Any]]
@@ -31,11 +72,13 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
             update_data = obj_in
         else:
             update_data = obj_in.dict(exclude_unset=True)
-        if update_data["password"]:
+        if update_data.get("password"):
             hashed_password = get_password_hash(update_data["password"])
             del update_data["password"]
             update_data["hashed_password"] = hashed_password
-        return super().update(db, db_obj=db_obj, obj_in=update_data)
+        user = super().update(db, db_obj=db_obj, obj_in=update_data)
+        invalidate_principal(user.id)
+        return user
 
     def authenticate(self, db: Session, *, email: str, password: str) -> Optional[User]:
         user = self.get_by_email(db, email=email)
@@ -45,11 +88,82 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
             return None
         return user
 
-    def is_active(self, user: User) -> bool:
-        return user.is_active
 
-    def is_superuser(self, user: User) -> bool:
-        return user.is_superuser
+class AsyncCRUDUser(UserStatements, AsyncCRUDBase[User, UserCreate, UserUpdate]):
+    async def get_by_email(self, db: AsyncSession, *, email: str) -> Optional[User]:
+        result = await db.execute(self._by_email_stmt(email))
+        return result.scalars().first()
+
+    async def get_version(self, db: AsyncSession, *, id: Any) -> Optional[int]:
+        row = self._cached_row(id)
+        if row is not None:
+            return row["version"]
+        result = await db.execute(self._version_stmt(id))
+        return result.scalar()
+
+    async def get_page_with_item_counts(
+        self,
+        db: AsyncSession,
+        *,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        order_by: str = "id",
+        fields: Sequence[str]
+    ) -> Tuple[List[Any], Optional[str]]:
+        """
+        Page of users, each row holding its `item_count`. The counts come from
+        a correlated subquery on the item owner index, in the same statement.
+        """
+        item_count = (
+            select(func.count(Item.id))
+            .where(Item.owner_id == User.id)
+            .scalar_subquery()
+            .label("item_count")
+        )
+        return await self._get_page(
+            db,
+            cursor=cursor,
+            limit=limit,
+            order_by=order_by,
+            fields=fields,
+            extra_columns=[item_count],
+        )
+
+    async def create(self, db: AsyncSession, *, obj_in: UserCreate) -> User:
+        hashed_password = await password_hasher.hash(obj_in.password)
+        return await self._returning(
+            db, self._create_user_stmt(obj_in, hashed_password)
+        )
+
+    async def update(
+        self,
+        db: AsyncSession,
+        *,
+        db_obj: User,
+        obj_in: Union[UserUpdate, Dict[str, Any]]
+    ) -> User:
+        if isinstance(obj_in, dict):
+            update_data = obj_in
+        else:
+            update_data = obj_in.dict(exclude_unset=True)
+        if update_data.get("password"):
+            hashed_password = await password_hasher.hash(update_data["password"])
+            del update_data["password"]
+            update_data["hashed_password"] = hashed_password
+        user = await super().update(db, db_obj=db_obj, obj_in=update_data)
+        invalidate_principal(user.id)
+        return user
+
+    async def authenticate(
+        self, db: AsyncSession, *, email: str, password: str
+    ) -> Optional[User]:
+        user = await self.get_by_email(db, email=email)
+        if not user:
+            return None
+        if not await password_hasher.verify(password, user.hashed_password):
+            return None
+        return user
 
 
 user = CRUDUser(User)
+async_user = AsyncCRUDUser(User)
@@ -0,0 +1,76 @@
+from typing import Any, Callable, Dict, Optional, Sequence
+
+import orjson
+from sqlalchemy import Text, cast, func, literal, select, text
+from sqlalchemy.sql import ColumnElement, Select
+from sqlalchemy.sql.elements import TextClause
+
+# Builds the notification of a row written by a statement, given the row
+Notification = Callable[[Any], ColumnElement]
+# Builds the notification of all rows written by a statement, given their CTE
+BulkNotification = Callable[[Any], Select]
+
+
+def operation(stmt: Any) -> str:
+    if stmt.is_insert:
+        return "insert"
+    return "update" if stmt.is_update else "delete"
+
+
+def change_notification(
+    row: Any, *, channel: str, table: str, op: str, names: Sequence[str]
+) -> ColumnElement:
+    """
+    `pg_notify()` call announcing `row` on `channel` as a JSON object of its
+    `names` columns, the `table` and the `op`. Selected next to the rows of a
+    DML statement, it runs once per written row within that same statement.
+    """
+    fields = [literal("table"), literal(table), literal("op"), literal(op)]
+    for name in names:
+        fields += [literal(name), getattr(row, name)]
+    return func.pg_notify(channel, cast(func.json_build_object(*fields), Text))
+
+
+def bulk_change_notification(
+    written: Any, *, channel: str, table: str, op: str, scope: Optional[str]
+) -> Select:
+    """
+    `pg_notify()` calls announcing the rows of `written`, the CTE of a DML
+    statement's RETURNING clause, on `channel`: one JSON object per value of
+    their `scope` column rather than one per row, holding that value, the
+    `table`, the `op`, and how many rows with which range of ids.
+    """
+    fields = [
+        literal("table"),
+        literal(table),
+        literal("op"),
+        literal(op),
+        literal("count"),
+        func.count(),
+        literal("min_id"),
+        func.min(written.c.id),
+        literal("max_id"),
+        func.max(written.c.id),
+    ]
+    group_by = []
+    if scope is not None:
+        fields += [literal(scope), written.c[scope]]
+        group_by.append(written.c[scope])
+    payload = cast(func.json_build_object(*fields), Text)
+    return (
+        select(func.pg_notify(channel, payload))
+        .select_from(written)
+        .group_by(*group_by)
+        .having(func.count() > 0)
+    )
+
+
+def notify(channel: str, events: Sequence[Dict[str, Any]]) -> TextClause:
+    """
+    `NOTIFY` each of `events` as JSON on `channel`, in a single statement.
+    """
+    payloads = [orjson.dumps(event).decode() for event in events]
+    return text(
+        "SELECT pg_notify(:channel, payload) "
+        "FROM unnest(CAST(:payloads AS text[])) AS payload"
+    ).bindparams(channel=channel, payloads=payloads)
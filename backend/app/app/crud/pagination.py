@@ -0,0 +1,116 @@
+import base64
+import json
+from typing import Any, List, Optional, Sequence, Tuple, Type
+
+from sqlalchemy import BigInteger, Column, Integer, tuple_
+from sqlalchemy.sql import ColumnElement, Select
+
+from app.db.base_class import Base
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(order_by: str, key: Sequence[Any]) -> str:
+    raw = json.dumps({"o": order_by, "k": list(key)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(order_by: str, cursor: str) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        key = data["k"]
+        valid = data["o"] == order_by and isinstance(key, list)
+    except (ValueError, KeyError, TypeError):
+        raise InvalidCursor(cursor)
+    if not valid:
+        raise InvalidCursor(cursor)
+    return key
+
+
+def _valid_key(key: List[Any], columns: List[ColumnElement]) -> bool:
+    """
+    Whether each value of `key` fits the type of its column, a forged cursor
+    would otherwise fail in the database rather than as `InvalidCursor`.
+    """
+    if len(key) != len(columns):
+        return False
+    for value, column in zip(key, columns):
+        if value is None:
+            if not getattr(column, "nullable", False):
+                return False
+            continue
+        python_type = column.type.python_type
+        if python_type is float:
+            python_type = (int, float)
+        if isinstance(value, bool) or not isinstance(value, python_type):
+            return False
+        if isinstance(column.type, Integer):
+            bits = 63 if isinstance(column.type, BigInteger) else 31
+            if not -(2**bits) <= value < 2**bits:
+                return False
+    return True
+
+
+def decode_key(order_by: str, cursor: str, columns: List[ColumnElement]) -> List[Any]:
+    """
+    The key of `cursor`, checked against the `columns` it positions a row by.
+    """
+    key = decode_cursor(order_by, cursor)
+    if not _valid_key(key, columns):
+        raise InvalidCursor(cursor)
+    return key
+
+
+def key_columns(model: Type[Base], order_by: str) -> List[Column]:
+    """
+    Columns identifying a row's position when ordering by `order_by`: the column
+    itself when it is unique, otherwise the column with the primary key as tie
+    breaker.
+    """
+    column = model.__table__.c[order_by]  # type: ignore
+    if column.primary_key or column.unique:
+        return [column]
+    return [column, model.__table__.c.id]  # type: ignore
+
+
+def keyset_select(
+    stmt: Select,
+    columns: List[ColumnElement],
+    *,
+    order_by: str,
+    cursor: Optional[str],
+    limit: int,
+    descending: bool = False
+) -> Select:
+    """
+    Restrict `stmt` to the page after `cursor`, fetching one extra row to find out
+    whether another page follows. Pages run from the largest key down when
+    `descending`.
+    """
+    if descending:
+        stmt = stmt.order_by(*[c.desc() for c in columns])
+    else:
+        stmt = stmt.order_by(*columns)
+    stmt = stmt.limit(limit + 1)
+    if cursor is None:
+        return stmt
+    key = decode_key(order_by, cursor, columns)
+    if len(columns) == 1:
+        position, after = columns[0], key[0]
+    else:
+        position, after = tuple_(*columns), tuple_(*key)
+    return stmt.where(position < after if descending else position > after)
+
+
+def keyset_page(
+    rows: List[Any], columns: List[ColumnElement], *, order_by: str, limit: int
+) -> Tuple[List[Any], Optional[str]]:
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    next_cursor = encode_cursor(order_by, [getattr(last, c.key) for c in columns])
+    return rows, next_cursor
@@ -2,4 +2,7 @@
 # imported by Alembic
 from app.db.base_class import Base  # noqa
 from app.models.item import Item  # noqa
+from app.models.item_import import ItemImport  # noqa
+from app.models.item_stats import ItemStats  # noqa
+from app.models.item_tombstone import ItemTombstone  # noqa
 from app.models.user import User  # noqa
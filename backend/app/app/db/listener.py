@@ -0,0 +1,88 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+import asyncpg
+import orjson
+
+# Sent in place of events a subscriber may have missed
+RESYNC: Dict[str, Any] = {"op": "resync"}
+
+
+class ChangeListener:
+    def __init__(self, dsn: str, channel: str, *, queue_size: int):
+        """
+        Shares a single `LISTEN` connection per process among all subscribers
+        of a channel. Each subscriber gets the events of its owner, or all of
+        them, on its own queue.
+
+        The connection is opened for the first subscriber and reopened by
+        `listen()` after it dropped. Events sent in between are lost, so are
+        those of subscribers falling `queue_size` events behind. Both get
+        `RESYNC` instead and should catch up through the delta sync.
+
+        **Parameters**
+
+        * `dsn`: A `postgresql://` URL, opened with asyncpg
+        * `channel`: The channel writes are announced on
+        * `queue_size`: Events buffered per subscriber
+        """
+        self.dsn = dsn
+        self.channel = channel
+        self.queue_size = queue_size
+        self._connection: Optional[asyncpg.Connection] = None
+        self._lock: Optional[asyncio.Lock] = None
+        # Queue -> owner id whose events it receives, None for all
+        self._subscribers: Dict[asyncio.Queue, Optional[int]] = {}
+
+    @asynccontextmanager
+    async def subscribe(
+        self, owner_id: Optional[int] = None
+    ) -> AsyncIterator[asyncio.Queue]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        await self.listen()
+        self._subscribers[queue] = owner_id
+        try:
+            yield queue
+        finally:
+            del self._subscribers[queue]
+
+    async def listen(self) -> None:
+        """
+        Open the connection unless it is up, cheap to call repeatedly.
+        """
+        if self._connection is not None and not self._connection.is_closed():
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._connection is not None and not self._connection.is_closed():
+                return
+            connection = await asyncpg.connect(self.dsn)
+            await connection.add_listener(self.channel, self._on_notify)
+            reconnected = self._connection is not None
+            self._connection = connection
+        if reconnected:
+            for queue in self._subscribers:
+                self._put(queue, RESYNC)
+
+    async def close(self) -> None:
+        if self._connection is not None:
+            await self._connection.close()
+        self._connection = None
+        self._lock = None
+
+    def _on_notify(self, connection: Any, pid: int, channel: str, payload: str) -> None:
+        event = orjson.loads(payload)
+        for queue, owner_id in self._subscribers.items():
+            if owner_id is None or event.get("owner_id") == owner_id:
+                self._put(queue, event)
+
+    def _put(self, queue: asyncio.Queue, event: Dict[str, Any]) -> None:
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The events held are incomplete now, replace them
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(RESYNC)
@@ -0,0 +1,115 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+
+class PoolMonitor:
+    def __init__(self, engine: Engine):
+        """
+        Collects checkout and connection statistics of an engine's pool.
+
+        Connections are tracked through pool events. Checkout waits and
+        timeouts are only recorded by the instrumented pool classes below, as
+        the pool events fire once a connection was already obtained.
+
+        **Parameters**
+
+        * `engine`: A sync engine, `async_engine.sync_engine` for an asyncio one
+        """
+        self.engine = engine
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.connects = 0
+        self.closes = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        # Connection record id -> when its DBAPI connection was opened
+        self._connected_at: Dict[int, float] = {}
+        if isinstance(engine.pool, _TimedCheckout):
+            engine.pool.monitor = self
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "close", self._on_close)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def record_wait(self, seconds: float, *, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def metrics(self) -> Dict[str, Any]:
+        pool: Any = self.engine.pool
+        now = time.monotonic()
+        with self._lock:
+            ages = [now - connected_at for connected_at in self._connected_at.values()]
+            return {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                # Negative while the pool has not yet opened `size` connections
+                "overflow": max(pool.overflow(), 0),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+                "connects": self.connects,
+                "closes": self.closes,
+                "invalidations": self.invalidations,
+                "connection_age_seconds_max": max(ages, default=0.0),
+                "connection_age_seconds_mean": sum(ages) / len(ages) if ages else 0.0,
+            }
+
+    def _on_connect(self, dbapi_connection: Any, connection_record: Any) -> None:
+        with self._lock:
+            self.connects += 1
+            self._connected_at[id(connection_record)] = time.monotonic()
+
+    def _on_close(self, dbapi_connection: Any, connection_record: Any) -> None:
+        with self._lock:
+            self.closes += 1
+            self._connected_at.pop(id(connection_record), None)
+
+    def _on_invalidate(
+        self, dbapi_connection: Any, connection_record: Any, exception: Any
+    ) -> None:
+        with self._lock:
+            self.invalidations += 1
+
+
+class _TimedCheckout(Pool):
+    monitor: Optional[PoolMonitor] = None
+
+    def connect(self) -> Any:
+        if self.monitor is None:
+            return super().connect()
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.monitor.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.monitor.record_wait(time.perf_counter() - start)
+        return connection
+
+    def recreate(self) -> Pool:
+        # Called by `engine.dispose()`, the new pool keeps reporting here
+        pool = super().recreate()
+        pool.monitor = self.monitor  # type: ignore
+        return pool
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
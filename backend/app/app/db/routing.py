@@ -0,0 +1,150 @@
+import itertools
+import re
+import time
+from typing import Callable, List, Optional, Sequence
+
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Carries the primary's WAL position after a client's last write, so that any
+# server process sends the client's reads to replicas that replayed it
+LSN_COOKIE = "primary_lsn"
+
+_LSN = re.compile(r"^([0-9A-Fa-f]{1,8})/([0-9A-Fa-f]{1,8})$")
+
+
+def parse_lsn(lsn: Optional[str]) -> Optional[int]:
+    """
+    A `pg_lsn` such as `16/B374D848` as a comparable number, None when it is
+    missing or malformed.
+    """
+    match = _LSN.match(lsn or "")
+    if match is None:
+        return None
+    return int(match.group(1), 16) << 32 | int(match.group(2), 16)
+
+
+class ReplicaRouter:
+    def __init__(
+        self,
+        session_factory: Callable[..., AsyncSession],
+        primary: AsyncEngine,
+        replicas: Sequence[AsyncEngine],
+        *,
+        retry_after: float,
+    ):
+        """
+        Hands out sessions for read-only work, bound to the read replicas in
+        round-robin order.
+
+        A replica that cannot hand out a connection is skipped for
+        `retry_after` seconds, and the primary serves reads when no replica is
+        left. Reads given the WAL position of an earlier write skip replicas
+        that have not replayed it yet, so clients read their own writes
+        despite replica lag.
+
+        **Parameters**
+
+        * `session_factory`: Creates an `AsyncSession` given a `bind`
+        * `primary`: The engine writes go to
+        * `replicas`: One engine per read replica, may be empty
+        * `retry_after`: Seconds a failing replica is left out
+        """
+        self.session_factory = session_factory
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.retry_after = retry_after
+        self._next = itertools.count()
+        self._down_until = [0.0] * len(self.replicas)
+
+    def mark_down(self, engine: AsyncEngine) -> None:
+        index = self.replicas.index(engine)
+        self._down_until[index] = time.monotonic() + self.retry_after
+
+    def candidates(self) -> List[AsyncEngine]:
+        """
+        Engines to try for a read, healthy replicas first and the primary last.
+        """
+        if not self.replicas:
+            return [self.primary]
+        now = time.monotonic()
+        count = len(self.replicas)
+        start = next(self._next)
+        order = [(start + offset) % count for offset in range(count)]
+        healthy = [self.replicas[i] for i in order if self._down_until[i] <= now]
+        return healthy + [self.primary]
+
+    async def session(self, read_after: Optional[str] = None) -> AsyncSession:
+        """
+        A session on the first replica that is up and, given the `read_after`
+        WAL position of a write, has replayed it. Otherwise on the primary.
+        """
+        *replicas, primary = self.candidates()
+        position = parse_lsn(read_after)
+        for engine in replicas:
+            db = self.session_factory(bind=engine)
+            try:
+                # Check the connection out now, the request would do so anyway
+                await db.connection()
+                if position is not None and not await self.replayed(db, position):
+                    await db.close()
+                    continue
+            except (exc.DBAPIError, exc.TimeoutError, OSError):
+                await db.close()
+                self.mark_down(engine)
+                continue
+            # Its rows may predate the latest writes, see `AsyncCRUDBase.get`
+            db.info["replica"] = True
+            return db
+        return self.session_factory(bind=primary)
+
+    async def replayed(self, db: AsyncSession, position: int) -> bool:
+        replayed = await db.scalar(text("SELECT pg_last_wal_replay_lsn()::text"))
+        # NULL outside of recovery, the server is a primary then
+        return replayed is None or (parse_lsn(replayed) or 0) >= position
+
+    async def primary_lsn(self) -> str:
+        async with self.primary.connect() as connection:
+            return await connection.scalar(text("SELECT pg_current_wal_lsn()::text"))
+
+
+class ReadYourWritesMiddleware:
+    def __init__(self, app: ASGIApp, *, router: ReplicaRouter, max_age: int):
+        """
+        Hands clients whose request committed a write the primary's WAL
+        position in the `LSN_COOKIE` cookie, which their reads pass on to
+        `ReplicaRouter.session()`. The client carries it, so every server
+        process honours it.
+
+        A request counts as writing once `request.state.committed` is set.
+
+        **Parameters**
+
+        * `app`: The ASGI app to wrap
+        * `router`: The router whose primary the writes go to
+        * `max_age`: Seconds the cookie is kept, beyond any expected lag
+        """
+        self.app = app
+        self.router = router
+        self.max_age = max_age
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.router.replicas:
+            await self.app(scope, receive, send)
+            return
+        state = scope.setdefault("state", {})
+
+        async def send_with_lsn(message: Message) -> None:
+            if message["type"] == "http.response.start" and state.get("committed"):
+                lsn = await self.router.primary_lsn()
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "set-cookie",
+                    f"{LSN_COOKIE}={lsn}; Max-Age={self.max_age}; Path=/; "
+                    "HttpOnly; SameSite=lax",
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_lsn)
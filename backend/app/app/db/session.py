@@ -1,7 +1,63 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.core.config import settings
+from app.db.pool import InstrumentedAsyncQueuePool, InstrumentedQueuePool, PoolMonitor
+from app.db.routing import ReplicaRouter
+
+pool_options: Dict[str, Any] = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_POOL_MAX_OVERFLOW,
+    "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+    "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+    "pool_pre_ping": settings.DB_POOL_PRE_PING,
+}
+
+engine = create_engine(
+    settings.SQLALCHEMY_DATABASE_URI, poolclass=InstrumentedQueuePool, **pool_options
+)
+# Writes load their result through RETURNING, keep it after the commit
+SessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=engine, expire_on_commit=False
+)
+
+async_engine = create_async_engine(
+    settings.SQLALCHEMY_ASYNC_DATABASE_URI,
+    poolclass=InstrumentedAsyncQueuePool,
+    **pool_options,
+)
+# Objects stay usable after commit, lazy refreshes are not possible under asyncio
+AsyncSessionLocal = sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+replica_engines = [
+    create_async_engine(uri, poolclass=InstrumentedAsyncQueuePool, **pool_options)
+    for uri in settings.SQLALCHEMY_REPLICA_DATABASE_URIS
+]
+replica_router = ReplicaRouter(
+    AsyncSessionLocal,
+    async_engine,
+    replica_engines,
+    retry_after=settings.REPLICA_RETRY_SECONDS,
+)
+
+
+@event.listens_for(Session, "after_commit")
+def keep_writer_on_primary(session: Session) -> None:
+    # `get_async_db` records the state of the request the session works for,
+    # `ReadYourWritesMiddleware` hands its client the WAL position
+    state = session.info.get("request_state")
+    if state is not None:
+        state.committed = True
+
 
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+pool_monitors = {
+    "sync": PoolMonitor(engine),
+    "async": PoolMonitor(async_engine.sync_engine),
+}
+for index, replica_engine in enumerate(replica_engines):
+    pool_monitors[f"replica-{index}"] = PoolMonitor(replica_engine.sync_engine)
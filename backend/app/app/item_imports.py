@@ -0,0 +1,131 @@
+import csv
+import os
+import shutil
+import tempfile
+from typing import IO, Any, Dict, Iterator, List, Tuple
+
+import orjson
+from pydantic import validate_model
+
+from app import crud
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.schemas.bulk import BulkError
+from app.schemas.item import ItemCreate
+
+
+def spool_path(import_id: int) -> str:
+    return os.path.join(settings.IMPORT_SPOOL_DIR, str(import_id))
+
+
+def spool_upload(upload: IO[bytes]) -> str:
+    """
+    Copy an uploaded file to a new file in the spool directory, return its path.
+    """
+    os.makedirs(settings.IMPORT_SPOOL_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=settings.IMPORT_SPOOL_DIR, suffix=".upload")
+    with os.fdopen(fd, "wb") as file:
+        shutil.copyfileobj(upload, file, 1024 * 1024)
+    return path
+
+
+def _rows(file: IO[str], format: str) -> Iterator[Any]:
+    if format == "csv":
+        for row in csv.DictReader(file):
+            # Exports write NULL as an empty value
+            yield {key: value or None for key, value in row.items()}
+    else:
+        for line in file:
+            if line.strip():
+                # Decoded while validating, a malformed line only fails its row
+                yield line
+
+
+def read_chunks(
+    file: IO[str], format: str, *, chunk_size: int
+) -> Iterator[Tuple[List[Dict[str, Any]], List[BulkError]]]:
+    """
+    Validate the rows of an NDJSON or CSV file against `ItemCreate`, yielding
+    the validated values and the errors of `chunk_size` rows at a time.
+    """
+    rows: List[Dict[str, Any]] = []
+    errors: List[BulkError] = []
+    for index, row in enumerate(_rows(file, format)):
+        try:
+            if isinstance(row, str):
+                row = orjson.loads(row)
+        except orjson.JSONDecodeError as e:
+            errors.append(BulkError(index=index, detail=str(e)))
+            row = None
+        if isinstance(row, dict):
+            # Only the values are needed, skip building the model
+            values, _, error = validate_model(ItemCreate, row)
+            if error:
+                errors.append(BulkError(index=index, detail=error.errors()))
+            else:
+                rows.append(values)
+        elif row is not None:
+            errors.append(BulkError(index=index, detail="Expected an object"))
+        if len(rows) + len(errors) == chunk_size:
+            yield rows, errors
+            rows, errors = [], []
+    if rows or errors:
+        yield rows, errors
+
+
+def run_item_import(import_id: int) -> None:
+    """
+    Load the spooled file of an import in a single transaction, reporting the
+    progress on the import after every chunk from a second session.
+
+    The items are committed together with the import's done status, under a
+    lock on the import. A redelivered task waits for a run in flight and skips
+    the import once it is done, a run that did not finish left no items behind
+    and starts over.
+    """
+    progress_db = SessionLocal()
+    db = SessionLocal()
+    try:
+        job = crud.item_import.lock(db, id=import_id)
+        if job is None or job.status not in ("pending", "running"):
+            return
+        crud.item_import.update(progress_db, db_obj=job, obj_in={"status": "running"})
+        progress: Dict[str, Any] = {"rows_read": 0, "rows_failed": 0, "errors": []}
+
+        def chunks(file: IO[str]) -> Iterator[List[Dict[str, Any]]]:
+            for rows, errors in read_chunks(
+                file, job.format, chunk_size=settings.IMPORT_CHUNK_SIZE
+            ):
+                yield rows
+                # Resumed once the chunk was copied
+                progress["rows_read"] += len(rows) + len(errors)
+                progress["rows_failed"] += len(errors)
+                room = settings.IMPORT_MAX_ERRORS - len(progress["errors"])
+                progress["errors"] += [error.dict() for error in errors[:room]]
+                crud.item_import.update(progress_db, db_obj=job, obj_in=progress)
+
+        path = spool_path(import_id)
+        try:
+            with open(path, encoding="utf-8") as file:
+                imported = crud.item.copy_multi_with_owner(
+                    db, chunks=chunks(file), owner_id=job.owner_id
+                )
+            # Commits the items too
+            crud.item_import.update(
+                db, db_obj=job, obj_in={"status": "done", "rows_imported": imported}
+            )
+        except Exception as e:
+            db.rollback()
+            crud.item_import.update(
+                progress_db, db_obj=job, obj_in={"status": "failed", "detail": str(e)}
+            )
+            raise
+        else:
+            # Merged after the commit, the import does not wait for it
+            crud.item.clean_search_index(db)
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+    finally:
+        db.close()
+        progress_db.close()
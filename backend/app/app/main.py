@@ -1,8 +1,14 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import JSONResponse
 
 from app.api.api_v1.api import api_router
+from app.api.events import item_events
 from app.core.config import settings
+from app.core.hashing import PasswordHasherBusy, password_hasher
+from app.db.routing import ReadYourWritesMiddleware
+from app.db.session import async_engine, replica_router
 
 app = FastAPI(
     title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/openapi.json"
@@ -16,6 +22,39 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["ETag", "X-Next-Cursor"],
     )
+app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MINIMUM_SIZE)
+app.add_middleware(
+    ReadYourWritesMiddleware,
+    router=replica_router,
+    max_age=settings.REPLICA_STICKY_SECONDS,
+)
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
+
+
+@app.exception_handler(PasswordHasherBusy)
+def password_hasher_busy_handler(
+    request: Request, exc: PasswordHasherBusy
+) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many concurrent password operations"},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.on_event("shutdown")
+def shutdown_password_hasher() -> None:
+    password_hasher.shutdown()
+
+
+@app.on_event("shutdown")
+async def dispose_async_engine() -> None:
+    await async_engine.dispose()
+
+
+@app.on_event("shutdown")
+async def close_item_events() -> None:
+    await item_events.close()
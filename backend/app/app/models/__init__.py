@@ -1,2 +1,5 @@
 from .item import Item
+from .item_import import ItemImport
+from .item_stats import ItemStats
+from .item_tombstone import ItemTombstone
 from .user import User
@@ -1,6 +1,18 @@
 from typing import TYPE_CHECKING
 
-from sqlalchemy import Column, ForeignKey, Integer, String
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Computed,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    func,
+    literal_column,
+    text,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import relationship
 
 from app.db.base_class import Base
@@ -8,10 +20,49 @@ from app.db.base_class import Base
 if TYPE_CHECKING:
     from .user import User  # noqa: F401
 
+# Text search configuration of `Item.search_vector` and the queries against it
+SEARCH_CONFIG = "english"
+# GIN index the queries go through
+SEARCH_INDEX = "ix_item_search_vector"
+# Title and description words, weighted A and B for ranking
+SEARCH_VECTOR = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')"
+)
+
 
 class Item(Base):
-    id = Column(Integer, primary_key=True, index=True)
-    title = Column(String, index=True)
-    description = Column(String, index=True)
+    id = Column(Integer, primary_key=True)
+    title = Column(String)
+    description = Column(String)
     owner_id = Column(Integer, ForeignKey("user.id"))
-    owner = relationship("User", back_populates="items")
+    # Bumped by every UPDATE statement, the ETag of the row
+    version = Column(
+        Integer,
+        nullable=False,
+        server_default="1",
+        onupdate=literal_column("version + 1"),
+    )
+    # Id of the last transaction that wrote the row, for delta syncs
+    change_txid = Column(
+        BigInteger,
+        nullable=False,
+        server_default=text("txid_current()"),
+        onupdate=func.txid_current(),
+    )
+    search_vector = Column(
+        TSVECTOR, Computed(SEARCH_VECTOR, persisted=True), nullable=False
+    )
+    # Load explicitly with loader options, lazy loads would query per row
+    owner = relationship("User", back_populates="items", lazy="raise_on_sql")
+
+    __table_args__ = (
+        # Owner pages in id order, read straight off the index
+        Index("ix_item_owner_id_id", "owner_id", "id"),
+        # Change pages in transaction order, read straight off the indexes
+        Index("ix_item_change_txid_id", "change_txid", "id"),
+        Index("ix_item_owner_id_change_txid_id", "owner_id", "change_txid", "id"),
+        Index(SEARCH_INDEX, "search_vector", postgresql_using="gin"),
+    )
+    # Only search queries read the vector, items are loaded and written without it
+    __mapper_args__ = {"exclude_properties": ["search_vector"]}
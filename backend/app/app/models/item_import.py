@@ -0,0 +1,24 @@
+from typing import TYPE_CHECKING
+
+from sqlalchemy import JSON, Column, ForeignKey, Integer, String
+from sqlalchemy.orm import relationship
+
+from app.db.base_class import Base
+
+if TYPE_CHECKING:
+    from .user import User  # noqa: F401
+
+
+class ItemImport(Base):
+    id = Column(Integer, primary_key=True)
+    owner_id = Column(Integer, ForeignKey("user.id"), nullable=False)
+    format = Column(String, nullable=False)
+    # pending, running, done or failed
+    status = Column(String, nullable=False, server_default="pending")
+    rows_read = Column(Integer, nullable=False, server_default="0")
+    rows_failed = Column(Integer, nullable=False, server_default="0")
+    rows_imported = Column(Integer, nullable=False, server_default="0")
+    # The first rows that failed validation, as bulk errors
+    errors = Column(JSON, nullable=False, server_default="[]")
+    detail = Column(String)
+    owner = relationship("User", lazy="raise_on_sql")
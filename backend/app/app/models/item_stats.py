@@ -0,0 +1,13 @@
+from sqlalchemy import BigInteger, Column, ForeignKey, Integer
+
+from app.db.base_class import Base
+
+
+# Items per owner, and a version bumped by every write to them, kept up to
+# date by the `item_stats` triggers on item
+class ItemStats(Base):
+    owner_id = Column(
+        Integer, ForeignKey("user.id", ondelete="CASCADE"), primary_key=True
+    )
+    item_count = Column(Integer, nullable=False, server_default="0")
+    list_version = Column(BigInteger, nullable=False, server_default="0")
@@ -0,0 +1,22 @@
+from sqlalchemy import BigInteger, Column, Index, Integer, text
+
+from app.db.base_class import Base
+
+
+# A deleted item, inserted by the `item_tombstone` trigger on every delete
+class ItemTombstone(Base):
+    item_id = Column(Integer, primary_key=True)
+    owner_id = Column(Integer)
+    change_txid = Column(
+        BigInteger, nullable=False, server_default=text("txid_current()")
+    )
+
+    __table_args__ = (
+        Index("ix_itemtombstone_change_txid_item_id", "change_txid", "item_id"),
+        Index(
+            "ix_itemtombstone_owner_id_change_txid_item_id",
+            "owner_id",
+            "change_txid",
+            "item_id",
+        ),
+    )
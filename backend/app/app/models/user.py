@@ -1,6 +1,6 @@
 from typing import TYPE_CHECKING
 
-from sqlalchemy import Boolean, Column, Integer, String
+from sqlalchemy import Boolean, Column, Integer, String, literal_column
 from sqlalchemy.orm import relationship
 
 from app.db.base_class import Base
@@ -10,10 +10,18 @@ if TYPE_CHECKING:
 
 
 class User(Base):
-    id = Column(Integer, primary_key=True, index=True)
-    full_name = Column(String, index=True)
+    id = Column(Integer, primary_key=True)
+    full_name = Column(String)
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean(), default=True)
     is_superuser = Column(Boolean(), default=False)
-    items = relationship("Item", back_populates="owner")
+    # Bumped by every UPDATE statement, the ETag of the row
+    version = Column(
+        Integer,
+        nullable=False,
+        server_default="1",
+        onupdate=literal_column("version + 1"),
+    )
+    # Load explicitly with loader options, lazy loads would query per row
+    items = relationship("Item", back_populates="owner", lazy="raise_on_sql")
@@ -1,4 +1,19 @@
-from .item import Item, ItemCreate, ItemInDB, ItemUpdate
+from .batch import BatchIn, BatchRequest, BatchResponse
+from .bulk import BulkError
+from .item import (
+    Item,
+    ItemBulkResult,
+    ItemBulkUpdate,
+    ItemChanges,
+    ItemCreate,
+    ItemInDB,
+    ItemSearchResult,
+    ItemUpdate,
+    ItemWithOwner,
+)
+from .item_import import ItemImport, ItemImportCreate, ItemImportUpdate
+from .item_stats import ItemStats, OwnerItemStats
+from .metrics import EntityCacheMetrics, PasswordHasherMetrics, PoolMetrics
 from .msg import Msg
 from .token import Token, TokenPayload
-from .user import User, UserCreate, UserInDB, UserUpdate
+from .user import User, UserCreate, UserInDB, UserUpdate, UserWithItemCount
@@ -0,0 +1,23 @@
+from typing import Any, Dict, List
+
+from pydantic import BaseModel, Field
+
+
+# A request to run as part of a batch, its path relative to the API root
+class BatchRequest(BaseModel):
+    method: str = Field("GET", regex="^(GET|POST|PUT|PATCH|DELETE)$")
+    path: str = Field(..., regex="^/")
+    headers: Dict[str, str] = {}
+    body: Any = None
+
+
+# Outcome of a sub-request, the body decoded when it is JSON
+class BatchResponse(BaseModel):
+    status: int
+    headers: Dict[str, str]
+    body: Any = None
+
+
+# Properties to receive on batch requests
+class BatchIn(BaseModel):
+    requests: List[BatchRequest]
@@ -0,0 +1,10 @@
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+
+# A row of a bulk request that was not applied
+class BulkError(BaseModel):
+    index: int
+    id: Optional[int] = None
+    detail: Any
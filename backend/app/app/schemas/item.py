@@ -1,7 +1,9 @@
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel
 
+from .bulk import BulkError
+
 
 # Shared properties
 class ItemBase(BaseModel):
@@ -19,6 +21,11 @@ class ItemUpdate(ItemBase):
     pass
 
 
+# Properties to receive on bulk item update
+class ItemBulkUpdate(ItemUpdate):
+    id: int
+
+
 # Properties shared by models stored in DB
 class ItemInDBBase(ItemBase):
     id: int
@@ -34,6 +41,31 @@ class Item(ItemInDBBase):
     pass
 
 
+# Item listed with its owner's email
+class ItemWithOwner(Item):
+    owner_email: Optional[str] = None
+
+
+# Item found by a search, best matches having the highest rank
+class ItemSearchResult(Item):
+    rank: float
+
+
 # Properties properties stored in DB
 class ItemInDB(ItemInDBBase):
     pass
+
+
+# Outcome of a bulk item request
+class ItemBulkResult(BaseModel):
+    items: List[Item]
+    errors: List[BulkError]
+
+
+# Items changed since a delta sync watermark
+class ItemChanges(BaseModel):
+    items: List[Item]
+    deleted: List[int]
+    watermark: int
+    # Set while more changes follow, pass it to read the next page
+    cursor: Optional[str] = None
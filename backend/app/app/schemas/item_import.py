@@ -0,0 +1,35 @@
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from .bulk import BulkError
+
+
+# Properties to receive on import creation
+class ItemImportCreate(BaseModel):
+    format: str
+
+
+# Progress reported by the import task
+class ItemImportUpdate(BaseModel):
+    status: Optional[str] = None
+    rows_read: Optional[int] = None
+    rows_failed: Optional[int] = None
+    rows_imported: Optional[int] = None
+    errors: Optional[List[Dict[str, Any]]] = None
+    detail: Optional[str] = None
+
+
+# Properties to return to client
+class ItemImport(BaseModel):
+    id: int
+    format: str
+    status: str
+    rows_read: int
+    rows_failed: int
+    rows_imported: int
+    errors: List[BulkError]
+    detail: Optional[str] = None
+
+    class Config:
+        orm_mode = True
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+
+
+# Items of one owner
+class OwnerItemStats(BaseModel):
+    owner_id: int
+    item_count: int
+
+
+# Totals over all owners
+class ItemStats(BaseModel):
+    owners: int
+    items: int
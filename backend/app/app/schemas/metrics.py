@@ -0,0 +1,33 @@
+from pydantic import BaseModel
+
+
+class PasswordHasherMetrics(BaseModel):
+    workers: int
+    max_pending: int
+    in_flight: int
+    queued: int
+    completed: int
+    failed: int
+    rejected: int
+
+
+class PoolMetrics(BaseModel):
+    size: int
+    checked_out: int
+    checked_in: int
+    overflow: int
+    checkouts: int
+    timeouts: int
+    wait_seconds_total: float
+    wait_seconds_max: float
+    connects: int
+    closes: int
+    invalidations: int
+    connection_age_seconds_max: float
+    connection_age_seconds_mean: float
+
+
+class EntityCacheMetrics(BaseModel):
+    hits: int
+    misses: int
+    coalesced: int
@@ -34,6 +34,11 @@ class User(UserInDBBase):
     pass
 
 
+# User listed with the number of items they own
+class UserWithItemCount(User):
+    item_count: int
+
+
 # Additional properties stored in DB
 class UserInDB(UserInDBBase):
     hashed_password: str
@@ -0,0 +1,172 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from _pytest.monkeypatch import MonkeyPatch
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud
+from app.api import batch
+from app.core.config import settings
+from app.db.routing import parse_lsn
+from app.db.session import async_engine, replica_router
+
+
+def test_batch(client: TestClient, normal_user_token_headers: Dict[str, str]) -> None:
+    requests = [
+        {"path": "/users/me"},
+        {"path": "/items/?limit=2"},
+        {"method": "POST", "path": "/items/", "body": {"title": "Batched"}},
+        {"method": "PUT", "path": "/items/0", "body": {"title": "Gone"}},
+        {"path": "/nowhere"},
+        {"method": "POST", "path": "/batch", "body": {"requests": []}},
+    ]
+    r = client.post(
+        f"{settings.API_V1_STR}/batch",
+        headers=normal_user_token_headers,
+        json={"requests": requests},
+    )
+    assert r.status_code == 200
+    me, items, created, missing, unknown, nested = r.json()
+    assert me["status"] == 200
+    assert items["status"] == 200
+    assert len(items["body"]) <= 2
+    assert created["status"] == 200
+    assert created["body"]["title"] == "Batched"
+    assert created["body"]["owner_id"] == me["body"]["id"]
+    assert missing["status"] == 404
+    assert unknown["status"] == 404
+    assert nested["status"] == 400
+
+    # Writes are visible to the requests after them
+    item_path = f"/items/{created['body']['id']}"
+    requests = [
+        {"method": "PUT", "path": item_path, "body": {"title": "Renamed"}},
+        {"path": item_path},
+        {"method": "DELETE", "path": item_path},
+        {"path": item_path},
+    ]
+    r = client.post(
+        f"{settings.API_V1_STR}/batch",
+        headers=normal_user_token_headers,
+        json={"requests": requests},
+    )
+    assert r.status_code == 200
+    updated, read, deleted, read_deleted = r.json()
+    assert updated["status"] == 200
+    assert read["status"] == 200
+    assert read["body"]["title"] == "Renamed"
+    assert deleted["status"] == 200
+    assert read_deleted["status"] == 404
+
+
+def test_batch_write_failure_is_rolled_back(
+    client: TestClient,
+    normal_user_token_headers: Dict[str, str],
+    monkeypatch: MonkeyPatch,
+) -> None:
+    create_with_owner = crud.async_item.create_with_owner
+
+    async def fail_once(db: AsyncSession, **kwargs: Any) -> Any:
+        monkeypatch.setattr(crud.async_item, "create_with_owner", create_with_owner)
+        await db.execute(text("SELECT 1 / 0"))
+
+    monkeypatch.setattr(crud.async_item, "create_with_owner", fail_once)
+    requests = [
+        {"method": "POST", "path": "/items/", "body": {"title": "Failing"}},
+        {"method": "POST", "path": "/items/", "body": {"title": "Batched"}},
+    ]
+    r = client.post(
+        f"{settings.API_V1_STR}/batch",
+        headers=normal_user_token_headers,
+        json={"requests": requests},
+    )
+    assert r.status_code == 200
+    failed, created = r.json()
+    assert failed["status"] == 500
+    assert created["status"] == 200
+    assert created["body"]["title"] == "Batched"
+
+
+def test_batch_reads_follow_writes(
+    client: TestClient,
+    normal_user_token_headers: Dict[str, str],
+    monkeypatch: MonkeyPatch,
+) -> None:
+    # The primary stands in for a replica
+    monkeypatch.setattr(replica_router, "replicas", [async_engine])
+    monkeypatch.setattr(replica_router, "_down_until", [0.0])
+    session = replica_router.session
+    read_after: List[Optional[str]] = []
+
+    async def record(position: Optional[str] = None) -> AsyncSession:
+        read_after.append(position)
+        return await session(position)
+
+    monkeypatch.setattr(replica_router, "session", record)
+    requests = [
+        {"path": "/items/"},
+        {"method": "POST", "path": "/items/", "body": {"title": "Batched"}},
+        {"path": "/items/"},
+    ]
+    client.cookies.clear()
+    r = client.post(
+        f"{settings.API_V1_STR}/batch",
+        headers=normal_user_token_headers,
+        json={"requests": requests},
+    )
+    assert r.status_code == 200
+    assert [response["status"] for response in r.json()] == [200, 200, 200]
+    before, after = read_after
+    assert before is None
+    assert parse_lsn(after) is not None
+    client.cookies.clear()
+
+
+def test_batch_read_concurrency(
+    client: TestClient,
+    normal_user_token_headers: Dict[str, str],
+    monkeypatch: MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(settings, "BATCH_READ_CONCURRENCY", 2)
+    running: List[int] = [0]
+    peak: List[int] = [0]
+    dispatch = batch.dispatch
+
+    async def counted(*args: Any) -> Any:
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        try:
+            await asyncio.sleep(0.01)
+            return await dispatch(*args)
+        finally:
+            running[0] -= 1
+
+    monkeypatch.setattr(batch, "dispatch", counted)
+    r = client.post(
+        f"{settings.API_V1_STR}/batch",
+        headers=normal_user_token_headers,
+        json={"requests": [{"path": "/users/me"}] * 6},
+    )
+    assert r.status_code == 200
+    assert [response["status"] for response in r.json()] == [200] * 6
+    assert peak == [2]
+
+
+def test_batch_limits(
+    client: TestClient,
+    normal_user_token_headers: Dict[str, str],
+    monkeypatch: MonkeyPatch,
+) -> None:
+    r = client.post(
+        f"{settings.API_V1_STR}/batch", json={"requests": [{"path": "/users/me"}]}
+    )
+    assert r.status_code == 401
+    monkeypatch.setattr(settings, "BATCH_MAX_REQUESTS", 1)
+    r = client.post(
+        f"{settings.API_V1_STR}/batch",
+        headers=normal_user_token_headers,
+        json={"requests": [{"path": "/users/me"}] * 2},
+    )
+    assert r.status_code == 400
@@ -1,8 +1,24 @@
+import csv
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
 from fastapi.testclient import TestClient
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 
+from app import crud
+from app.api.api_v1.endpoints.items import page_cache
+from app.core.celery_app import celery_app
 from app.core.config import settings
+from app.crud.pagination import encode_cursor
+from app.item_imports import run_item_import
+from app.schemas.item import ItemCreate
 from app.tests.utils.item import create_random_item
+from app.tests.utils.user import create_random_user
+from app.tests.utils.utils import random_lower_string
 
 
 def test_create_item(
@@ -10,7 +26,9 @@ def test_create_item(
 ) -> None:
     data = {"title": "Foo", "description": "Fighters"}
     response = client.post(
-        f"{settings.API_V1_STR}/items/", headers=superuser_token_headers, json=data,
+        f"{settings.API_V1_STR}/items/",
+        headers=superuser_token_headers,
+        json=data,
     )
     assert response.status_code == 200
     content = response.json()
@@ -25,7 +43,8 @@ def test_read_item(
 ) -> None:
     item = create_random_item(db)
     response = client.get(
-        f"{settings.API_V1_STR}/items/{item.id}", headers=superuser_token_headers,
+        f"{settings.API_V1_STR}/items/{item.id}",
+        headers=superuser_token_headers,
     )
     assert response.status_code == 200
     content = response.json()
@@ -33,3 +52,496 @@ def test_read_item(
     assert content["description"] == item.description
     assert content["id"] == item.id
     assert content["owner_id"] == item.owner_id
+
+
+def test_item_owner_checks(
+    client: TestClient, normal_user_token_headers: dict, db: Session
+) -> None:
+    item = create_random_item(db)
+    url = f"{settings.API_V1_STR}/items/{item.id}"
+    headers = normal_user_token_headers
+    assert client.get(url, headers=headers).status_code == 400
+    r = client.put(url, headers=headers, json={"title": "Foo"})
+    assert r.status_code == 400
+    assert client.delete(url, headers=headers).status_code == 400
+    missing = f"{settings.API_V1_STR}/items/{item.id + 1000000}"
+    assert client.get(missing, headers=headers).status_code == 404
+    assert client.delete(missing, headers=headers).status_code == 404
+
+
+def test_item_etag(
+    client: TestClient, superuser_token_headers: dict, db: Session
+) -> None:
+    item = create_random_item(db)
+    url = f"{settings.API_V1_STR}/items/{item.id}"
+    r = client.get(url, headers=superuser_token_headers)
+    etag = r.headers["ETag"]
+    assert etag == f'"{item.id}-1"'
+    r = client.get(url, headers={**superuser_token_headers, "If-None-Match": etag})
+    assert r.status_code == 304
+    r = client.put(
+        url,
+        headers={**superuser_token_headers, "If-Match": etag},
+        json={"title": "Foo"},
+    )
+    assert r.status_code == 200
+    assert r.headers["ETag"] == f'"{item.id}-2"'
+    r = client.put(
+        url,
+        headers={**superuser_token_headers, "If-Match": etag},
+        json={"title": "Bar"},
+    )
+    assert r.status_code == 412
+    assert r.headers["ETag"] == f'"{item.id}-2"'
+    r = client.get(url, headers={**superuser_token_headers, "If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.json()["title"] == "Foo"
+
+
+def test_read_items_cursor(
+    client: TestClient, normal_user_token_headers: dict, db: Session
+) -> None:
+    user_id = client.get(
+        f"{settings.API_V1_STR}/users/me",
+        headers=normal_user_token_headers,
+    ).json()["id"]
+    for _ in range(3):
+        create_random_item(db, owner_id=user_id)
+    r = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=normal_user_token_headers,
+        params={"limit": 2},
+    )
+    assert r.status_code == 200
+    first_page = r.json()
+    assert len(first_page) == 2
+    cursor = r.headers["X-Next-Cursor"]
+    r = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=normal_user_token_headers,
+        params={"limit": 2, "cursor": cursor},
+    )
+    assert r.status_code == 200
+    assert r.json()[0]["id"] > first_page[-1]["id"]
+
+
+def test_read_items_cached(
+    client: TestClient, normal_user_token_headers: dict, db: Session
+) -> None:
+    url = f"{settings.API_V1_STR}/items/?limit=1000"
+    r = client.get(url, headers=normal_user_token_headers)
+    assert r.status_code == 200
+    hits = page_cache.hits
+    assert client.get(url, headers=normal_user_token_headers).json() == r.json()
+    assert page_cache.hits == hits + 1
+    owner_id = client.get(
+        f"{settings.API_V1_STR}/users/me", headers=normal_user_token_headers
+    ).json()["id"]
+    item = create_random_item(db, owner_id=owner_id)
+    r = client.get(url, headers=normal_user_token_headers)
+    assert item.id in [i["id"] for i in r.json()]
+    # Writes of other processes, e.g. the import worker, reach the cache too
+    db.execute(
+        text("UPDATE item SET title = 'renamed' WHERE id = :id"), {"id": item.id}
+    )
+    db.commit()
+    r = client.get(url, headers=normal_user_token_headers)
+    assert {"id": item.id, "title": "renamed"}.items() <= next(
+        i for i in r.json() if i["id"] == item.id
+    ).items()
+
+
+def test_read_all_items_not_cached(
+    client: TestClient, superuser_token_headers: dict
+) -> None:
+    url = f"{settings.API_V1_STR}/items/?limit=1"
+    hits = page_cache.hits
+    for _ in range(2):
+        assert client.get(url, headers=superuser_token_headers).status_code == 200
+    assert page_cache.hits == hits
+
+
+def test_read_items_trusted(
+    client: TestClient,
+    normal_user_token_headers: dict,
+    db: Session,
+    monkeypatch: MonkeyPatch,
+) -> None:
+    owner_id = client.get(
+        f"{settings.API_V1_STR}/users/me", headers=normal_user_token_headers
+    ).json()["id"]
+    for _ in range(4):
+        create_random_item(db, owner_id=owner_id)
+    url = f"{settings.API_V1_STR}/items/"
+    r = client.get(url, params={"limit": 2}, headers=normal_user_token_headers)
+    monkeypatch.setattr(settings, "TRUSTED_LIST_RESPONSES", True)
+    trusted = client.get(url, params={"limit": 3}, headers=normal_user_token_headers)
+    assert trusted.status_code == 200
+    assert trusted.json()[:2] == r.json()
+    assert trusted.headers.get("X-Next-Cursor") is not None
+
+
+def test_read_items_sparse_fields(
+    client: TestClient,
+    normal_user_token_headers: dict,
+    db: Session,
+    monkeypatch: MonkeyPatch,
+) -> None:
+    owner_id = client.get(
+        f"{settings.API_V1_STR}/users/me", headers=normal_user_token_headers
+    ).json()["id"]
+    for _ in range(3):
+        create_random_item(db, owner_id=owner_id)
+    url = f"{settings.API_V1_STR}/items/"
+    full = client.get(url, params={"limit": 2}, headers=normal_user_token_headers)
+    params: Dict[str, Any] = {"limit": 2, "fields": "title,id"}
+    r = client.get(url, params=params, headers=normal_user_token_headers)
+    assert r.status_code == 200
+    expected = [{"title": i["title"], "id": i["id"]} for i in full.json()]
+    assert r.json() == expected
+    assert r.headers["X-Next-Cursor"] == full.headers["X-Next-Cursor"]
+    params = {"limit": 2, "fields": "title"}
+    monkeypatch.setattr(settings, "TRUSTED_LIST_RESPONSES", True)
+    r = client.get(url, params=params, headers=normal_user_token_headers)
+    assert r.json() == [{"title": i["title"]} for i in full.json()]
+    params = {"fields": "title,secret"}
+    r = client.get(url, params=params, headers=normal_user_token_headers)
+    assert r.status_code == 400
+
+
+def test_export_items(
+    client: TestClient,
+    normal_user_token_headers: dict,
+    db: Session,
+    monkeypatch: MonkeyPatch,
+) -> None:
+    owner_id = client.get(
+        f"{settings.API_V1_STR}/users/me", headers=normal_user_token_headers
+    ).json()["id"]
+    ids = [create_random_item(db, owner_id=owner_id).id for _ in range(3)]
+    monkeypatch.setattr(settings, "EXPORT_CHUNK_SIZE", 2)
+    url = f"{settings.API_V1_STR}/items/export"
+    r = client.get(url, headers=normal_user_token_headers)
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/x-ndjson"
+    assert r.headers["content-encoding"] == "gzip"
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert {row["owner_id"] for row in rows} == {owner_id}
+    assert set(ids) <= {row["id"] for row in rows}
+    assert [row["id"] for row in rows] == sorted(row["id"] for row in rows)
+    r = client.get(url, params={"format": "csv"}, headers=normal_user_token_headers)
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/csv")
+    table = list(csv.DictReader(r.text.splitlines()))
+    assert [int(row["id"]) for row in table] == [row["id"] for row in rows]
+
+
+def test_import_items(
+    client: TestClient,
+    normal_user_token_headers: dict,
+    monkeypatch: MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    sent: List[Any] = []
+    monkeypatch.setattr(
+        celery_app, "send_task", lambda name, args: sent.append((name, args))
+    )
+    monkeypatch.setattr(settings, "IMPORT_SPOOL_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "IMPORT_CHUNK_SIZE", 2)
+    content = 'title,description\nfirst,\t\\\\tab\n,no title\nthird,"two\nlines"\n'
+    r = client.post(
+        f"{settings.API_V1_STR}/items/import",
+        params={"format": "csv"},
+        files={"file": ("items.csv", content)},
+        headers=normal_user_token_headers,
+    )
+    assert r.status_code == 202
+    job = r.json()
+    assert job["status"] == "pending"
+    assert sent == [("app.worker.import_items", [job["id"]])]
+    run_item_import(job["id"])
+    url = f"{settings.API_V1_STR}/items/import/{job['id']}"
+    r = client.get(url, headers=normal_user_token_headers)
+    assert r.status_code == 200
+    job = r.json()
+    assert job["status"] == "done"
+    assert (job["rows_read"], job["rows_failed"], job["rows_imported"]) == (3, 1, 2)
+    assert [error["index"] for error in job["errors"]] == [1]
+    assert not list(tmp_path.iterdir())
+    r = client.get(
+        f"{settings.API_V1_STR}/items/export", headers=normal_user_token_headers
+    )
+    rows = [json.loads(line) for line in r.text.splitlines()][-2:]
+    assert [(row["title"], row["description"]) for row in rows] == [
+        ("first", "\t\\\\tab"),
+        ("third", "two\nlines"),
+    ]
+
+
+def test_import_items_commit_with_status(
+    client: TestClient,
+    normal_user_token_headers: dict,
+    db: Session,
+    monkeypatch: MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setattr(celery_app, "send_task", lambda name, args: None)
+    monkeypatch.setattr(settings, "IMPORT_SPOOL_DIR", str(tmp_path))
+    r = client.post(
+        f"{settings.API_V1_STR}/items/import",
+        params={"format": "csv"},
+        files={"file": ("items.csv", "title\nfirst\nsecond\n")},
+        headers=normal_user_token_headers,
+    )
+    job = r.json()
+    owner_id = client.get(
+        f"{settings.API_V1_STR}/users/me", headers=normal_user_token_headers
+    ).json()["id"]
+    count = text("SELECT count(*) FROM item WHERE owner_id = :owner_id")
+    before = db.execute(count, {"owner_id": owner_id}).scalar()
+    update = crud.item_import.update
+
+    def fail_done(db: Session, *, db_obj: Any, obj_in: Dict[str, Any]) -> Any:
+        if obj_in.get("status") == "done":
+            # The worker dies before the import is marked done
+            raise RuntimeError("lost")
+        return update(db, db_obj=db_obj, obj_in=obj_in)
+
+    monkeypatch.setattr(crud.item_import, "update", fail_done)
+    with pytest.raises(RuntimeError):
+        run_item_import(job["id"])
+    db.rollback()
+    assert db.execute(count, {"owner_id": owner_id}).scalar() == before
+    url = f"{settings.API_V1_STR}/items/import/{job['id']}"
+    assert client.get(url, headers=normal_user_token_headers).json()["status"] == (
+        "failed"
+    )
+
+
+def test_read_item_changes(
+    client: TestClient, normal_user_token_headers: dict, db: Session
+) -> None:
+    owner_id = client.get(
+        f"{settings.API_V1_STR}/users/me", headers=normal_user_token_headers
+    ).json()["id"]
+    unchanged, updated, deleted = [
+        create_random_item(db, owner_id=owner_id) for _ in range(3)
+    ]
+    other = create_random_item(db)
+    url = f"{settings.API_V1_STR}/items/changes"
+    r = client.get(url, headers=normal_user_token_headers)
+    assert r.status_code == 200
+    changes = r.json()
+    assert {unchanged.id, updated.id, deleted.id} <= {
+        item["id"] for item in changes["items"]
+    }
+    assert other.id not in {item["id"] for item in changes["items"]}
+    assert changes["deleted"] == []
+    client.put(
+        f"{settings.API_V1_STR}/items/{updated.id}",
+        headers=normal_user_token_headers,
+        json={"title": "updated"},
+    )
+    client.delete(
+        f"{settings.API_V1_STR}/items/{deleted.id}", headers=normal_user_token_headers
+    )
+    created = create_random_item(db, owner_id=owner_id)
+    r = client.get(
+        url, params={"since": changes["watermark"]}, headers=normal_user_token_headers
+    )
+    assert r.status_code == 200
+    delta = r.json()
+    assert [item["id"] for item in delta["items"]] == [updated.id, created.id]
+    assert delta["items"][0]["title"] == "updated"
+    assert delta["deleted"] == [deleted.id]
+    assert delta["watermark"] > changes["watermark"]
+
+
+def test_read_item_changes_pages(
+    client: TestClient, normal_user_token_headers: dict, db: Session
+) -> None:
+    owner_id = client.get(
+        f"{settings.API_V1_STR}/users/me", headers=normal_user_token_headers
+    ).json()["id"]
+    url = f"{settings.API_V1_STR}/items/changes"
+    r = client.get(url, headers=normal_user_token_headers)
+    assert r.status_code == 200
+    since = r.json()["watermark"]
+    created = [create_random_item(db, owner_id=owner_id) for _ in range(3)]
+    deleted = create_random_item(db, owner_id=owner_id)
+    crud.item.remove(db=db, id=deleted.id)
+    pages = []
+    params = {"since": since, "limit": 2}
+    while True:
+        r = client.get(url, params=params, headers=normal_user_token_headers)
+        assert r.status_code == 200
+        pages.append(r.json())
+        if not pages[-1]["cursor"]:
+            break
+        assert pages[-1]["watermark"] >= since
+        params["cursor"] = pages[-1]["cursor"]
+    assert [len(page["items"]) + len(page["deleted"]) for page in pages] == [2, 2]
+    assert [item["id"] for page in pages for item in page["items"]] == [
+        item.id for item in created
+    ]
+    assert [id for page in pages for id in page["deleted"]] == [deleted.id]
+    assert pages[-1]["watermark"] > since
+    params["cursor"] = "bogus"
+    r = client.get(url, params=params, headers=normal_user_token_headers)
+    assert r.status_code == 400
+
+
+def test_read_items_with_owners(
+    client: TestClient, superuser_token_headers: dict, db: Session
+) -> None:
+    item = create_random_item(db)
+    owner = crud.user.get(db, id=item.owner_id)
+    assert owner
+    listed: List[Any] = []
+    params: Dict[str, Any] = {"limit": 1000}
+    while True:
+        r = client.get(
+            f"{settings.API_V1_STR}/items/with-owners",
+            headers=superuser_token_headers,
+            params=params,
+        )
+        assert r.status_code == 200
+        listed += r.json()
+        if "X-Next-Cursor" not in r.headers:
+            break
+        params["cursor"] = r.headers["X-Next-Cursor"]
+    [row] = [row for row in listed if row["id"] == item.id]
+    assert row["owner_email"] == owner.email
+    assert row["title"] == item.title
+
+
+def test_read_items_batch(
+    client: TestClient, normal_user_token_headers: dict, db: Session
+) -> None:
+    owner_id = client.get(
+        f"{settings.API_V1_STR}/users/me", headers=normal_user_token_headers
+    ).json()["id"]
+    items = [create_random_item(db, owner_id=owner_id) for _ in range(2)]
+    other = create_random_item(db)
+    missing = other.id + 1000000
+    ids = [items[1].id, other.id, items[0].id, missing]
+    r = client.get(
+        f"{settings.API_V1_STR}/items/batch",
+        headers=normal_user_token_headers,
+        params={"ids": ",".join(map(str, ids))},
+    )
+    assert r.status_code == 200
+    content = r.json()
+    assert [item["id"] for item in content["items"]] == [items[1].id, items[0].id]
+    assert content["errors"] == [
+        {"index": 1, "id": other.id, "detail": "Not enough permissions"},
+        {"index": 3, "id": missing, "detail": "Item not found"},
+    ]
+    r = client.get(
+        f"{settings.API_V1_STR}/items/batch",
+        headers=normal_user_token_headers,
+        params={"ids": "1,x"},
+    )
+    assert r.status_code == 422
+
+
+def test_search_items(
+    client: TestClient,
+    superuser_token_headers: dict,
+    normal_user_token_headers: dict,
+    db: Session,
+) -> None:
+    word = random_lower_string()
+    user = create_random_user(db)
+    titles = [f"{word} one", "two", f"three {word}"]
+    descriptions = [None, f"about {word}", None]
+    items = [
+        crud.item.create_with_owner(
+            db=db,
+            obj_in=ItemCreate(title=title, description=description),
+            owner_id=user.id,
+        )
+        for title, description in zip(titles, descriptions)
+    ]
+    url = f"{settings.API_V1_STR}/items/search"
+    params: Dict[str, Any] = {"q": word, "limit": 2}
+    r = client.get(url, headers=superuser_token_headers, params=params)
+    assert r.status_code == 200
+    found = r.json()
+    # Title matches rank above description ones
+    assert {item["id"] for item in found} == {items[0].id, items[2].id}
+    assert found[0]["rank"] >= found[1]["rank"]
+    params["cursor"] = r.headers["X-Next-Cursor"]
+    r = client.get(url, headers=superuser_token_headers, params=params)
+    assert [item["id"] for item in r.json()] == [items[1].id]
+    assert "X-Next-Cursor" not in r.headers
+    r = client.get(url, headers=normal_user_token_headers, params={"q": word})
+    assert r.json() == []
+
+
+def test_read_items_invalid_cursor(
+    client: TestClient, superuser_token_headers: dict
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=superuser_token_headers,
+        params={"cursor": "not-a-cursor"},
+    )
+    assert r.status_code == 400
+    # Well-formed cursors with keys the sort columns cannot hold
+    for path, cursor in (
+        ("/items/", encode_cursor("id", ["x"])),
+        ("/items/", encode_cursor("id", [1, 2])),
+        ("/items/", encode_cursor("id", [2**40])),
+        ("/items/", encode_cursor("id", [True])),
+        ("/items/search?q=foo", encode_cursor("rank", ["x", 1])),
+        ("/users/?order_by=email", encode_cursor("email", [1, 1])),
+    ):
+        r = client.get(
+            f"{settings.API_V1_STR}{path}",
+            headers=superuser_token_headers,
+            params={"cursor": cursor},
+        )
+        assert r.status_code == 400, path
+
+
+def test_bulk_items(
+    client: TestClient, normal_user_token_headers: dict, db: Session
+) -> None:
+    data = [{"title": "Foo"}, {"description": "no title"}, {"title": "Bar"}]
+    r = client.post(
+        f"{settings.API_V1_STR}/items/bulk",
+        headers=normal_user_token_headers,
+        json=data,
+    )
+    assert r.status_code == 200
+    content = r.json()
+    assert [item["title"] for item in content["items"]] == ["Foo", "Bar"]
+    assert [error["index"] for error in content["errors"]] == [1]
+    ids = [item["id"] for item in content["items"]]
+
+    foreign_item = create_random_item(db)
+    data = [{"id": id, "description": "Fighters"} for id in ids]
+    data.append({"id": foreign_item.id, "description": "Fighters"})
+    r = client.patch(
+        f"{settings.API_V1_STR}/items/bulk",
+        headers=normal_user_token_headers,
+        json=data,
+    )
+    assert r.status_code == 200
+    content = r.json()
+    assert all(item["description"] == "Fighters" for item in content["items"])
+    assert content["errors"] == [
+        {"index": 2, "id": foreign_item.id, "detail": "Not enough permissions"}
+    ]
+
+    r = client.request(
+        "DELETE",
+        f"{settings.API_V1_STR}/items/bulk",
+        headers=normal_user_token_headers,
+        json=ids + [ids[0]],
+    )
+    assert r.status_code == 200
+    content = r.json()
+    assert sorted(item["id"] for item in content["items"]) == sorted(ids)
+    assert content["errors"] == [{"index": 2, "id": ids[0], "detail": "Duplicate id"}]
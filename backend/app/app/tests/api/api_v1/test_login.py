@@ -21,7 +21,8 @@ def test_use_access_token(
     client: TestClient, superuser_token_headers: Dict[str, str]
 ) -> None:
     r = client.post(
-        f"{settings.API_V1_STR}/login/test-token", headers=superuser_token_headers,
+        f"{settings.API_V1_STR}/login/test-token",
+        headers=superuser_token_headers,
     )
     result = r.json()
     assert r.status_code == 200
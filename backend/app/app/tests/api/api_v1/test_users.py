@@ -5,7 +5,10 @@ from sqlalchemy.orm import Session
 
 from app import crud
 from app.core.config import settings
+from app.crud.pagination import encode_cursor
 from app.schemas.user import UserCreate
+from app.tests.utils.item import create_random_item
+from app.tests.utils.user import create_random_user
 from app.tests.utils.utils import random_email, random_lower_string
 
 
@@ -31,6 +34,19 @@ def test_get_users_normal_user_me(
     assert current_user["email"] == settings.EMAIL_TEST_USER
 
 
+def test_get_users_me_not_modified(
+    client: TestClient, normal_user_token_headers: Dict[str, str]
+) -> None:
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=normal_user_token_headers)
+    etag = r.headers["ETag"]
+    r = client.get(
+        f"{settings.API_V1_STR}/users/me",
+        headers={**normal_user_token_headers, "If-None-Match": etag},
+    )
+    assert r.status_code == 304
+    assert r.headers["ETag"] == etag
+
+
 def test_create_user_new_email(
     client: TestClient, superuser_token_headers: dict, db: Session
 ) -> None:
@@ -38,7 +54,9 @@ def test_create_user_new_email(
     password = random_lower_string()
     data = {"email": username, "password": password}
     r = client.post(
-        f"{settings.API_V1_STR}/users/", headers=superuser_token_headers, json=data,
+        f"{settings.API_V1_STR}/users/",
+        headers=superuser_token_headers,
+        json=data,
     )
     assert 200 <= r.status_code < 300
     created_user = r.json()
@@ -56,7 +74,8 @@ def test_get_existing_user(
     user = crud.user.create(db, obj_in=user_in)
     user_id = user.id
     r = client.get(
-        f"{settings.API_V1_STR}/users/{user_id}", headers=superuser_token_headers,
+        f"{settings.API_V1_STR}/users/{user_id}",
+        headers=superuser_token_headers,
     )
     assert 200 <= r.status_code < 300
     api_user = r.json()
@@ -75,7 +94,9 @@ def test_create_user_existing_username(
     crud.user.create(db, obj_in=user_in)
     data = {"email": username, "password": password}
     r = client.post(
-        f"{settings.API_V1_STR}/users/", headers=superuser_token_headers, json=data,
+        f"{settings.API_V1_STR}/users/",
+        headers=superuser_token_headers,
+        json=data,
     )
     created_user = r.json()
     assert r.status_code == 400
@@ -89,7 +110,9 @@ def test_create_user_by_normal_user(
     password = random_lower_string()
     data = {"email": username, "password": password}
     r = client.post(
-        f"{settings.API_V1_STR}/users/", headers=normal_user_token_headers, json=data,
+        f"{settings.API_V1_STR}/users/",
+        headers=normal_user_token_headers,
+        json=data,
     )
     assert r.status_code == 400
 
@@ -113,3 +136,59 @@ def test_retrieve_users(
     assert len(all_users) > 1
     for item in all_users:
         assert "email" in item
+
+
+def test_retrieve_users_sparse_fields(
+    client: TestClient, superuser_token_headers: dict
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/users/",
+        headers=superuser_token_headers,
+        params={"fields": "email", "order_by": "email", "limit": 2},
+    )
+    assert r.status_code == 200
+    assert [list(user) for user in r.json()] == [["email"], ["email"]]
+    assert "X-Next-Cursor" in r.headers
+
+
+def test_retrieve_users_with_item_counts(
+    client: TestClient, superuser_token_headers: dict, db: Session
+) -> None:
+    user = create_random_user(db)
+    for _ in range(2):
+        create_random_item(db, owner_id=user.id)
+    # A page starting at the user, the email minus its last letter sorts before
+    cursor = encode_cursor("email", [user.email[:-1]])
+    r = client.get(
+        f"{settings.API_V1_STR}/users/with-item-counts",
+        headers=superuser_token_headers,
+        params={"order_by": "email", "cursor": cursor, "limit": 1},
+    )
+    assert r.status_code == 200
+    [row] = r.json()
+    assert (row["email"], row["item_count"]) == (user.email, 2)
+
+
+def test_retrieve_user_stats(
+    client: TestClient,
+    superuser_token_headers: dict,
+    normal_user_token_headers: Dict[str, str],
+    db: Session,
+) -> None:
+    user = create_random_user(db)
+    create_random_item(db, owner_id=user.id)
+    r = client.get(
+        f"{settings.API_V1_STR}/users/{user.id}/stats", headers=superuser_token_headers
+    )
+    assert r.status_code == 200
+    assert r.json() == {"owner_id": user.id, "item_count": 1}
+    r = client.get(
+        f"{settings.API_V1_STR}/users/{user.id}/stats",
+        headers=normal_user_token_headers,
+    )
+    assert r.status_code == 400
+    r = client.get(
+        f"{settings.API_V1_STR}/items/stats", headers=superuser_token_headers
+    )
+    stats = r.json()
+    assert stats["owners"] >= 1 and stats["items"] >= 1
@@ -0,0 +1,46 @@
+from typing import Dict
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+
+
+def test_read_password_hasher_metrics(
+    client: TestClient, superuser_token_headers: Dict[str, str]
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/utils/metrics/password-hasher",
+        headers=superuser_token_headers,
+    )
+    metrics = r.json()
+    assert r.status_code == 200
+    assert metrics["workers"] >= 1
+    assert metrics["completed"] >= 1
+
+
+def test_read_db_pool_metrics(
+    client: TestClient, superuser_token_headers: Dict[str, str]
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/utils/metrics/db-pool",
+        headers=superuser_token_headers,
+    )
+    metrics = r.json()
+    assert r.status_code == 200
+    assert metrics["async"]["checkouts"] >= 1
+    assert metrics["async"]["connects"] >= 1
+    assert metrics["async"]["connection_age_seconds_max"] >= 0
+
+
+def test_read_entity_cache_metrics(
+    client: TestClient, superuser_token_headers: Dict[str, str]
+) -> None:
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=superuser_token_headers)
+    assert r.status_code == 200
+    r = client.get(
+        f"{settings.API_V1_STR}/utils/metrics/entity-cache",
+        headers=superuser_token_headers,
+    )
+    metrics = r.json()
+    assert r.status_code == 200
+    assert metrics["user"]["hits"] + metrics["user"]["misses"] >= 1
@@ -0,0 +1,43 @@
+import time
+
+from app.core.cache import TTLCache
+
+
+def test_cache_get_set() -> None:
+    cache: TTLCache[str] = TTLCache(maxsize=10, ttl=60)
+    assert cache.get("a") is None
+    cache.set("a", "value")
+    assert cache.get("a") == "value"
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_cache_evicts_least_recently_used() -> None:
+    cache: TTLCache[int] = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert len(cache) == 2
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_cache_expires_entries() -> None:
+    cache: TTLCache[int] = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_cache_invalidate_tag() -> None:
+    cache: TTLCache[int] = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1, tags=[1])
+    cache.set("b", 2, tags=[1])
+    cache.set("c", 3, tags=[2])
+    assert cache.invalidate_tag(1) == 2
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
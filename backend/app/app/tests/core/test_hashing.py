@@ -0,0 +1,70 @@
+import asyncio
+import os
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+
+from app.core.config import settings
+from app.core.hashing import PasswordHasher, PasswordHasherBusy, default_workers
+from app.core.security import verify_password
+from app.tests.utils.utils import random_lower_string
+
+
+def test_hash_and_verify() -> None:
+    hasher = PasswordHasher(max_workers=1)
+    password = random_lower_string()
+
+    async def run() -> None:
+        hashed_password = await hasher.hash(password)
+        assert verify_password(password, hashed_password)
+        assert await hasher.verify(password, hashed_password)
+        assert not await hasher.verify(random_lower_string(), hashed_password)
+
+    try:
+        asyncio.run(run())
+    finally:
+        hasher.shutdown()
+    metrics = hasher.metrics()
+    assert metrics["completed"] == 3
+    assert metrics["in_flight"] == 0
+    assert metrics["rejected"] == 0
+
+
+def test_hash_rejects_when_saturated() -> None:
+    hasher = PasswordHasher(max_workers=1, max_pending=0)
+
+    async def run() -> None:
+        await asyncio.gather(hasher.hash("first"), hasher.hash("second"))
+
+    try:
+        with pytest.raises(PasswordHasherBusy):
+            asyncio.run(run())
+    finally:
+        hasher.shutdown()
+    assert hasher.metrics()["rejected"] == 1
+
+
+def test_hash_failures_are_counted() -> None:
+    hasher = PasswordHasher(max_workers=1)
+
+    async def run() -> None:
+        await hasher.verify("password", "not a hash")
+
+    try:
+        with pytest.raises(ValueError):
+            asyncio.run(run())
+    finally:
+        hasher.shutdown()
+    metrics = hasher.metrics()
+    assert metrics["failed"] == 1
+    assert metrics["completed"] == 0
+
+
+def test_default_workers_share_cpus(monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(os, "cpu_count", lambda: 8)
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", None)
+    assert default_workers() == 1
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 2)
+    assert default_workers() == 4
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 16)
+    assert default_workers() == 1
@@ -0,0 +1,102 @@
+import asyncio
+from typing import Any, Dict, Optional
+
+from _pytest.monkeypatch import MonkeyPatch
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.db.routing import LSN_COOKIE, ReplicaRouter, parse_lsn
+from app.db.session import async_engine, replica_router
+
+# Engine name -> WAL position it replayed up to
+replayed: Dict[str, Optional[str]] = {}
+
+
+class FakeSession:
+    def __init__(self, *, bind: str):
+        self.bind = bind
+        self.info: Dict[str, Any] = {}
+
+    async def connection(self) -> None:
+        pass
+
+    async def scalar(self, statement: Any) -> Optional[str]:
+        return replayed[self.bind]
+
+    async def close(self) -> None:
+        pass
+
+
+def make_router(primary: Any, *replicas: Any) -> ReplicaRouter:
+    return ReplicaRouter(FakeSession, primary, replicas, retry_after=60)
+
+
+def test_candidates_round_robin() -> None:
+    router = make_router("primary", "a", "b")
+    assert router.candidates() == ["a", "b", "primary"]
+    assert router.candidates() == ["b", "a", "primary"]
+    assert router.candidates() == ["a", "b", "primary"]
+    assert make_router("primary").candidates() == ["primary"]
+
+
+def test_candidates_skip_failed_replica() -> None:
+    router = make_router("primary", "a", "b")
+    router.mark_down("a")
+    assert router.candidates() == ["b", "primary"]
+    router.mark_down("b")
+    assert router.candidates() == ["primary"]
+
+
+def test_parse_lsn() -> None:
+    assert parse_lsn("0/10") == 16
+    assert parse_lsn("1/0") == 1 << 32
+    assert parse_lsn("1/0") > parse_lsn("0/FFFFFFFF")  # type: ignore
+    assert parse_lsn("not-an-lsn") is None
+    assert parse_lsn(None) is None
+
+
+def test_reads_follow_writes_across_routers() -> None:
+    # Two server processes, the write went through the first one
+    writer = make_router("primary", "a")
+    reader = make_router("primary", "a")
+    replayed["a"] = "0/10"
+
+    async def bind(router: ReplicaRouter, read_after: Optional[str]) -> str:
+        return (await router.session(read_after)).bind  # type: ignore
+
+    async def run() -> None:
+        # The client carries the position of its write to the other process
+        assert await bind(reader, "0/20") == "primary"
+        assert await bind(reader, None) == "a"
+        assert await bind(writer, "0/10") == "a"
+        replayed["a"] = "0/20"
+        assert await bind(reader, "0/20") == "a"
+        # A primary configured as replica is never behind
+        replayed["a"] = None
+        assert await bind(reader, "0/30") == "a"
+        # Malformed positions are ignored
+        replayed["a"] = "0/10"
+        assert await bind(reader, "nonsense") == "a"
+
+    asyncio.run(run())
+
+
+def test_writes_hand_out_lsn(
+    client: TestClient,
+    normal_user_token_headers: Dict[str, str],
+    monkeypatch: MonkeyPatch,
+) -> None:
+    # The primary stands in for a replica, it counts as caught up
+    monkeypatch.setattr(replica_router, "replicas", [async_engine])
+    monkeypatch.setattr(replica_router, "_down_until", [0.0])
+    client.cookies.clear()
+    url = f"{settings.API_V1_STR}/items/"
+    r = client.get(url, headers=normal_user_token_headers)
+    assert r.status_code == 200
+    assert LSN_COOKIE not in r.cookies
+    r = client.post(url, headers=normal_user_token_headers, json={"title": "Foo"})
+    assert r.status_code == 200
+    assert parse_lsn(r.cookies[LSN_COOKIE]) is not None
+    r = client.get(f"{url}{r.json()['id']}", headers=normal_user_token_headers)
+    assert r.status_code == 200
+    client.cookies.clear()
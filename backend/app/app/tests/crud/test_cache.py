@@ -0,0 +1,61 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.cache import TTLCache
+from app.crud.cache import EntityCache
+
+
+def test_entity_cache_coalesces_misses() -> None:
+    cache = EntityCache(maxsize=10)
+    loads: List[int] = []
+
+    async def load() -> Optional[Dict[str, Any]]:
+        loads.append(1)
+        await asyncio.sleep(0.01)
+        return {"id": 1}
+
+    async def main() -> List[Optional[Dict[str, Any]]]:
+        return await asyncio.gather(
+            *[cache.aget_or_load(("item", 1), load, ttl=60) for _ in range(5)]
+        )
+
+    assert asyncio.run(main()) == [{"id": 1}] * 5
+    assert len(loads) == 1
+    assert cache.metrics()["item"] == {"hits": 0, "misses": 5, "coalesced": 4}
+    assert cache.get_or_load(("item", 1), lambda: None, ttl=60) == {"id": 1}
+    assert cache.metrics()["item"]["hits"] == 1
+
+
+def test_entity_cache_drops_row_invalidated_while_loading() -> None:
+    cache = EntityCache(maxsize=10)
+
+    def load() -> Dict[str, Any]:
+        cache.invalidate(("item", 1))
+        return {"id": 1, "title": "old"}
+
+    assert cache.get_or_load(("item", 1), load, ttl=60) == {"id": 1, "title": "old"}
+    assert cache.lookup(("item", 1), ttl=60) is None
+
+
+def test_entity_cache_shared_backend() -> None:
+    shared: TTLCache[Dict[str, Any]] = TTLCache(maxsize=10, ttl=60)
+    cache = EntityCache(maxsize=10, shared=shared)
+    other = EntityCache(maxsize=10, shared=shared)
+    cache.store(("user", 1), {"id": 1}, ttl=60)
+    assert other.lookup(("user", 1), ttl=60) == {"id": 1}
+    cache.invalidate(("user", 1))
+    assert shared.get(("user", 1)) is None
+
+
+def test_entity_cache_bounds_local_ttl() -> None:
+    shared: TTLCache[Dict[str, Any]] = TTLCache(maxsize=10, ttl=60)
+    cache = EntityCache(maxsize=10, local_ttl=0.01, shared=shared)
+    other = EntityCache(maxsize=10, local_ttl=0.01, shared=shared)
+    cache.store(("user", 1), {"id": 1}, ttl=60)
+    assert other.lookup(("user", 1), ttl=60) == {"id": 1}
+    # Another process evicts the row, the local copy outlives it briefly
+    shared.delete(("user", 1))
+    assert other.lookup(("user", 1), ttl=60) == {"id": 1}
+    time.sleep(0.02)
+    assert other.lookup(("user", 1), ttl=60) is None
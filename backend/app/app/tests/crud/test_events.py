@@ -0,0 +1,79 @@
+import asyncio
+
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.api.events import item_events
+from app.db.listener import RESYNC, ChangeListener
+from app.schemas.item import ItemCreate
+from app.tests.utils.user import create_random_user
+from app.tests.utils.utils import random_lower_string
+
+
+def test_item_writes_are_announced(db: Session) -> None:
+    owner = create_random_user(db)
+    other = create_random_user(db)
+
+    async def listen() -> None:
+        listener = ChangeListener(item_events.dsn, item_events.channel, queue_size=10)
+        async with listener.subscribe(owner.id) as owned, listener.subscribe(
+            other.id
+        ) as others, listener.subscribe() as everything:
+            item_in = ItemCreate(title=random_lower_string())
+            item = crud.item.create_with_owner(db=db, obj_in=item_in, owner_id=owner.id)
+            crud.item.update_for_owner(
+                db=db, id=item.id, obj_in={"title": "x"}, owner_id=owner.id
+            )
+            crud.item.delete_for_owner(db=db, id=item.id, owner_id=owner.id)
+            events = [await asyncio.wait_for(owned.get(), 5) for _ in range(3)]
+            assert [event["op"] for event in events] == ["insert", "update", "delete"]
+            assert [event["version"] for event in events] == [1, 2, 2]
+            assert {(event["id"], event["owner_id"]) for event in events} == {
+                (item.id, owner.id)
+            }
+            assert (await asyncio.wait_for(everything.get(), 5))["id"] == item.id
+            assert others.empty()
+        await listener.close()
+
+    asyncio.run(listen())
+
+
+def test_bulk_writes_are_announced_per_statement(db: Session) -> None:
+    owner = create_random_user(db)
+
+    async def listen() -> None:
+        listener = ChangeListener(item_events.dsn, item_events.channel, queue_size=10)
+        async with listener.subscribe(owner.id) as owned:
+            objs_in = [ItemCreate(title=random_lower_string()) for _ in range(3)]
+            items = crud.item.create_multi_with_owner(
+                db=db, objs_in=objs_in, owner_id=owner.id
+            )
+            ids = [item.id for item in items]
+            crud.item.remove_multi_by_owner(db=db, ids=ids[:2], owner_id=owner.id)
+            events = [await asyncio.wait_for(owned.get(), 5) for _ in range(2)]
+            assert [(event["op"], event["count"]) for event in events] == [
+                ("insert", 3),
+                ("delete", 2),
+            ]
+            assert (events[0]["min_id"], events[0]["max_id"]) == (min(ids), max(ids))
+            assert (events[1]["min_id"], events[1]["max_id"]) == (
+                min(ids[:2]),
+                max(ids[:2]),
+            )
+            assert {event["owner_id"] for event in events} == {owner.id}
+            await asyncio.sleep(0.1)
+            assert owned.empty()
+        await listener.close()
+
+    asyncio.run(listen())
+
+
+def test_listener_overflow_resyncs() -> None:
+    listener = ChangeListener("", "item_changes", queue_size=2)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=2)
+    listener._subscribers[queue] = 1
+    for id in range(3):
+        listener._on_notify(None, 0, "item_changes", f'{{"id": {id}, "owner_id": 1}}')
+    listener._on_notify(None, 0, "item_changes", '{"id": 4, "owner_id": 2}')
+    assert queue.qsize() == 1
+    assert queue.get_nowait() == RESYNC
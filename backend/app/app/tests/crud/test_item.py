@@ -1,7 +1,22 @@
-from sqlalchemy.orm import Session
+import asyncio
+import re
+from typing import List
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.pool import NullPool
 
 from app import crud
-from app.schemas.item import ItemCreate, ItemUpdate
+from app.core.config import settings
+from app.crud.cache import entity_cache
+from app.models.item import Item as ItemModel
+from app.models.item_stats import ItemStats
+from app.models.user import User
+from app.schemas.item import Item, ItemCreate, ItemUpdate
+from app.tests.utils.item import create_random_item
 from app.tests.utils.user import create_random_user
 from app.tests.utils.utils import random_lower_string
 
@@ -59,3 +74,210 @@ def test_delete_item(db: Session) -> None:
     assert item2.title == title
     assert item2.description == description
     assert item2.owner_id == user.id
+
+
+def test_writes_run_one_statement(db: Session) -> None:
+    user = create_random_user(db)
+    statements: List[str] = []
+
+    def before_execute(conn, cursor, statement, *args) -> None:  # type: ignore
+        # Writes announcing their rows wrap the DML in a CTE
+        statements.append(re.findall("INSERT|UPDATE|DELETE", statement)[0])
+
+    event.listen(db.get_bind(), "before_cursor_execute", before_execute)
+    try:
+        item_in = ItemCreate(title=random_lower_string())
+        item = crud.item.create_with_owner(db=db, obj_in=item_in, owner_id=user.id)
+        item = crud.item.update(db=db, db_obj=item, obj_in={"description": "x"})
+        assert item.description == "x"
+        crud.item.remove(db=db, id=item.id)
+        assert item.title == item_in.title
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", before_execute)
+    assert statements == ["INSERT", "UPDATE", "DELETE"]
+
+
+def test_item_for_owner(db: Session) -> None:
+    user = create_random_user(db)
+    other = create_random_user(db)
+    item_in = ItemCreate(title=random_lower_string())
+    item = crud.item.create_with_owner(db=db, obj_in=item_in, owner_id=user.id)
+    found, stored = crud.item.get_for_owner(db=db, id=item.id, owner_id=user.id)
+    assert found and stored and stored.id == item.id
+    found, stored = crud.item.update_for_owner(
+        db=db, id=item.id, obj_in={"title": "x"}, owner_id=other.id
+    )
+    assert found and stored is None
+    assert item.title == item_in.title
+    found, stored = crud.item.update_for_owner(
+        db=db, id=item.id, obj_in={"title": "x"}, owner_id=other.id, superuser=True
+    )
+    assert found and stored and stored.title == "x"
+    found, stored = crud.item.delete_for_owner(db=db, id=item.id, owner_id=user.id)
+    assert found and stored and stored.id == item.id
+    found, stored = crud.item.get_for_owner(db=db, id=item.id, owner_id=user.id)
+    assert not found and stored is None
+
+
+def test_get_item_cached(db: Session) -> None:
+    user = create_random_user(db)
+    item_in = ItemCreate(title=random_lower_string())
+    item = crud.item.create_with_owner(db=db, obj_in=item_in, owner_id=user.id)
+    assert crud.item.get(db=db, id=item.id) is item
+    key = ("item", item.id)
+    assert entity_cache.lookup(key, ttl=60) == {
+        "id": item.id,
+        "title": item.title,
+        "description": None,
+        "owner_id": user.id,
+        "version": 1,
+        "change_txid": item.change_txid,
+    }
+    crud.item.update(db=db, db_obj=item, obj_in={"title": "x"})
+    assert entity_cache.lookup(key, ttl=60) is None
+    stored = crud.item.get(db=db, id=item.id)
+    assert stored and stored.title == "x"
+
+
+def test_get_item_for_owner_cached(db: Session) -> None:
+    user = create_random_user(db)
+    other = create_random_user(db)
+    item_in = ItemCreate(title=random_lower_string())
+    item = crud.item.create_with_owner(db=db, obj_in=item_in, owner_id=user.id)
+    key = ("item", item.id)
+    crud.item.get_for_owner(db=db, id=item.id, owner_id=user.id)
+    assert entity_cache.lookup(key, ttl=60) is not None
+    found, stored = crud.item.get_for_owner(db=db, id=item.id, owner_id=other.id)
+    assert found and stored is None
+    assert crud.item.get_version_for_owner(db=db, id=item.id, owner_id=user.id) == (
+        True,
+        1,
+    )
+    entity_cache.invalidate(key)
+
+    async def read_replica() -> None:
+        engine = create_async_engine(
+            settings.SQLALCHEMY_ASYNC_DATABASE_URI, poolclass=NullPool
+        )
+        async with AsyncSession(engine, info={"replica": True}) as async_db:
+            found, stored = await crud.async_item.get_for_owner(
+                async_db, id=item.id, owner_id=user.id
+            )
+        await engine.dispose()
+        assert found and stored and stored.title == item.title
+
+    # Rows read from a replica may be stale, they are not cached
+    asyncio.run(read_replica())
+    assert entity_cache.lookup(key, ttl=60) is None
+
+
+def test_get_page_by_owner(db: Session) -> None:
+    user = create_random_user(db)
+    items = [
+        crud.item.create_with_owner(
+            db=db, obj_in=ItemCreate(title=random_lower_string()), owner_id=user.id
+        )
+        for _ in range(5)
+    ]
+    page, cursor = crud.item.get_page_by_owner(db=db, owner_id=user.id, limit=3)
+    assert [item.id for item in page] == [item.id for item in items[:3]]
+    assert cursor
+    page, cursor = crud.item.get_page_by_owner(
+        db=db, owner_id=user.id, cursor=cursor, limit=3
+    )
+    assert [item.id for item in page] == [item.id for item in items[3:]]
+    assert cursor is None
+
+
+def test_read_model_rows(db: Session) -> None:
+    user = create_random_user(db)
+    for _ in range(3):
+        crud.item.create_with_owner(
+            db=db, obj_in=ItemCreate(title=random_lower_string()), owner_id=user.id
+        )
+    db.expunge_all()
+    fields = crud.item.read_fields(Item)
+    page, cursor = crud.item.get_page_by_owner(
+        db=db, owner_id=user.id, limit=2, fields=fields
+    )
+    assert cursor
+    assert list(page[0]._fields) == fields
+    assert Item.from_orm(page[0]).owner_id == user.id
+    rows = crud.item.get_multi_by_owner(
+        db=db, owner_id=user.id, skip=2, fields=["id", "title"]
+    )
+    assert len(rows) == 1 and list(rows[0]._fields) == ["id", "title"]
+    # Plain rows, nothing ends up in the identity map
+    assert not list(db.identity_map.values())
+
+
+def test_load_relationships_with_options(db: Session) -> None:
+    user = create_random_user(db)
+    item_in = ItemCreate(title=random_lower_string())
+    item = crud.item.create_with_owner(db=db, obj_in=item_in, owner_id=user.id)
+    stored = crud.user.get(db=db, id=user.id)
+    assert stored
+    with pytest.raises(InvalidRequestError):
+        stored.items
+    stored = crud.user.get(db=db, id=user.id, options=[selectinload(User.items)])
+    assert stored and [i.id for i in stored.items] == [item.id]
+    db.expunge_all()
+    items = crud.item.get_multi(db=db, limit=1, options=[joinedload(ItemModel.owner)])
+    assert items[0].owner.id == items[0].owner_id
+
+
+def test_item_stats_follow_writes(db: Session) -> None:
+    user = create_random_user(db)
+    other = create_random_user(db)
+
+    def item_count(owner_id: int) -> int:
+        stats = db.get(ItemStats, owner_id, populate_existing=True)
+        return stats.item_count if stats else 0
+
+    items_in = [ItemCreate(title=random_lower_string()) for _ in range(3)]
+    items = crud.item.create_multi_with_owner(db=db, objs_in=items_in, owner_id=user.id)
+    assert item_count(user.id) == 3
+    crud.item.update(db=db, db_obj=items[0], obj_in={"owner_id": other.id})
+    assert (item_count(user.id), item_count(other.id)) == (2, 1)
+    crud.item.remove_multi_by_owner(
+        db=db, ids=[item.id for item in items], owner_id=user.id
+    )
+    assert (item_count(user.id), item_count(other.id)) == (0, 1)
+
+
+def test_get_many_items(db: Session) -> None:
+    user = create_random_user(db)
+    items = [create_random_item(db, owner_id=user.id) for _ in range(2)]
+    other = create_random_item(db)
+    ids = [items[1].id, other.id, items[0].id, other.id + 1000000]
+    found = crud.item.get_many(db=db, ids=ids)
+    assert {item.id for item in found} == {items[0].id, items[1].id, other.id}
+    found = crud.item.get_many_for_owner(
+        db=db, ids=ids, owner_id=user.id, fields=["id", "title"]
+    )
+    assert sorted(found) == sorted((item.id, item.title) for item in items)
+
+
+def test_bulk_create_update_remove_items(db: Session) -> None:
+    user = create_random_user(db)
+    items_in = [ItemCreate(title=random_lower_string()) for _ in range(3)]
+    items = crud.item.create_multi_with_owner(db=db, objs_in=items_in, owner_id=user.id)
+    assert [item.title for item in items] == [item_in.title for item_in in items_in]
+    assert all(item.owner_id == user.id for item in items)
+    description = random_lower_string()
+    updated = crud.item.update_multi_by_owner(
+        db=db,
+        objs_in=[{"id": item.id, "description": description} for item in items],
+        owner_id=user.id,
+    )
+    assert sorted(item.id for item in updated) == sorted(item.id for item in items)
+    assert all(item.description == description for item in updated)
+    other_user = create_random_user(db)
+    removed = crud.item.remove_multi_by_owner(
+        db=db, ids=[item.id for item in items], owner_id=other_user.id
+    )
+    assert removed == []
+    ids = [item.id for item in items]
+    removed = crud.item.remove_multi(db=db, ids=ids)
+    assert sorted(item.id for item in removed) == sorted(ids)
+    assert crud.item.get_existing_ids(db=db, ids=ids) == set()
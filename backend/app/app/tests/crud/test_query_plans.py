@@ -0,0 +1,135 @@
+from typing import Dict
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.config import settings
+from app.db.session import async_engine
+from app.models.item import Item
+from app.models.user import User
+from app.schemas.item import ItemCreate
+from app.tests.utils.plans import filtered_scans, recorded_plans
+from app.tests.utils.user import create_random_user
+from app.tests.utils.utils import random_lower_string
+
+# A fixed dataset large enough that the planner prefers the indexes whatever
+# rows earlier tests left behind
+PLAN_OWNERS = 50
+PLAN_ITEMS_PER_OWNER = 200
+
+
+@pytest.fixture(scope="module", autouse=True)
+def plan_dataset(db: Session) -> None:
+    """
+    Seed the plan owners and their items once, then refresh the statistics
+    and visibility map the planner costs index scans with.
+    """
+    db.execute(
+        text("""
+            INSERT INTO "user" (email, hashed_password, is_active, is_superuser)
+            SELECT 'plans-' || n || '@example.com', '', true, false
+            FROM generate_series(1, :owners) AS n
+            ON CONFLICT (email) DO NOTHING
+            """),
+        {"owners": PLAN_OWNERS},
+    )
+    db.execute(
+        text("""
+            INSERT INTO item (title, owner_id)
+            SELECT 'plans-' || n, u.id
+            FROM "user" AS u, generate_series(1, :items) AS n
+            WHERE u.email LIKE 'plans-%@example.com'
+            AND NOT EXISTS (SELECT 1 FROM item WHERE item.owner_id = u.id)
+            """),
+        {"items": PLAN_ITEMS_PER_OWNER},
+    )
+    db.commit()
+    # VACUUM also marks the new pages all-visible, as autovacuum would later
+    with db.get_bind().connect() as connection:
+        connection.execution_options(isolation_level="AUTOCOMMIT").execute(
+            text('VACUUM ANALYZE "user", item, itemtombstone, itemimport')
+        )
+
+
+def test_crud_queries_use_indexes(
+    client: TestClient,
+    superuser_token_headers: Dict[str, str],
+    normal_user_token_headers: Dict[str, str],
+    db: Session,
+) -> None:
+    with recorded_plans(db.get_bind(), async_engine.sync_engine) as plans:
+        user = create_random_user(db)
+        crud.user.get_by_email(db, email=user.email)
+        crud.user.get_page(db, order_by="email", limit=1)
+        items_in = [ItemCreate(title=random_lower_string()) for _ in range(3)]
+        items = crud.item.create_multi_with_owner(
+            db=db, objs_in=items_in, owner_id=user.id
+        )
+        crud.item.copy_multi_with_owner(
+            db=db, chunks=[[{"title": random_lower_string()}]], owner_id=user.id
+        )
+        db.commit()
+        crud.item.get_multi_by_owner(db=db, owner_id=user.id, skip=1)
+        _, cursor = crud.item.get_page_by_owner(db=db, owner_id=user.id, limit=1)
+        crud.item.get_page_by_owner(db=db, owner_id=user.id, cursor=cursor)
+        crud.item.get_version_for_owner(db=db, id=items[0].id, owner_id=user.id)
+        crud.item.update_for_owner(
+            db=db, id=items[0].id, obj_in={"title": "x"}, owner_id=user.id
+        )
+        crud.item.update_multi_by_owner(
+            db=db, objs_in=[{"id": items[1].id, "title": "y"}], owner_id=user.id
+        )
+        crud.item.get_existing_ids(db=db, ids=[item.id for item in items])
+        crud.item.delete_for_owner(db=db, id=items[0].id, owner_id=user.id)
+        crud.item.remove_multi_by_owner(db=db, ids=[items[1].id], owner_id=user.id)
+
+        # The normal user is refused the item and stats of `user`
+        refused = {f"/items/{items[2].id}", f"/users/{user.id}/stats"}
+        for headers in (superuser_token_headers, normal_user_token_headers):
+            for path in (
+                "/items/?limit=1",
+                "/items/?skip=1",
+                f"/items/{items[2].id}",
+                "/items/changes?since=1",
+                f"/items/search?q={items[2].title}",
+                "/items/export?format=csv",
+                f"/users/{user.id}/stats",
+            ):
+                r = client.get(f"{settings.API_V1_STR}{path}", headers=headers)
+                if headers is normal_user_token_headers and path in refused:
+                    assert r.status_code == 400
+                else:
+                    assert r.status_code == 200
+        for path in (
+            "/items/with-owners?limit=1",
+            "/users/?order_by=email&limit=1",
+            "/users/with-item-counts?limit=1",
+        ):
+            r = client.get(
+                f"{settings.API_V1_STR}{path}", headers=superuser_token_headers
+            )
+            assert r.status_code == 200
+
+    assert len(plans) > 20
+    scans = {statement: filtered_scans(plan) for statement, plan in plans}
+    assert {statement: tables for statement, tables in scans.items() if tables} == {}
+
+
+def test_unindexed_filter_is_reported(db: Session) -> None:
+    with recorded_plans(db.get_bind()) as plans:
+        db.execute(select(User.id).where(User.full_name == "x")).all()
+    [(_, plan)] = plans
+    assert filtered_scans(plan) == ["user"]
+
+
+def test_filter_outside_index_condition_is_reported(db: Session) -> None:
+    # Walks the primary key in order, filtering every row by title
+    with recorded_plans(db.get_bind()) as plans:
+        db.execute(
+            select(Item.id).where(Item.title == "x").order_by(Item.id).limit(1)
+        ).all()
+    [(_, plan)] = plans
+    assert filtered_scans(plan) == ["item"]
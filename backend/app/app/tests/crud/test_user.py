@@ -1,8 +1,18 @@
+import time
+
+from _pytest.monkeypatch import MonkeyPatch
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 
 from app import crud
-from app.core.security import verify_password
+from app.core.config import settings
+from app.core.security import (
+    Principal,
+    cache_principal,
+    create_access_token,
+    get_cached_principal,
+    verify_password,
+)
 from app.schemas.user import UserCreate, UserUpdate
 from app.tests.utils.utils import random_email, random_lower_string
 
@@ -92,3 +102,36 @@ def test_update_user(db: Session) -> None:
     assert user_2
     assert user.email == user_2.email
     assert verify_password(new_password, user_2.hashed_password)
+
+
+def test_get_user_version(db: Session) -> None:
+    user_in = UserCreate(email=random_email(), password=random_lower_string())
+    user = crud.user.create(db, obj_in=user_in)
+    assert crud.user.get_version(db, id=user.id) == 1
+    crud.user.update(db, db_obj=user, obj_in=UserUpdate(full_name="x"))
+    assert crud.user.get_version(db, id=user.id) == 2
+    assert crud.user.get_version(db, id=-1) is None
+
+
+def test_update_user_invalidates_principal(db: Session) -> None:
+    password = random_lower_string()
+    email = random_email()
+    user_in = UserCreate(email=email, password=password)
+    user = crud.user.create(db, obj_in=user_in)
+    token = create_access_token(user.id)
+    principal = Principal(id=user.id, is_active=True, is_superuser=False)
+    cache_principal(token, {"sub": str(user.id)}, principal)
+    assert get_cached_principal(token) == principal
+    crud.user.update(db, db_obj=user, obj_in=UserUpdate(is_superuser=True))
+    assert get_cached_principal(token) is None
+
+
+def test_cached_principal_expires(monkeypatch: MonkeyPatch) -> None:
+    # Other processes miss the invalidation, their copy expires instead
+    monkeypatch.setattr(settings, "PRINCIPAL_CACHE_TTL_SECONDS", 0.05)
+    token = create_access_token(-1)
+    principal = Principal(id=-1, is_active=True, is_superuser=False)
+    cache_principal(token, {"sub": "-1"}, principal)
+    assert get_cached_principal(token) == principal
+    time.sleep(0.1)
+    assert get_cached_principal(token) is None
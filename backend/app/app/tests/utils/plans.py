@@ -0,0 +1,111 @@
+import json
+import re
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.db.base import Base
+
+# Tables expected to grow large, filtering one with a column no index condition
+# covers means an index is missing. `itemstats` is read whole by design.
+LARGE_TABLES = {"item", "user", "itemimport", "itemtombstone"}
+# Columns no single index covers together, the scan of either one's index may
+# filter by the other: the GIN search index does not hold the owner
+UNCOMBINED_COLUMNS = {"item": {"owner_id", "search_vector"}}
+
+_EXPLAINED = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+# Condition each kind of scan reads through an index with
+_INDEX_CONDITIONS = {
+    "Seq Scan": None,
+    "Index Scan": "Index Cond",
+    "Index Only Scan": "Index Cond",
+    "Bitmap Heap Scan": "Recheck Cond",
+}
+
+
+@contextmanager
+def recorded_plans(*engines: Engine) -> Iterator[List[Tuple[str, Any]]]:
+    """
+    Record the plan of every query run on `engines` meanwhile, as
+    `(statement, plan)` pairs, then run the query as usual.
+
+    Queries are planned with sequential scans disabled, one chosen anyway has
+    no index to use instead, however small the test tables are.
+    """
+    plans: List[Tuple[str, Any]] = []
+
+    def explain(  # type: ignore
+        conn, cursor, statement, parameters, context, executemany
+    ) -> None:
+        if executemany or not statement.lstrip().upper().startswith(_EXPLAINED):
+            return
+        # A cursor of its own, `cursor` may be a server-side one
+        explain_cursor = conn.connection.cursor()
+        try:
+            explain_cursor.execute("SET enable_seqscan = off")
+            explain_cursor.execute(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+            plan = explain_cursor.fetchone()[0]
+            explain_cursor.execute("RESET enable_seqscan")
+        finally:
+            explain_cursor.close()
+        # asyncpg hands out json undecoded
+        plans.append((statement, json.loads(plan) if isinstance(plan, str) else plan))
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", explain)
+    try:
+        yield plans
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", explain)
+
+
+def _columns(table: str, condition: str) -> Set[str]:
+    """
+    Columns of `table` that `condition`, an expression of a plan, refers to.
+    """
+    names = set(Base.metadata.tables[table].c.keys())  # type: ignore
+    return names.intersection(re.findall(r"\w+", condition))
+
+
+def _unique_indexes(table: str) -> Set[str]:
+    indexes = Base.metadata.tables[table].indexes  # type: ignore
+    return {f"{table}_pkey"} | {index.name for index in indexes if index.unique}
+
+
+def filtered_scans(plan: Any) -> List[str]:
+    """
+    Large tables that `plan` scans to filter their rows by a column the index
+    condition of the scan does not cover, all of them for a sequential scan.
+    Whole table scans, e.g. of exports, are expected and left out, as are
+    filters on the single row found by equality on a unique index.
+    """
+    nodes: List[Dict[str, Any]] = [entry["Plan"] for entry in plan]
+    tables = []
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.get("Plans", []))
+        table = node.get("Relation Name")
+        if (
+            node["Node Type"] not in _INDEX_CONDITIONS
+            or table not in LARGE_TABLES
+            or "Filter" not in node
+        ):
+            continue
+        index_condition = node.get(_INDEX_CONDITIONS[node["Node Type"]] or "", "")
+        if (
+            node.get("Index Name") in _unique_indexes(table)
+            and index_condition
+            and not re.search("[<>]", index_condition)
+        ):
+            continue
+        filtered = _columns(table, node["Filter"])
+        covered = _columns(table, index_condition)
+        if filtered <= covered:
+            continue
+        if covered and filtered | covered <= UNCOMBINED_COLUMNS.get(table, set()):
+            continue
+        tables.append(table)
+    return tables
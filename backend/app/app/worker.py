@@ -2,6 +2,7 @@ from raven import Client
 
 from app.core.celery_app import celery_app
 from app.core.config import settings
+from app.item_imports import run_item_import
 
 client_sentry = Client(settings.SENTRY_DSN)
 
@@ -9,3 +10,8 @@ client_sentry = Client(settings.SENTRY_DSN)
 @celery_app.task(acks_late=True)
 def test_celery(word: str) -> str:
     return f"test task return {word}"
+
+
+@celery_app.task(acks_late=True)
+def import_items(import_id: int) -> None:
+    run_item_import(import_id)
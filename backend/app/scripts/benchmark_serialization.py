@@ -0,0 +1,60 @@
+"""
+Time the ways a page of items can be turned into a response body:
+
+    python scripts/benchmark_serialization.py [rows]
+
+* `current`: response model validation from ORM objects, `jsonable_encoder`
+  and the stdlib `json` encoder, i.e. the default `JSONResponse` path
+* `orjson`: the same validation and encoding, rendered by `ORJSONResponse`
+* `trusted`: column tuples encoded straight away, `TRUSTED_LIST_RESPONSES`
+"""
+import sys
+import timeit
+from collections import namedtuple
+from typing import Any, Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.api.responses import render_rows
+from app.models import Item
+from app.schemas import Item as ItemSchema
+
+
+def make_items(count: int) -> List[Item]:
+    return [
+        Item(id=i, title=f"title {i}", description=f"description {i}", owner_id=1)
+        for i in range(count)
+    ]
+
+
+def current(items: List[Item]) -> bytes:
+    content = jsonable_encoder([ItemSchema.from_orm(item) for item in items])
+    return JSONResponse(content).body
+
+
+def orjson(items: List[Item]) -> bytes:
+    content = jsonable_encoder([ItemSchema.from_orm(item) for item in items])
+    return ORJSONResponse(content).body
+
+
+def main(count: int) -> None:
+    items = make_items(count)
+    # Rows of `select(item.c.title, item.c.description, item.c.id, ...)`
+    Row = namedtuple("Row", list(ItemSchema.__fields__))  # type: ignore
+    rows = [Row(*[getattr(item, name) for name in Row._fields]) for item in items]
+    cases: Dict[str, Callable[[], Any]] = {
+        "current": lambda: current(items),
+        "orjson": lambda: orjson(items),
+        "trusted": lambda: render_rows(rows),
+    }
+    baseline = None
+    for name, case in cases.items():
+        number, total = timeit.Timer(case).autorange()
+        per_call = total / number * 1000
+        baseline = baseline or per_call
+        print(f"{name:>8}: {per_call:8.3f} ms  {baseline / per_call:5.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -4,5 +4,5 @@ set -x
 
 mypy app
 black app --check
-isort --recursive --check-only app
+isort --check-only app
 flake8